@@ -0,0 +1,77 @@
+import time
+import pygame
+
+class Tween:
+    """ A pre-rendered tile sliding from start to end (screen pixels) between startTime and startTime + duration.
+    hides is the (coreImage, x, y) slot whose static tile is not drawn while the tween is pending"""
+    def __init__(self, surf, start, end, startTime, duration, hides=None):
+        self.surf = surf
+        self.start = start
+        self.end = end
+        self.startTime = startTime
+        self.duration = duration
+        self.hides = hides
+
+    def position(self, now):
+        t = min(1.0, max(0.0, (now - self.startTime) / self.duration))
+        t = t * t * (3 - 2 * t) # ease in and out
+        return (self.start[0] + (self.end[0] - self.start[0]) * t, self.start[1] + (self.end[1] - self.start[1]) * t)
+
+    def finished(self, now):
+        return now >= self.startTime + self.duration
+
+    def bounds(self):
+        """ The screen area the tile passes over"""
+        w, h = self.surf.get_size()
+        left, top = min(self.start[0], self.end[0]), min(self.start[1], self.end[1])
+        return pygame.Rect(int(left) - 1, int(top) - 1, int(abs(self.end[0] - self.start[0])) + w + 2, int(abs(self.end[1] - self.start[1])) + h + 2)
+
+class Timeline:
+    """ Runs tweens inside the main loop; the core data is already final, tweens only place the moving tiles"""
+    FAST_FORWARD = 4.0
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.tweens = []
+        self.now = 0.0
+        self.last = None
+        self.speed = 1.0
+
+    def active(self):
+        return bool(self.tweens)
+
+    def add(self, surf, start, end, delay=0.0, duration=0.5, hides=None):
+        """ Queue a tile to slide from start to end, starting delay seconds from now"""
+        if not self.tweens:
+            self.last = self.clock()
+        self.tweens.append(Tween(surf, start, end, self.now + delay, duration, hides))
+
+    def advance(self):
+        """ Moves the timeline on by the elapsed wall clock time.  Returns the screen areas to redraw."""
+        wall = self.clock()
+        if self.last is None:
+            self.last = wall
+        self.now += (wall - self.last) * self.speed
+        self.last = wall
+        dirty = [tween.bounds() for tween in self.tweens]
+        self.tweens = [tween for tween in self.tweens if not tween.finished(self.now)]
+        if not self.tweens:
+            self.speed = 1.0
+        return dirty
+
+    def skip(self):
+        """ Finish every animation now.  Returns the screen areas to redraw."""
+        dirty = [tween.bounds() for tween in self.tweens]
+        self.tweens = []
+        self.speed = 1.0
+        return dirty
+
+    def toggleFastForward(self):
+        self.speed = 1.0 if self.speed != 1.0 else self.FAST_FORWARD
+
+    def hiddenTiles(self):
+        return set(tween.hides for tween in self.tweens if tween.hides is not None)
+
+    def draw(self, surface):
+        for tween in self.tweens:
+            surface.blit(tween.surf, tween.position(self.now))
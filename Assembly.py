@@ -1,70 +1,151 @@
-class Assembly():
-    """represents a fuel assembly including position in core and history of the fuel"""
-    label = "**"
-    moved = False
+import weakref
+from Symmetry import QUADRANT_TURN
+
+BURNUP_RED_SCALE = 4.25  # quadrant red channel per MWd/kgU of burnup (60 MWd/kgU is full red)
+DEPLETED_BURNUP = 80.0   # burnup at which the enrichment (green) channel has faded out
+
+def quadrantColor(burnup, UO2WT, BurnablePoisons):
+    """ The colour used to draw one quadrant of an assembly (red: burnup, green: remaining enrichment, blue: poisons)"""
+    return (min(255, burnup * BURNUP_RED_SCALE),
+            max(0, UO2WT * Assembly.UO2_scaler * (1 - burnup / DEPLETED_BURNUP)),
+            min(255, BurnablePoisons))
+
+FRESH_BURNUP = (0.0, 0.0, 0.0, 0.0) # shared by every assembly that has not been burned
+
+class FuelType:
+    """ Immutable description of a fresh fuel type (enrichment, MOX, burnable poisons).  FuelTypes are
+    interned: FuelType(3.2) always returns the same object, so identical fresh assemblies share one
+    prototype, including its pre-computed colour, until they are burned."""
+    __slots__ = ("UO2WT", "MOX", "BurnablePoisons", "freshColor", "__weakref__")
+    _interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, UO2WT=3.2, MOX=0, BurnablePoisons=10):
+        key = (float(UO2WT), float(MOX), float(BurnablePoisons))
+        fuel = cls._interned.get(key)
+        if fuel is None:
+            fuel = object.__new__(cls)
+            object.__setattr__(fuel, "UO2WT", UO2WT)
+            object.__setattr__(fuel, "MOX", MOX)
+            object.__setattr__(fuel, "BurnablePoisons", BurnablePoisons)
+            object.__setattr__(fuel, "freshColor", (quadrantColor(0, UO2WT, BurnablePoisons),) * 4)
+            cls._interned[key] = fuel
+        return fuel
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FuelType is immutable, make a new one instead")
+
+    def __reduce__(self):
+        return (FuelType, (self.UO2WT, self.MOX, self.BurnablePoisons))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return "FuelType(%r, %r, %r)" % (self.UO2WT, self.MOX, self.BurnablePoisons)
+
+class Assembly:
+    """represents a fuel assembly including position in core and history of the fuel.
+    The fuel type is a shared FuelType; Burnup and BurnablePoisons only get their own storage once
+    the assembly has been burned.  Burnup is a fixed tuple of four quadrant values."""
+    __slots__ = ("label", "moved", "fuel", "SUSPECTED_FOR_LEAK", "_burnup", "_poisons", "_quadColor")
     fourColor = False
-    quadColor = (  0, 204,   0)
-    Burnup = [0,0,0,0]
-    UO2WT = 3
     UO2_scaler = 51
-    MOX = 0
-    BurnablePoisons = 0
-    SUSPECTED_FOR_LEAK = False
 
-    def __init__(self, label, UO2WT=3.2, Burnup=[0,0,0,0], BurnablePoisons=10 ):
+    def __init__(self, label, UO2WT=3.2, Burnup=None, BurnablePoisons=10, MOX=0):
         self.label = label
         self.moved = False
-        self.U02WT = UO2WT
-        self.Burnup = Burnup
-        # initially the color is uniform. (?)
-        c1 = (Burnup[0], UO2WT *self.UO2_scaler, BurnablePoisons)
-        c2 = (Burnup[1], UO2WT *self.UO2_scaler, BurnablePoisons)
-        c3 = (Burnup[2], UO2WT *self.UO2_scaler, BurnablePoisons)
-        c4 = (Burnup[3], UO2WT *self.UO2_scaler, BurnablePoisons)
-        self.quadColor = [c1,c2,c3,c4]
-
-    def isSame(self, a):
-        """Compares two Assemblies:
-         If the fuel should go back in the same bin. For example if it is loaded
-         and removes wihtout being burned up."""
-         #TODO: FIXME:  this function needs work and thought - what variables are
-         # relevant?  Should fuel that has been burned once be lumped togeher?
-         #  should 'moved' be a difference?? no?? -> # self.moved == a.moved and \
-        if  self.label == a.label and \
-                self.fourColor == a.fourColor and \
-                self.quadColor == a.quadColor and \
-                self.Burnup == a.Burnup and \
-                self.UO2WT == a.UO2WT and \
-                self.UO2_scaler == a.UO2_scaler and \
-                self.MOX == a.MOX and \
-                self.BurnablePoisons == a.BurnablePoisons and \
-                self.SUSPECTED_FOR_LEAK == a.SUSPECTED_FOR_LEAK:
-            return True
+        self.SUSPECTED_FOR_LEAK = False
+        self._quadColor = None
+        if Burnup is None or not any(Burnup):
+            self.fuel = FuelType(UO2WT, MOX, BurnablePoisons)
+            self._burnup = None
+            self._poisons = None
         else:
-            i =0
-            for item1, item2 in zip([self.label, \
-                    self.moved, \
-                    self.fourColor, \
-                    self.quadColor, \
-                    self.Burnup, \
-                    self.UO2WT, \
-                    self.UO2_scaler,\
-                    self.MOX,\
-                    self.BurnablePoisons,\
-                    self.SUSPECTED_FOR_LEAK, ], [a.label, \
-                    a.moved, \
-                    a.fourColor, \
-                    a.quadColor, \
-                    a.Burnup, \
-                    a.UO2WT, \
-                    a.UO2_scaler, \
-                    a.MOX,\
-                    a.BurnablePoisons,\
-                    a.SUSPECTED_FOR_LEAK]):
-                if item1 != item2:
-                    i+=1
-                    print ("diff: "+str(item1)+ "  " +str(item2) + " "+str(i))
-            return False
+            # already burned: the fresh poison loading is not known, keep the current one per assembly
+            self.fuel = FuelType(UO2WT, MOX)
+            self._burnup = tuple(float(b) for b in Burnup)
+            self._poisons = BurnablePoisons
+
+    def copy(self):
+        """ A new assembly with the same data.  The fuel type and the (immutable) burnup are shared."""
+        other = Assembly.__new__(Assembly)
+        other.label = self.label
+        other.moved = self.moved
+        other.fuel = self.fuel
+        other.SUSPECTED_FOR_LEAK = self.SUSPECTED_FOR_LEAK
+        other._burnup = self._burnup
+        other._poisons = self._poisons
+        other._quadColor = self._quadColor
+        return other
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def turn(self, direction):
+        """ Turns the assembly a quarter turn where it stands (clockwise for direction 1): its quadrants rotate"""
+        order = QUADRANT_TURN[direction]
+        if self._burnup is not None:
+            self._burnup = tuple(self._burnup[i] for i in order)
+        if self._quadColor is not None:
+            self._quadColor = tuple(self._quadColor[i] for i in order)
+
+    def isFresh(self):
+        """ True until the assembly has been burned"""
+        return self._burnup is None and self._poisons is None
+
+    @property
+    def UO2WT(self):
+        return self.fuel.UO2WT
+
+    @UO2WT.setter
+    def UO2WT(self, value):
+        self.fuel = FuelType(value, self.fuel.MOX, self.fuel.BurnablePoisons)
+        self._quadColor = None
+
+    @property
+    def MOX(self):
+        return self.fuel.MOX
+
+    @MOX.setter
+    def MOX(self, value):
+        self.fuel = FuelType(self.fuel.UO2WT, value, self.fuel.BurnablePoisons)
+
+    @property
+    def Burnup(self):
+        return FRESH_BURNUP if self._burnup is None else self._burnup
+
+    @Burnup.setter
+    def Burnup(self, value):
+        self._burnup = tuple(float(b) for b in value)
+        self._quadColor = None
+
+    @property
+    def BurnablePoisons(self):
+        return self.fuel.BurnablePoisons if self._poisons is None else self._poisons
+
+    @BurnablePoisons.setter
+    def BurnablePoisons(self, value):
+        self._poisons = value
+        self._quadColor = None
+
+    @property
+    def quadColor(self):
+        """ The four quadrant colours, derived from burnup, enrichment and poisons unless set explicitly"""
+        if self._quadColor is None:
+            if self.isFresh():
+                return self.fuel.freshColor
+            self._quadColor = tuple(quadrantColor(b, self.UO2WT, self.BurnablePoisons) for b in self.Burnup)
+        return self._quadColor
+
+    @quadColor.setter
+    def quadColor(self, value):
+        self._quadColor = tuple(tuple(c) for c in value)
 
 
 def main():
@@ -0,0 +1,252 @@
+#
+#  Headless benchmarks of the GUI and models, compared with a baseline file.
+#    python Benchmark.py [--quick] [--output run.json] [--update-baseline]
+#
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.chdir(os.path.dirname(os.path.abspath(__file__))) # the GUI loads its fonts and sounds from resources/
+
+import pygame
+import FuelManager as FM
+from Assembly import Assembly
+from StoredInventory import StoredInventory
+from Zobrist import CoreHash
+from EvalCache import EvalCache
+from Constraints import ConstraintChecker
+
+BASELINE_FILE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.5 # 50 % slower than the baseline is a regression, single runs on a shared machine are noisy
+INVENTORY_SIZES = (100, 1000, 10000)
+REPLAY_MOVES = 200
+CORE = "BEAVRS" # core type of everything but the drawing benchmarks
+SEED = 1
+
+def measure(function, number, repeat):
+    """ Best time (seconds) per call of function over repeat runs of number calls"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def fuelPositions(core):
+    return [(x, y) for y, row in enumerate(core) for x, assy in enumerate(row) if assy.label != FM.BLANK]
+
+def benchDrawing(results, repeat):
+    """ A full redraw of the window (drawGUI) for every core type"""
+    for name in FM.CORESHAPES:
+        mainCore, startCore, sequence = FM.generateNewPattern(name)
+        FM.drawGUI(mainCore, startCore, FM.STORED_INVENTORY, FM.CLICK_TO_SWAP_MSG) # fills the tile cache
+        results["drawGUI." + name] = measure(lambda: FM.drawGUI(mainCore, startCore, FM.STORED_INVENTORY, FM.CLICK_TO_SWAP_MSG), 10, repeat)
+
+def benchHitTest(results, repeat):
+    """ getSpotClicked at random points of the window"""
+    mainCore, startCore, sequence = FM.generateNewPattern(CORE)
+    rng = random.Random(SEED)
+    points = [(rng.randrange(FM.WINDOWWIDTH), rng.randrange(FM.WINDOWHEIGHT)) for _ in range(1000)]
+    def run():
+        for x, y in points:
+            FM.getSpotClicked(mainCore, x, y)
+            FM.getSpotClicked(mainCore, x, y, "Inventory")
+    results["getSpotClicked"] = measure(run, 1, repeat) / (2 * len(points))
+
+def benchMoves(results, repeat):
+    """ makeSwap, makeRotate and makeLoad"""
+    rng = random.Random(SEED)
+    mainCore, startCore, sequence = FM.generateNewPattern(CORE)
+    positions = fuelPositions(mainCore)
+    swaps = [rng.sample(positions, 2) for _ in range(1000)]
+    rotations = [(rng.choice(positions), rng.choice((1, -1))) for _ in range(1000)]
+    def swap():
+        for one, two in swaps:
+            FM.makeSwap(mainCore, one, two)
+    def rotate():
+        for pos, direction in rotations:
+            FM.makeRotate(mainCore, pos, direction)
+    results["makeSwap"] = measure(swap, 1, repeat) / len(swaps)
+    results["makeRotate"] = measure(rotate, 1, repeat) / len(rotations)
+
+    inventory = FM.STORED_INVENTORY
+    best = float("inf")
+    for _ in range(repeat):
+        FM.STORED_INVENTORY = StoredInventory([Assembly("3.2", 3.2)], [len(positions)], ["Fresh 3.2 wt/o"])
+        core = FM.CoreSnapshot(FM.getStartingCore())
+        start = time.perf_counter()
+        for pos in positions: # every load retires an assembly into the inventory
+            FM.makeLoad(core, pos, 0)
+        best = min(best, (time.perf_counter() - start) / len(positions))
+    FM.STORED_INVENTORY = inventory
+    results["makeLoad"] = best
+
+def benchBurnup(results, repeat):
+    """ doBurnup of a freshly loaded core"""
+    exportFiles, transferFiles = FM.EXPORT_FILES, FM.TRANSFER_FILES
+    FM.EXPORT_FILES = FM.TRANSFER_FILES = [] # nothing written to the working directory, no transfer order searches
+    try:
+        best = float("inf")
+        for _ in range(repeat):
+            mainCore, startCore, sequence = FM.generateNewPattern(CORE)
+            FM.HISTORY.clear()
+            start = time.perf_counter()
+            mainCore, startCore, message = FM.doBurnup(mainCore, startCore)
+            best = min(best, time.perf_counter() - start)
+        results["doBurnup"] = best
+    finally:
+        FM.EXPORT_FILES, FM.TRANSFER_FILES = exportFiles, transferFiles
+        FM.HISTORY.clear()
+        del FM.CYCLE_MOVE_LIST[:]
+
+def benchInventory(results, repeat):
+    """ addInventoryItem and removeInventoryItem with different numbers of items, per call: flat is good"""
+    for size in INVENTORY_SIZES:
+        assemblies = [Assembly("A" + str(i), 2.0 + (i % 30) / 10.0) for i in range(size)]
+        add = remove = float("inf")
+        for _ in range(repeat):
+            inventory = StoredInventory([], [], [])
+            start = time.perf_counter()
+            for assy in assemblies:
+                inventory.addInventoryItem(assy, 1, "benchmark")
+            middle = time.perf_counter()
+            for itemID in range(size):
+                inventory.removeInventoryItem(itemID)
+            add = min(add, (middle - start) / size)
+            remove = min(remove, (time.perf_counter() - middle) / size)
+        results["inventoryAdd." + str(size)] = add
+        results["inventoryRemove." + str(size)] = remove
+
+def benchReplay(results, repeat):
+    """ Undoing and redoing a cycle of REPLAY_MOVES swaps as one batch (shift-click on Undo and Redo)"""
+    rng = random.Random(SEED)
+    mainCore, startCore, sequence = FM.generateNewPattern(CORE)
+    FM.HISTORY.clear()
+    positions = fuelPositions(mainCore)
+    for _ in range(REPLAY_MOVES):
+        one, two = rng.sample(positions, 2)
+        FM.makeSwap(mainCore, one, two)
+        FM.HISTORY.recordMoves([["swap", list(one), list(two)]])
+    def run():
+        FM.stepHistory(mainCore, startCore, False, True)
+        FM.stepHistory(mainCore, startCore, True, True)
+        FM.ANIMATOR.skip()
+    results["undoReplay"] = measure(run, 1, repeat) / 2
+    FM.HISTORY.clear()
+
+def benchHashing(results, repeat):
+    """ Zobrist hashes: working them out for a whole core, and keeping them up to date over a swap"""
+    rng = random.Random(SEED)
+    mainCore, startCore, sequence = FM.generateNewPattern(CORE)
+    table = FM.CORE_GEOMETRY.zobrist
+    positions = fuelPositions(mainCore)
+    swaps = [rng.sample(positions, 2) for _ in range(1000)]
+    results["coreHash.full"] = measure(lambda: CoreHash.fromCore(mainCore, table), 5, repeat)
+    mainCore.coreHash(table)
+    def swap():
+        for one, two in swaps:
+            FM.makeSwap(mainCore, one, two)
+            mainCore.coreHash(table)
+    results["coreHash.swap"] = measure(swap, 1, repeat) / len(swaps)
+
+def benchConstraints(results, repeat):
+    """ The constraint checker: made for a whole core, kept up to date over a swap and asked what a swap would do"""
+    rng = random.Random(SEED)
+    mainCore, startCore, sequence = FM.generateNewPattern(CORE)
+    coreType = FM.CORE_GEOMETRY
+    positions = fuelPositions(mainCore)
+    swaps = [rng.sample(positions, 2) for _ in range(1000)]
+    results["constraints.full"] = measure(lambda: ConstraintChecker.fromCore(mainCore, coreType), 5, repeat)
+    checker = mainCore.constraintChecker(coreType)
+    def swap():
+        for one, two in swaps:
+            FM.makeSwap(mainCore, one, two)
+            mainCore.constraintChecker(coreType)
+    results["constraints.swap"] = measure(swap, 1, repeat) / len(swaps)
+    def tryMoves():
+        for one, two in swaps[:100]:
+            checker.tryMoves([["swap", list(one), list(two)]])
+    results["constraints.tryMoves"] = measure(tryMoves, 1, repeat) / 100
+
+BENCHMARKS = (benchDrawing, benchHitTest, benchMoves, benchBurnup, benchInventory, benchReplay, benchHashing, benchConstraints)
+
+def runAll(repeat):
+    """ Sets up the GUI without its main loop and runs every benchmark, returns {name: seconds}.  The garbage
+    collector is off while they run (as in timeit), its pauses would land in whichever benchmark is running."""
+    FM.setupGUI()
+    results = {}
+    for benchmark in BENCHMARKS:
+        gc.collect()
+        gc.disable()
+        try:
+            benchmark(results, repeat)
+        finally:
+            gc.enable()
+    FM.generateNewPattern(CORE)
+    return results
+
+def compare(results, baseline):
+    """ [(name, seconds, baseline seconds or None, ratio or None, regressed)] for every result"""
+    threshold = baseline.get("threshold", DEFAULT_THRESHOLD)
+    expected = baseline.get("results", {})
+    rows = []
+    for name, seconds in results.items():
+        base = expected.get(name)
+        if base is None:
+            rows.append((name, seconds, None, None, False))
+            continue
+        limit = base.get("threshold", threshold)
+        ratio = seconds / base["seconds"] if base["seconds"] else None
+        rows.append((name, seconds, base["seconds"], ratio, ratio is not None and ratio > 1.0 + limit))
+    return rows
+
+def machine():
+    return {"python": platform.python_version(), "pygame": pygame.version.ver, "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "videoDriver": os.environ.get("SDL_VIDEODRIVER")}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks of the PWR Loading Pattern Tool")
+    parser.add_argument("--quick", action="store_true", help="fewer repeats")
+    parser.add_argument("--output", help="write the results (JSON) to this file")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline to compare with")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--threshold", type=float, help="allowed slowdown (0.25 is 25 %%) for a new baseline")
+    args = parser.parse_args(argv)
+
+    results = runAll(2 if args.quick else 7)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    rows = compare(results, baseline)
+    report = {"machine": machine(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "results": {name: {"seconds": seconds, "baseline": base, "ratio": ratio, "regressed": regressed}
+                          for name, seconds, base, ratio, regressed in rows}}
+    for name, seconds, base, ratio, regressed in rows:
+        line = "{:28s} {:12.2f} us".format(name, seconds * 1e6)
+        if ratio is not None:
+            line += "  x{:.2f} of baseline{}".format(ratio, "  REGRESSION" if regressed else "")
+        print(line)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=1)
+    if args.update_baseline:
+        threshold = args.threshold if args.threshold is not None else baseline.get("threshold", DEFAULT_THRESHOLD)
+        with open(args.baseline, "w") as file:
+            json.dump({"machine": report["machine"], "time": report["time"], "threshold": threshold,
+                       "results": {name: {"seconds": seconds} for name, seconds in results.items()}}, file, indent=1)
+        return 0
+    return 1 if any(row[4] for row in rows) else 0
+
+if __name__ == "__main__":
+    code = main()
+    pygame.quit()
+    sys.exit(code)
@@ -0,0 +1,91 @@
+#
+#  Whole core NumPy burnup model, on arrays of shape (..., height, width[, 4]).
+#
+import math
+import numpy as np
+from Assembly import BURNUP_RED_SCALE, DEPLETED_BURNUP, Assembly
+
+CYCLE_BURNUP = 15.0        # average burnup added by one cycle (MWd/kgU)
+K_FRESH = 1.0              # infinite multiplication factor model:
+K_PER_WT = 0.1             #   K_FRESH + K_PER_WT*UO2WT - K_PER_BURNUP*burnup - K_PER_POISON*poisons
+K_PER_BURNUP = 0.01
+K_PER_POISON = 0.002
+POISON_BURN_RATE = 1.5     # fraction of poison left after a cycle at unit power is exp(-rate)
+DIFFUSION_PASSES = 2       # neighbour smoothing passes standing in for neutron diffusion
+
+def modelParameters():
+    """ The constants of the model, part of the key of every cached evaluation (see EvalCache.py)"""
+    return (K_FRESH, K_PER_WT, K_PER_BURNUP, K_PER_POISON, POISON_BURN_RATE, DIFFUSION_PASSES)
+
+def toQuadGrid(quads):
+    """(..., h, w, 4) quadrant array -> (..., 2h, 2w) grid of half assemblies"""
+    shape = quads.shape[:-3]
+    h, w = quads.shape[-3:-1]
+    grid = quads.reshape(shape + (h, w, 2, 2))
+    return np.swapaxes(grid, -3, -2).reshape(shape + (2 * h, 2 * w))
+
+def fromQuadGrid(grid):
+    """(..., 2h, 2w) grid of half assemblies -> (..., h, w, 4) quadrant array"""
+    shape = grid.shape[:-2]
+    h, w = grid.shape[-2] // 2, grid.shape[-1] // 2
+    quads = np.swapaxes(grid.reshape(shape + (h, 2, w, 2)), -3, -2)
+    return quads.reshape(shape + (h, w, 4))
+
+def radialFlux(height, width, centre):
+    """Fundamental mode flux shape on the (2h, 2w) quadrant grid.  centre is (x, y) in
+    tile units, e.g. (7.5, 7.5) for a 15x15 full core or (0.5, 0.5) for a quarter core"""
+    ys, xs = np.indices((2 * height, 2 * width))
+    cx, cy = centre
+    radius = np.sqrt(((xs + 0.5) / 2.0 - cx) ** 2 + ((ys + 0.5) / 2.0 - cy) ** 2)
+    extrapolated = radius.max() + 1.0
+    return np.cos(radius * (math.pi / 2.0) / extrapolated)
+
+def kInfinity(burnup, enrichment, poisons):
+    """Quadrant k-infinity, enrichment and poisons are per assembly (..., h, w)"""
+    return K_FRESH + K_PER_WT * enrichment[..., None] - K_PER_BURNUP * burnup - K_PER_POISON * poisons[..., None]
+
+def powerShape(burnup, enrichment, poisons, fuel, centre):
+    """Normalised quadrant power (mean 1 over fuelled quadrants), shape (..., h, w, 4).
+    fuel is a boolean (..., h, w) mask of positions holding an assembly."""
+    height, width = fuel.shape[-2:]
+    fuelGrid = toQuadGrid(np.repeat(fuel[..., None], 4, axis=-1))
+    power = np.where(fuelGrid, toQuadGrid(kInfinity(burnup, enrichment, poisons)) * radialFlux(height, width, centre), 0.0)
+    for i in range(DIFFUSION_PASSES):
+        padded = np.pad(power, [(0, 0)] * (power.ndim - 2) + [(1, 1), (1, 1)])
+        neighbours = padded[..., :-2, 1:-1] + padded[..., 2:, 1:-1] + padded[..., 1:-1, :-2] + padded[..., 1:-1, 2:]
+        power = np.where(fuelGrid, 0.5 * power + 0.125 * neighbours, 0.0)
+    fuelled = fuelGrid.sum(axis=(-2, -1), keepdims=True)
+    mean = power.sum(axis=(-2, -1), keepdims=True) / np.maximum(fuelled, 1)
+    return fromQuadGrid(power / np.where(mean > 0, mean, 1.0))
+
+def peakingFactor(burnup, enrichment, poisons, fuel, centre):
+    """Maximum normalised quadrant power, one value per core in the batch"""
+    return powerShape(burnup, enrichment, poisons, fuel, centre).max(axis=(-3, -2, -1))
+
+def burnCycles(burnup, enrichment, poisons, fuel, centre, cycles=1, cycleBurnup=CYCLE_BURNUP):
+    """Deplete every quadrant of every core in the batch.  One batched step per cycle.
+    Returns (burnup, poisons, power of the last cycle) as new arrays."""
+    burnup = np.array(burnup, dtype=np.float32)
+    poisons = np.array(poisons, dtype=np.float32)
+    power = np.zeros_like(burnup)
+    for cycle in range(cycles):
+        power = powerShape(burnup, enrichment, poisons, fuel, centre)
+        burnup = burnup + (power * cycleBurnup).astype(np.float32)
+        poisons = poisons * np.exp(-POISON_BURN_RATE * power.mean(axis=-1)).astype(np.float32)
+    return burnup, poisons, power
+
+def quadColors(burnup, enrichment, poisons):
+    """RGB colour of every quadrant, shape (..., h, w, 4, 3), matching Assembly.quadColor"""
+    red = np.minimum(255.0, burnup * BURNUP_RED_SCALE)
+    green = np.maximum(0.0, enrichment[..., None] * Assembly.UO2_scaler * (1.0 - burnup / DEPLETED_BURNUP))
+    blue = np.broadcast_to(np.minimum(255.0, poisons)[..., None], burnup.shape)
+    return np.stack([red, green, blue], axis=-1)
+
+def burnState(state, cycles=1, cycleBurnup=CYCLE_BURNUP):
+    """Burn a CoreState in place, returns the quadrant power of the last cycle"""
+    fuel = state.labelIndex >= 0
+    burnup, poisons, power = burnCycles(state.burnup, state.enrichment, state.poisons, fuel, state.centre, cycles, cycleBurnup)
+    state.burnup = np.where(fuel[..., None], burnup, state.burnup)
+    state.poisons = np.where(fuel, poisons, state.poisons)
+    state.forgetHash()
+    return power
@@ -0,0 +1,170 @@
+#
+#  Engineering rules of a loading pattern, kept up to date move by move.
+#
+import math
+
+EMPTY = "Empty"
+FEED_RING_FRACTION = 0.5 # share of the positions of a ring that may hold feed assemblies
+QUADRANT_TILT_LIMIT = 0.01 # largest spread of the quadrants' enrichment, as a fraction of their mean
+NO_FUEL = (False, False, False, False, 0.0)
+
+def assemblyRecord(assembly):
+    """ (fuel, feed, burned, leak, enrichment) of an Assembly as far as the rules are concerned"""
+    if assembly.label is None or assembly.label == EMPTY:
+        return NO_FUEL
+    fresh = assembly.isFresh()
+    return (True, fresh, not fresh, bool(assembly.SUSPECTED_FOR_LEAK), float(assembly.UO2WT))
+
+class ConstraintChecker:
+    """ The rules of one CoreType, counted per position, ring and quadrant so set() is O(neighbours)"""
+    def __init__(self, coreType, feedFraction=FEED_RING_FRACTION, tiltLimit=QUADRANT_TILT_LIMIT):
+        self.coreType = coreType
+        self.tiltLimit = tiltLimit
+        self.width = coreType.width
+        size = coreType.width * coreType.height
+        self.adjacent = [tuple(int(n) for n in row if n >= 0) for row in coreType.neighbours]
+        cx, cy = coreType.symmetry.centre
+        self.positions = [(k % self.width, k // self.width) for k in range(size)]
+        self.ring = [max(abs(x - cx), abs(y - cy)) for x, y in self.positions]
+        ringSizes = [0] * (max(self.ring) + 1)
+        self.ringPositions = [[] for _ in ringSizes]
+        self.quadrants = [()] * size # (quadrant, weight): a position on an axis is shared by two, the centre by four
+        for y, length in enumerate(coreType.rowLengths):
+            for x in range(length):
+                if coreType.enrichment[y][x] is None:
+                    continue
+                k = y * self.width + x
+                ringSizes[self.ring[k]] += 1
+                self.ringPositions[self.ring[k]].append(k)
+                if coreType.fullCore:
+                    xs = (0, 1) if x == cx else ((0,) if x < cx else (1,))
+                    ys = (0, 1) if y == cy else ((0,) if y < cy else (1,))
+                    self.quadrants[k] = tuple((2 * qy + qx, 1.0 / (len(xs) * len(ys))) for qy in ys for qx in xs)
+        self.ringLimits = [math.ceil(feedFraction * n) for n in ringSizes]
+        self.records = [NO_FUEL] * size
+        self.freshNeighbours = [0] * size # feed assemblies beside each position
+        self.freshPairs = 0
+        self.ringFeed = [0] * len(ringSizes)
+        self.quadrantEnrichment = [0.0] * 4
+        self.burned = 0
+        self.leakers = 0
+        self.violating = set() # (x, y) of the assemblies for which isViolating() is True
+        self.version = 0 # changes whenever the assemblies do
+
+    @classmethod
+    def fromCore(cls, core, coreType, **limits):
+        """ The checker of a core (rows of Assemblies, read as core[y][x])"""
+        checker = cls(coreType, **limits)
+        for y, row in enumerate(core):
+            for x, assembly in enumerate(row):
+                checker.set(x, y, assembly)
+        return checker
+
+    def set(self, x, y, assembly):
+        """ Puts an assembly at x, y"""
+        self.setRecord(y * self.width + x, assemblyRecord(assembly))
+
+    def setRecord(self, k, record):
+        old = self.records[k]
+        if old == record:
+            return
+        ring = self.ring[k]
+        reload, crowded = self.reload, self.ringFeed[ring] > self.ringLimits[ring]
+        self._count(k, old, -1)
+        self.records[k] = record
+        self._count(k, record, 1)
+        self.version += 1
+        # only k can change, and its neighbours when it comes or stops being feed, unless the ring crosses
+        # its limit or the core becomes a reload
+        if self.reload != reload:
+            changed = range(len(self.records))
+        elif (self.ringFeed[ring] > self.ringLimits[ring]) != crowded:
+            changed = self.ringPositions[ring] + list(self.adjacent[k])
+        elif old[1] != record[1]:
+            changed = (k,) + self.adjacent[k]
+        else:
+            changed = (k,)
+        for n in changed:
+            if self.records[n][0] and self._violating(n):
+                self.violating.add(self.positions[n])
+            else:
+                self.violating.discard(self.positions[n])
+
+    def _count(self, k, record, sign):
+        fuel, feed, burned, leak, enrichment = record
+        if not fuel:
+            return
+        if feed:
+            self.freshPairs += sign * self.freshNeighbours[k]
+            for n in self.adjacent[k]:
+                self.freshNeighbours[n] += sign
+            self.ringFeed[self.ring[k]] += sign
+        self.burned += sign * burned
+        self.leakers += sign * leak
+        for q, weight in self.quadrants[k]:
+            self.quadrantEnrichment[q] += sign * weight * enrichment
+
+    @property
+    def reload(self):
+        """ True when the core holds burned fuel, so the feed rules apply"""
+        return self.burned > 0
+
+    def quadrantTilt(self):
+        """ (largest - smallest) / mean of the quadrants' enrichment, 0 for quarter and eighth cores"""
+        mean = sum(self.quadrantEnrichment) / 4.0
+        if mean <= 0.0:
+            return 0.0
+        return (max(self.quadrantEnrichment) - min(self.quadrantEnrichment)) / mean
+
+    def _violating(self, k):
+        fuel, feed, burned, leak, enrichment = self.records[k]
+        if leak:
+            return True
+        return feed and self.reload and (self.freshNeighbours[k] > 0 or self.ringFeed[self.ring[k]] > self.ringLimits[self.ring[k]])
+
+    def isViolating(self, x, y):
+        """ True when the assembly at x, y breaks a rule of its own (the quadrant balance belongs to no
+        single assembly)"""
+        return (x, y) in self.violating
+
+    def violatingPositions(self):
+        """ The (x, y) of every assembly that breaks a rule: the checker's own set, not to be changed"""
+        return self.violating
+
+    def violations(self):
+        """ Short descriptions of the rules broken, [] when there are none"""
+        found = []
+        if self.reload and self.freshPairs:
+            found.append("{} fresh pair(s) face to face".format(self.freshPairs))
+        if self.reload:
+            for ring, (feed, limit) in enumerate(zip(self.ringFeed, self.ringLimits)):
+                if feed > limit:
+                    found.append("ring {} has {} feed (max {})".format(ring, feed, limit))
+        tilt = self.quadrantTilt()
+        if tilt > self.tiltLimit:
+            found.append("quadrant tilt {:.1f} % (max {:.1f} %)".format(100.0 * tilt, 100.0 * self.tiltLimit))
+        if self.leakers:
+            found.append("{} suspected leaker(s) loaded".format(self.leakers))
+        return found
+
+    def tryMoves(self, moves):
+        """ (violatingPositions(), violations()) as they would be after the swaps among moves (allMoves
+        format); the checker is left as it was"""
+        undo = []
+        version = self.version
+        for move in moves:
+            if move[0] != "swap":
+                continue
+            a = move[1][1] * self.width + move[1][0]
+            b = move[2][1] * self.width + move[2][0]
+            one, two = self.records[a], self.records[b]
+            self.setRecord(a, two)
+            self.setRecord(b, one)
+            undo.append((a, b, one, two))
+        try:
+            return frozenset(self.violating), self.violations()
+        finally:
+            for a, b, one, two in reversed(undo):
+                self.setRecord(a, one)
+                self.setRecord(b, two)
+            self.version = version
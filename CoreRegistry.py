@@ -0,0 +1,154 @@
+#
+#  Core geometries read from resources/cores/*.json.
+#
+import glob
+import json
+import os
+import numpy as np
+from Assembly import Assembly
+from Geometry import TileGeometry
+from Symmetry import coreSymmetry
+from Zobrist import zobristTable
+
+CORE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "cores")
+BLANK_TOKEN = "."
+
+class CoreType:
+    """ One core geometry: layout rows of '.' or starting enrichment, column letters and first row number"""
+    def __init__(self, spec, source=None):
+        self.name = spec["name"]
+        self.source = source
+        self.order = spec.get("order", 0)
+        self.fullCore = bool(spec.get("fullCore", False))
+        self.tileSize = int(spec["tileSize"])
+        self.labelFontSize = int(spec.get("labelFontSize", 14))
+        self.columns = spec["columns"].split()
+        self.firstRow = int(spec.get("firstRow", 1))
+        self.enrichment = []
+        for y, row in enumerate(spec["layout"]):
+            tokens = row.split()
+            if not tokens:
+                raise ValueError(self.name + ": row " + str(y) + " of the layout is empty")
+            self.enrichment.append([None if token == BLANK_TOKEN else float(token) for token in tokens])
+        self.rowLengths = tuple(len(row) for row in self.enrichment)
+        self.width = max(self.rowLengths)
+        self.height = len(self.rowLengths)
+        if len(self.columns) < self.width:
+            raise ValueError(self.name + ": " + str(self.width) + " columns need labels, " + str(len(self.columns)) + " given")
+        self._derived = {}
+        self._layouts = {}
+
+    @classmethod
+    def fromFile(cls, path):
+        with open(path) as file:
+            return cls(json.load(file), path)
+
+    def _cached(self, key, build):
+        value = self._derived.get(key)
+        if value is None:
+            value = self._derived[key] = build()
+        return value
+
+    @property
+    def alphabetCoords(self):
+        """ Column letters counted from the right hand edge, as ALPHABETCOORDS in FuelManager"""
+        return self._cached("alphabetCoords", lambda: self.columns[self.width - 1::-1])
+
+    def coords(self, x, y):
+        """ Name of position x, y, e.g. 'H8'"""
+        return self.columns[x] + str(y + self.firstRow)
+
+    @property
+    def blankMask(self):
+        """ (height, width) bool array, True where there is no fuel position"""
+        def build():
+            mask = np.ones((self.height, self.width), dtype=bool)
+            for y, row in enumerate(self.enrichment):
+                mask[y, :len(row)] = [e is None for e in row]
+            return mask
+        return self._cached("blankMask", build)
+
+    @property
+    def neighbours(self):
+        """ (width * height, 4) array of the flat indices (y * width + x) of the fuel positions left, right,
+        above and below each position, -1 where there is none"""
+        def build():
+            blank = self.blankMask
+            table = np.full((self.height * self.width, 4), -1, dtype=np.intp)
+            for y in range(self.height):
+                for x in range(self.width):
+                    if blank[y, x]:
+                        continue
+                    for k, (nx, ny) in enumerate(((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))):
+                        if 0 <= nx < self.width and 0 <= ny < self.height and not blank[ny, nx]:
+                            table[y * self.width + x, k] = ny * self.width + nx
+            return table
+        return self._cached("neighbours", build)
+
+    @property
+    def symmetry(self):
+        """ The rotation and mirror tables of this geometry (see Symmetry.py)"""
+        return self._cached("symmetry", lambda: coreSymmetry(self.rowLengths, self.fullCore))
+
+    @property
+    def zobrist(self):
+        """ The position keys of the Zobrist hashes of this geometry (see Zobrist.py)"""
+        return self._cached("zobrist", lambda: zobristTable(self.rowLengths, self.fullCore))
+
+    def layout(self, windowWidth, windowHeight, inventoryColumnSize, tilesPerColumn):
+        """ (xMainMargin, xStartMargin, yMargin, TileGeometry) placing this core in a window of the given size"""
+        key = (windowWidth, windowHeight, inventoryColumnSize, tilesPerColumn)
+        if key not in self._layouts:
+            tileSize = self.tileSize
+            xMainMargin = int((windowWidth - (tileSize * self.width + (self.width - 1))) / 2)
+            xStartMargin = 25
+            yMargin = int((windowHeight - (tileSize * self.height + (self.height - 1))) / 2) - 60
+            geometry = TileGeometry(tileSize, xMainMargin, xStartMargin, yMargin, self.height, inventoryColumnSize, tilesPerColumn)
+            self._layouts[key] = (xMainMargin, xStartMargin, yMargin, geometry)
+        return self._layouts[key]
+
+    def startingCore(self):
+        """ A new core (rows of new Assemblies) loaded as the layout describes"""
+        return [[Assembly(None) if e is None else Assembly(self.coords(x, y), e) for x, e in enumerate(row)]
+                for y, row in enumerate(self.enrichment)]
+
+class CoreRegistry:
+    """ The core types found in a directory of .json files, by name"""
+    def __init__(self, directory=CORE_DIRECTORY):
+        self.directory = directory
+        self.types = {}
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            self.add(CoreType.fromFile(path))
+
+    def add(self, coreType):
+        if coreType.name in self.types:
+            raise ValueError("core type " + coreType.name + " is defined in both " + str(self.types[coreType.name].source) +
+                             " and " + str(coreType.source))
+        self.types[coreType.name] = coreType
+        return coreType
+
+    def get(self, name):
+        try:
+            return self.types[name]
+        except KeyError:
+            raise KeyError("unknown core type: " + str(name) + " (no such file in " + self.directory + ")") from None
+
+    def __contains__(self, name):
+        return name in self.types
+
+    def names(self):
+        """ Core type names in the order they are offered to the user"""
+        return [t.name for t in sorted(self.types.values(), key=lambda t: (t.order, t.name))]
+
+_REGISTRY = None
+
+def coreRegistry():
+    """ The registry of resources/cores, read on first use"""
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = CoreRegistry()
+    return _REGISTRY
+
+def isFullCore(coreType):
+    """ True for core types holding the whole core, False for quarter and eighth cores"""
+    return coreRegistry().get(coreType).fullCore
@@ -0,0 +1,268 @@
+#
+#  Headless, array backed core for scripted studies.
+#
+import numpy as np
+from Assembly import Assembly
+from Symmetry import coreSymmetry, QUADRANT_TURN
+from CoreRegistry import isFullCore
+from Zobrist import CoreHash, zobristTable, recordKeys, stateRecord
+
+BLANK_INDEX = -1  # not a fuel position (outside the core outline)
+EMPTY_INDEX = -2  # fuel position with no assembly loaded
+
+class CoreState:
+    """Holds the core as NumPy arrays indexed [y, x] (burnup has four quadrants); call forgetHash() after
+       writing the arrays directly"""
+    FIELDS = ("labelIndex", "enrichment", "mox", "burnup", "poisons", "leak", "moved")
+
+    def __init__(self, width, height, coreType="Full", alphabetCoords=None):
+        self.width = width
+        self.height = height
+        self.coreType = coreType
+        self.alphabetCoords = alphabetCoords
+        self.rowLengths = [width] * height
+        self.labels = []
+        self.labelLookup = {}
+        self.labelIndex = np.full((height, width), BLANK_INDEX, dtype=np.int32)
+        self.enrichment = np.zeros((height, width), dtype=np.float32)
+        self.mox = np.zeros((height, width), dtype=np.float32)
+        self.burnup = np.zeros((height, width, 4), dtype=np.float32)
+        self.poisons = np.zeros((height, width), dtype=np.float32)
+        self.leak = np.zeros((height, width), dtype=bool)
+        self.moved = np.zeros((height, width), dtype=bool)
+        self.zobrist = None
+
+    @classmethod
+    def fromAssemblyCore(cls, core, coreType="Full", alphabetCoords=None):
+        """Build the arrays from the nested lists of Assembly objects used by the GUI"""
+        width = max(len(row) for row in core)
+        state = cls(width, len(core), coreType, alphabetCoords)
+        state.rowLengths = [len(row) for row in core]
+        for y, row in enumerate(core):
+            for x, assy in enumerate(row):
+                state.setAssembly(x, y, assy)
+        state.moved[:] = [[assy.moved for assy in row] + [False] * (width - len(row)) for row in core]
+        coreHash = getattr(core, "zobrist", None) # a CoreSnapshot that keeps its hash, the same as the state's
+        if coreHash is not None and coreHash.table is zobristTable(tuple(state.rowLengths), isFullCore(coreType)):
+            state.zobrist = core.coreHash(coreHash.table).copy()
+        return state
+
+    def toAssemblyCore(self):
+        """Rebuild nested lists of Assembly objects (the layout the GUI draws)"""
+        return [[self.getAssembly(x, y) for x in range(self.rowLengths[y])] for y in range(self.height)]
+
+    def copy(self):
+        """ Returns an independent copy of the state (the label table is shared, it is append only)"""
+        other = CoreState.__new__(CoreState)
+        other.__dict__.update(self.__dict__)
+        other.rowLengths = list(self.rowLengths)
+        for name in self.FIELDS:
+            setattr(other, name, getattr(self, name).copy())
+        if self.zobrist is not None:
+            other.zobrist = self.zobrist.copy()
+        return other
+
+    def internLabel(self, label):
+        """ Returns the index of label in the label table, adding it if needed"""
+        if label is None:
+            return BLANK_INDEX
+        if label == "Empty":
+            return EMPTY_INDEX
+        index = self.labelLookup.get(label)
+        if index is None:
+            index = len(self.labels)
+            self.labels.append(label)
+            self.labelLookup[label] = index
+        return index
+
+    def getLabel(self, x, y):
+        index = self.labelIndex[y, x]
+        if index == BLANK_INDEX:
+            return None
+        elif index == EMPTY_INDEX:
+            return "Empty"
+        return self.labels[index]
+
+    def setAssembly(self, x, y, assy):
+        """ Writes the data of an Assembly object into position x, y"""
+        self.setRecord(x, y, assy.label, assy.UO2WT, assy.Burnup, assy.BurnablePoisons, assy.MOX, assy.SUSPECTED_FOR_LEAK)
+        self.moved[y, x] = assy.moved
+
+    def setRecord(self, x, y, label, enrichment, burnup, poisons, mox=0, leak=False):
+        """ Writes the data of an assembly into position x, y without making an Assembly object"""
+        self.labelIndex[y, x] = self.internLabel(label)
+        self.enrichment[y, x] = enrichment
+        self.mox[y, x] = mox
+        self.burnup[y, x] = burnup
+        self.poisons[y, x] = poisons
+        self.leak[y, x] = leak
+        self.moved[y, x] = False
+        self._rehash(x, y)
+
+    def getAssembly(self, x, y):
+        """ Returns a new Assembly object holding the data at position x, y"""
+        assy = Assembly(self.getLabel(x, y), float(self.enrichment[y, x]),
+                        [float(b) for b in self.burnup[y, x]], float(self.poisons[y, x]), float(self.mox[y, x]))
+        assy.SUSPECTED_FOR_LEAK = bool(self.leak[y, x])
+        assy.moved = bool(self.moved[y, x])
+        return assy
+
+    @property
+    def centre(self):
+        """ Core centre (x, y) in tile units: the middle of a full core, or the middle of
+        the H8 assembly (top left) for the quarter and eighth cores"""
+        if isFullCore(self.coreType):
+            return (self.width / 2.0, self.height / 2.0)
+        return (0.5, 0.5)
+
+    def getCoords(self, x, y):
+        """ Core coordinate name of a position, as getCoords() in FuelManager"""
+        if self.alphabetCoords is None:
+            return str(x) + "," + str(y)
+        return self.alphabetCoords[self.width - x - 1] + str(y + 1)
+
+    def flatIndex(self, pos):
+        x, y = pos
+        return int(y) * self.width + int(x)
+
+    def position(self, index):
+        y, x = divmod(int(index), self.width)
+        return (x, y)
+
+    @property
+    def symmetry(self):
+        """ The precomputed rotation and mirror tables of this geometry (see Symmetry.py)"""
+        return coreSymmetry(self.rowLengths, isFullCore(self.coreType))
+
+    def rotationOrbit(self, rot1):
+        """ The four flat positions visited by a rotation about the core centre, as makeRotate.
+        None for the partial cores, where a rotation turns the assembly in place."""
+        orbit = self.symmetry.rotationOrbit(rot1)
+        return None if orbit is None else [self.flatIndex(p) for p in orbit]
+
+    def turnAssembly(self, pos, direction):
+        """ Rotates the quadrants of the assembly at pos (a rotation in a quarter or eighth core)"""
+        x, y = pos
+        self.burnup[y, x] = self.burnup[y, x][list(QUADRANT_TURN[direction])]
+        self.moved[y, x] = True
+        self._rehash(x, y)
+
+    def gather(self, perm):
+        """ Reorders every array so that position p takes the data from position perm[p]"""
+        perm = np.asarray(perm, dtype=np.intp)
+        if self.zobrist is not None:
+            self.zobrist.gather(perm.tolist(), np.flatnonzero(perm != np.arange(perm.size)).tolist())
+        for name in self.FIELDS:
+            array = getattr(self, name)
+            flat = array.reshape((self.width * self.height,) + array.shape[2:])
+            setattr(self, name, flat[perm].reshape(array.shape))
+
+    def _keys(self, x, y):
+        index = self.labelIndex[y, x]
+        if index == BLANK_INDEX:
+            return None
+        record = stateRecord(self.getLabel(x, y), self.enrichment[y, x], self.mox[y, x], self.burnup[y, x],
+                             self.poisons[y, x], self.leak[y, x])
+        return recordKeys(record, self.zobrist.table.names)
+
+    def _rehash(self, x, y):
+        if self.zobrist is not None:
+            self.zobrist.set(self.zobrist.table.flatIndex(x, y), self._keys(x, y))
+
+    def coreHash(self):
+        """ The CoreHash of the state (see Zobrist.py), equal to that of the assembly core it was made from"""
+        if self.zobrist is None:
+            self.zobrist = CoreHash(zobristTable(tuple(self.rowLengths), isFullCore(self.coreType)))
+            for y, length in enumerate(self.rowLengths):
+                for x in range(length):
+                    self._rehash(x, y)
+        return self.zobrist
+
+    def forgetHash(self):
+        """ The arrays were written directly: the hash is worked out again when next asked for"""
+        self.zobrist = None
+
+    def swap(self, swap1, swap2):
+        """Carries out a swap operation, as makeSwap"""
+        self.apply_moves([["swap", swap1, swap2]])
+
+    def rotate(self, rot1, direction):
+        """Carries out a rotation operation, as makeRotate"""
+        self.apply_moves([["rotate", rot1, direction]])
+
+    def remove(self, removeCoords, inventory):
+        """Moves the assembly at removeCoords into inventory and leaves the position 'Empty'"""
+        x, y = removeCoords
+        retiredAssembly = self.getAssembly(x, y)
+        self.labelIndex[y, x] = EMPTY_INDEX
+        self.enrichment[y, x] = 0
+        self.mox[y, x] = 0
+        self.burnup[y, x] = 0
+        self.poisons[y, x] = 0
+        self.leak[y, x] = False
+        self.moved[y, x] = False
+        self._rehash(x, y)
+        return inventory.addInventoryItem(retiredAssembly, 1, "extracted from pos. " + self.getCoords(x, y))
+
+    def load(self, loadCoords, inventory, inventoryID):
+        """Loads an assembly from inventory, retiring whatever is at loadCoords first (as makeLoad)"""
+        x, y = loadCoords
+        assy = inventory.removeInventoryItem(inventoryID)
+        removed = ["noMove", 0, 0]
+        if self.labelIndex[y, x] != EMPTY_INDEX:
+            removed = ["remove", loadCoords, self.remove(loadCoords, inventory)]
+        self.setAssembly(x, y, assy)
+        self.moved[y, x] = True
+        return removed
+
+    def apply_moves(self, moves, inventory=None):
+        """Apply a list of moves in the allMoves format, gathering runs of swaps and rotations at once.
+           Returns the moves made by loads/removes."""
+        n = self.width * self.height
+        perm = list(range(n))
+        touched = set()
+        pending = False
+        records = []
+        for move in moves:
+            kind = move[0]
+            if kind == "swap":
+                a = self.flatIndex(move[1])
+                b = self.flatIndex(move[2])
+                perm[a], perm[b] = perm[b], perm[a]
+                touched.update((a, b))
+                pending = True
+            elif kind == "rotate":
+                if not self.symmetry.fullCore:
+                    pos = self.position(perm[self.flatIndex(move[1])]) # where the data is before the gather
+                    self.turnAssembly(pos, move[2])
+                    continue
+                targets, sources = self.symmetry.rotationPerm(move[1], move[2])
+                values = [perm[i] for i in sources]
+                for i, value in zip(targets, values):
+                    perm[i] = value
+                touched.update(targets)
+                pending = True
+            elif kind in ("load", "remove"):
+                if inventory is None:
+                    raise ValueError("an inventory is needed to apply '" + kind + "' moves")
+                if pending:
+                    self._flush(perm, touched)
+                    perm = list(range(n))
+                    touched = set()
+                    pending = False
+                if kind == "load":
+                    records.append(self.load(move[1], inventory, move[2]))
+                else:
+                    records.append(["remove", move[1], self.remove(move[1], inventory)])
+            elif kind == "noMove":
+                pass
+            else:
+                raise ValueError("unknown command in history: " + str(kind))
+        if pending:
+            self._flush(perm, touched)
+        return records
+
+    def _flush(self, perm, touched):
+        self.gather(perm)
+        flatMoved = self.moved.reshape(-1)
+        flatMoved[list(touched)] = True
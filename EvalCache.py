@@ -0,0 +1,155 @@
+#
+#  Memoized pattern evaluations: an LRU, spilled to SQLite when LPT_EVAL_CACHE names a file.
+#
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import BurnupModel
+from Instrumentation import log
+
+PEAKING = "peaking"
+DISK_LIMIT = 100000 # rows kept in the file, the least recently used go first
+
+def geometryKey(state):
+    """ The geometry of a CoreState: hashes of different core types must not meet"""
+    return (state.coreType, tuple(state.rowLengths))
+
+def peakingKey(state):
+    """ Key of the peaking factor of a CoreState, the same for its symmetric images"""
+    return (PEAKING, geometryKey(state), state.coreHash().canonical(), BurnupModel.modelParameters())
+
+class EvalCache:
+    """ Bounded, thread safe LRU of evaluation results, optionally spilling to an SQLite file at path"""
+    def __init__(self, maxSize=2048, path=None, diskLimit=DISK_LIMIT):
+        self.maxSize = maxSize
+        self.path = path
+        self.diskLimit = diskLimit
+        self.results = OrderedDict()
+        self.onDisk = set() # keys of the results held in memory that the file already has
+        self.hits = 0
+        self.misses = 0
+        self.diskHits = 0
+        self.lookups = 0 # made here by lookup(), the rest are recorded
+        self.lookupTime = 0.0 # seconds spent looking in the cache (memory and file) by lookup()
+        self.computeTime = 0.0 # seconds spent computing the misses
+        self.db = None
+        self.lock = threading.RLock()
+
+    def _disk(self):
+        if self.db is None and self.path:
+            try:
+                self.db = sqlite3.connect(self.path, check_same_thread=False) # used under the lock
+                self.db.execute("CREATE TABLE IF NOT EXISTS evaluations (key TEXT PRIMARY KEY, value BLOB, used REAL)")
+                self.db.execute("CREATE INDEX IF NOT EXISTS evaluationsUsed ON evaluations (used)")
+            except sqlite3.Error as error:
+                log.error("cannot open the evaluation cache %s, keeping it in memory only: %s", self.path, error)
+                self.db = self.path = None
+        return self.db
+
+    def _diskFailed(self, error):
+        """ Leaves the file after an error: the cache goes on in memory only"""
+        log.error("evaluation cache %s failed, keeping it in memory only: %s", self.path, error)
+        try:
+            self.db.close()
+        except sqlite3.Error:
+            pass
+        self.db = self.path = None
+        self.onDisk.clear()
+
+    def stats(self):
+        """ Returns (hits, misses, disk hits, mean lookup ms, mean compute ms, number of cached results)"""
+        return (self.hits, self.misses, self.diskHits, self.lookupTime * 1000.0 / self.lookups if self.lookups else 0.0,
+                self.computeTime * 1000.0 / self.misses if self.misses else 0.0, len(self.results))
+
+    def get(self, key):
+        """ The cached result or None (a miss is not counted, see lookup)"""
+        with self.lock:
+            result = self.results.get(key)
+            if result is not None:
+                self.results.move_to_end(key)
+                return result
+            db = self._disk()
+            if db is not None:
+                try:
+                    row = db.execute("SELECT value FROM evaluations WHERE key = ?", (repr(key),)).fetchone()
+                    if row is not None:
+                        with db:
+                            db.execute("UPDATE evaluations SET used = ? WHERE key = ?", (time.time(), repr(key)))
+                        result = pickle.loads(row[0])
+                except sqlite3.Error as error:
+                    self._diskFailed(error)
+                    return None
+                if row is not None:
+                    self.diskHits += 1
+                    self.put(key, result)
+                    self.onDisk.add(key)
+            return result
+
+    def put(self, key, result):
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            if len(self.results) > self.maxSize:
+                oldest = self.results.popitem(last=False)
+                if oldest[0] in self.onDisk:
+                    self.onDisk.discard(oldest[0])
+                else:
+                    self._spill([oldest])
+
+    def record(self, hit, seconds=0.0):
+        """ Counts a lookup answered elsewhere (in a worker process, see Optimizer.py)"""
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.computeTime += seconds
+
+    def lookup(self, key, compute):
+        start = time.perf_counter()
+        result = self.get(key)
+        hit = result is not None
+        computed = time.perf_counter()
+        if not hit: # computed outside the lock, the search thread may want the cache meanwhile
+            result = compute()
+            self.put(key, result)
+        with self.lock:
+            self.record(hit, time.perf_counter() - computed)
+            self.lookups += 1
+            self.lookupTime += computed - start
+        return result
+
+    def items(self, kind):
+        """ {key: result} of the results of one kind held in memory"""
+        with self.lock:
+            return {key: result for key, result in self.results.items() if key[0] == kind}
+
+    def _spill(self, entries):
+        """ Writes entries [(key, result)] to the file, returns whether it has them"""
+        db = self._disk()
+        if db is None or not entries:
+            return False
+        now = time.time()
+        try:
+            with db:
+                db.executemany("INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?)",
+                               [(repr(key), pickle.dumps(result, pickle.HIGHEST_PROTOCOL), now) for key, result in entries])
+                excess = db.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0] - self.diskLimit
+                if excess > 0:
+                    db.execute("DELETE FROM evaluations WHERE key IN (SELECT key FROM evaluations ORDER BY used LIMIT ?)", (excess,))
+        except sqlite3.Error as error: # a full disk or a locked file must not reach the GUI or the search
+            self._diskFailed(error)
+            return False
+        return True
+
+    def close(self):
+        """ Writes what the file (if any) does not have yet so the next session finds it"""
+        with self.lock:
+            if self._spill([(key, result) for key, result in self.results.items() if key not in self.onDisk]):
+                self.onDisk.update(self.results)
+            if self.db is not None:
+                self.db.close()
+                self.db = None
@@ -0,0 +1,34 @@
+import pygame
+from pygame.locals import *
+
+class EventScheduler:
+    """ Hands the main loop its events: blocking when idle, polling when busy, full rate when animating"""
+    def __init__(self, fps, busyTimeout=100, idleTimeout=500):
+        self.fps = fps
+        self.busyTimeout = busyTimeout
+        self.idleTimeout = idleTimeout # ms, finite: pygame.event.wait(0) would never return without an event
+        self.clock = pygame.time.Clock()
+
+    def nextEvents(self, animating=False, busy=False):
+        """ Returns the next burst of events with MOUSEMOTION coalesced"""
+        if animating:
+            self.clock.tick(self.fps)
+            events = pygame.event.get()
+        else:
+            first = pygame.event.wait(self.busyTimeout if busy else self.idleTimeout)
+            events = [] if first.type == NOEVENT else [first]
+            events.extend(pygame.event.get())
+            self.clock.tick()
+        return coalesceMotion(events)
+
+def coalesceMotion(events):
+    """ Drops all but the last MOUSEMOTION of a burst, only the latest pointer position matters"""
+    last = None
+    for i, event in enumerate(events):
+        if event.type == MOUSEMOTION:
+            last = i
+    return [event for i, event in enumerate(events) if event.type != MOUSEMOTION or i == last]
+
+def isQuitEvent(event):
+    """ Window closed or Esc pressed"""
+    return event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE)
@@ -4,14 +4,35 @@
 #  Copyright 2021 Paramita ltd
 #  Initial commit by : Andrew Whyte 29/01/2021
 #
-import pygame, sys, random
+# first, startup is timed from this import
+from Instrumentation import (log, timed, timer, count, frame, mark, reportStartup,
+                             configure, setProfiling, overlayLines, dump, PROFILE)
+import os, pygame, sys, random
 from pygame.locals import *
-from math import sqrt
 from DropDown import DropDown
 from Checkbox import Checkbox
 from Assembly import Assembly
-from StoredInventory import StoredInventory, InventoryItem
-import copy
+from StoredInventory import StoredInventory
+from CoreState import CoreState
+import BurnupModel
+from Optimizer import LoadingPatternOptimizer, OptimizerRunner
+from EvalCache import EvalCache
+from TileCache import TileCache
+from RenderLayer import DirtyRegions, SceneTracker
+from EventLoop import EventScheduler, isQuitEvent
+from Animator import Timeline
+from History import History, BurnCommand
+from Snapshot import CoreSnapshot
+from CoreRegistry import coreRegistry
+from Importer import importInventory, importCoreMap
+from SessionFile import SessionFile, SessionFormatError, saveSession
+from MoveExporter import MoveExporter
+from ShufflePlanner import planShuffle
+from TravelOptimizer import TravelRunner, transferTasks, poolLocation
+import TravelOptimizer
+from Resources import ResourceCache
+import multiprocessing
+mark("imports")
 
 # detect if the code has been packaged using pyinstaller
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
@@ -38,10 +59,38 @@ REDO_MSG                     = "Redo Moves"
 EMPTY_ASSEMBLY_MSG           = "Fill all Assemblies with fuel before proceeding"
 EXTRACTED_ASSEMBLY_MSG       = "extracted from pos. "
 SELECTED_INVENTORY_ITEM_MSG  = " selected from Fuel Inventory - select a location to load"
+SOLVING_MSG                  = "Searching for a loading pattern ({}) - step {}, best score {:.3f}.  Click Solve to stop"
+SOLVED_MSG                   = "Search finished - best score {:.3f} using {} moves"
+SOLVE_DISCARDED_MSG          = "Search result discarded - the core was changed during the search"
+SOLVE_FAILED_MSG             = "Search failed - see the console for details"
+IMPORTED_MSG                 = "Imported {} from {}"
+IMPORT_FAILED_MSG            = "Import failed - {}"
+SESSION_EXTENSION            = ".lps"
+IMPORT_FILE_TYPES            = [("Core maps, inventories and sessions", "*.csv *.json *.jsonl *" + SESSION_EXTENSION), ("All files", "*")]
+SESSION_FILE_TYPES           = [("Loading pattern sessions", "*" + SESSION_EXTENSION)]
+SESSION_SAVED_MSG            = "Saved {} cycles to {}"
+SESSION_OPENED_MSG           = "Opened {} - {} cycles, PgUp/PgDn to look through them"
+SAVE_FAILED_MSG              = "Save failed - {}"
+CYCLE_VIEW_MSG               = "Start of cycle {} of {} shown on the left - PgUp/PgDn to browse"
+PROFILE_DUMPED_MSG           = "Profile written to {}"
+REPLAY_PLAN_MSG              = "Replaying this cycle as {} moves ({} were made)"
+TRANSFERS_ORDERED_MSG        = "Crane route for cycle {} written - travel {} pitches ({} in plan order)"
+PROFILE_DUMP_FILE            = "./lpt_profile.json" # F4 writes here unless LPT_PROFILE names a file
+EVAL_CACHE_FILE              = os.environ.get("LPT_EVAL_CACHE") # a file to keep evaluations in between sessions, unset keeps them in memory only
+CONSTRAINTS_MSG              = "Constraints: {}"
+CONSTRAINTS_PREVIEW_MSG      = "Constraints if swapped with {}: {}"
+CONSTRAINTS_MET_MSG          = "all met"
+
+# resource files, loaded by RESOURCES when first used
+FONT_FILE   = 'Oswald-Medium.ttf'
+ICON_FILE   = 'small-window-icon.png'
+NA_SOUNDS   = ['NA1.wav', 'NA2.wav', 'NA3.wav'] # played when an import fails
+STARTUP_TARGET_MS = 300 # time to the first frame, reportStartup warns above it
 
 # Create the core constants
 CORE_TYPE = "BEAVRS"
-CORESHAPES = ["Eighth", "Quarter", "Full", "1/8 BEAVRS", "1/4 BEAVRS", "BEAVRS"]
+CORE_TYPES = coreRegistry() # every core geometry in resources/cores, add a .json file there for a new plant
+CORESHAPES = CORE_TYPES.names()
 
 WINDOWWIDTH = 1320
 WINDOWHEIGHT = 700
@@ -51,7 +100,12 @@ INVENTORY_COLUMN_SIZE = 225
 TILE_PER_COLUMN_INVENTORY = 5
 
 FPS = 30
+SWAP_SECONDS = 0.65   # time for a tile to slide to its new position
+REPLAY_SECONDS = 0.45 # the same when undoing/redoing
+REPLAY_STAGGER = 0.15 # delay between the start of successive replayed moves
 # shorthand notation
+SYMMETRY = "None" # caption of the checked symmetry box, swaps and rotations are mirrored to match
+
 BLANK = None
 BL = BLANK
 
@@ -64,6 +118,7 @@ MED_TURQUOISE = ( 33,  84, 103)
 LIT_TURQUOISE = ( 93, 154, 173)
 GREEN         = (  0, 204,   0)
 LIT_RED       = (237,  96, 106)
+ORANGE        = (255, 165,   0)
 DARKTEXT      = (100, 105, 150)
 
 BGCOLOR       = DARKTURQUOISE
@@ -73,6 +128,7 @@ TEXTCOLOR     = WHITE
 BORDERCOLOR   = BRIGHTBLUE
 TILEOUTLINE   = LIT_RED
 MOVED_ASSY    = LIT_RED
+VIOLATION_OUTLINE = ORANGE # assemblies breaking a loading pattern rule (see Constraints.py)
 BASICFONTSIZE = 20
 
 COLOR_INACTIVE      = MED_TURQUOISE
@@ -84,101 +140,85 @@ BUTTONCOLOR     = WHITE
 BUTTONTEXTCOLOR = BLACK
 MESSAGECOLOR    = WHITE
 
+# the cycles read from an opened session stay MOVE_DTYPE tables (SessionFile.moveTable), decoded if ever needed
 CYCLE_MOVE_LIST = [] # this is an output of the batch (updated only after the burn button is pressed)
+EXPORT_FILES = ['./fuel_move_list.txt', './fuel_move_list.csv', './fuel_move_list.jsonl'] # the moves of every cycle are appended
+TRANSFER_FILES = ['./fuel_transfer_list.txt', './fuel_transfer_list.csv', './fuel_transfer_list.jsonl'] # and the crane's transfers, in travel order
+TRAVEL_BUDGET = 2.0 # seconds the transfer order search may take after each burn
+TRAVEL_JOBS = [] # (cycle, TravelRunner, position names) of the transfer orders still being searched for
+RESOURCES = ResourceCache() # fonts, sounds and images
+TILE_CACHE = TileCache() # pre-rendered tiles, cleared by setCoreType when TILESIZE changes
+EVAL_CACHE = EvalCache(path=EVAL_CACHE_FILE) # peaking factors by core hash (see EvalCache.py)
+ANIMATOR = Timeline() # tiles sliding to their new positions, drawn over the (already updated) cores
+HISTORY = History() # every move and burn with its inverse, for undo and redo
+TILESIZE = None
+CORE_GEOMETRY = None # the CoreType of CORE_TYPE
+SESSION = None # the opened SessionFile the earlier cycles are read from
+VIEW_CYCLE = None # cycle whose start core is shown on the left instead of startCore
+CYCLE_VIEW = (None, None) # (cycle, history version, session) and the core made for it
+GEOMETRY = None
+OVERLAY = False # F3: frame time, allocation and timer overlay
+OVERLAY_RECT = Rect(RIGHT_MENU_POS - 350, 40, 340, 140)
+VIOLATIONS = frozenset() # (x, y) of the Main core assemblies drawn as breaking a rule
+CONSTRAINT_TEXT = "" # the rules broken, shown under the Main core
+CONSTRAINT_KEY = None # what VIOLATIONS and CONSTRAINT_TEXT were worked out for
 
 def setCoreType(b = CORE_TYPE):
     """This function sets the right data into **globals** for a set core strings
        it is called with the global CORE_TYPE at the start of main and when the core changes."""
-    global CORE_TYPE
+    global CORE_TYPE, CORE_GEOMETRY
     global NUMCOORD_START_OFFSET
-    global ALPHABETCOORD_START_OFFSET
     global ALPHABETCOORDS
     global COREWIDTH  # number of columns in the boa
     global COREHEIGHT # number of rows in the boa
     global TILESIZE
     global LABELFONTSIZE
-    global WINDOWWIDTH
-    global WINDOWHEIGHT
     global XMAIN_MARGIN
     global XSTART_MARGIN
     global YMARGIN
-    global INVENTORY_COLUMN_SIZE
+    global GEOMETRY
+    CORE_GEOMETRY = CORE_TYPES.get(b)
     CORE_TYPE = b
-    ALPHABETCOORDS = []
-    if b == "Quarter" or b == "1/4 BEAVRS":
-        NUMCOORD_START_OFFSET=8
-        ALPHABETCOORD_START_OFFSET=0
-        COREWIDTH = 8  # number of columns in the core
-        COREHEIGHT = 8 # number of rows in the core
-        TILESIZE = 35
-        print(COREWIDTH)
-    elif b == "SIMPLEEIGHTH":
-        NUMCOORD_START_OFFSET=8
-        ALPHABETCOORD_START_OFFSET=3
-        COREWIDTH = 5  # number of columns in the core
-        COREHEIGHT = 7 # number of rows in the core
-        TILESIZE = 45
-    elif b == "Eighth" or b == "1/8 BEAVRS":
-        NUMCOORD_START_OFFSET=8
-        ALPHABETCOORD_START_OFFSET=3
-        COREWIDTH = 6  # number of columns in the core
-        COREHEIGHT = 8 # number of rows in the core
-        TILESIZE = 45
-    elif b == "Full" or b=="BEAVRS":
-        NUMCOORD_START_OFFSET=1
-        ALPHABETCOORD_START_OFFSET=0
-        COREWIDTH = 15  # number of columns in the core
-        COREHEIGHT = 15 # number of rows in the core
-        TILESIZE = 25
-        LABELFONTSIZE = 14
-    else:
-        NUMCOORD_START_OFFSET=8
-        ALPHABETCOORD_START_OFFSET=0
-        COREWIDTH = 6  # number of columns in the core
-        COREHEIGHT = 6 # number of rows in the core
-        TILESIZE = 35
-    for letter in range(0,26):
-        ALPHABETCOORDS.append(str(chr(letter+65+ALPHABETCOORD_START_OFFSET))) # 65 is the start of the alphabet in ascii
-    del ALPHABETCOORDS[15]
-    del ALPHABETCOORDS[14]
-    del ALPHABETCOORDS[8]
-    XMAIN_MARGIN = int((WINDOWWIDTH - (TILESIZE * COREWIDTH + (COREWIDTH - 1))) / 2)
-    XSTART_MARGIN = 25
-    YMARGIN = int((WINDOWHEIGHT - (TILESIZE * COREHEIGHT + (COREHEIGHT - 1))) / 2) -60
+    oldTileSize = TILESIZE
+    NUMCOORD_START_OFFSET = CORE_GEOMETRY.firstRow
+    ALPHABETCOORDS = CORE_GEOMETRY.alphabetCoords
+    COREWIDTH = CORE_GEOMETRY.width
+    COREHEIGHT = CORE_GEOMETRY.height
+    TILESIZE = CORE_GEOMETRY.tileSize
+    LABELFONTSIZE = CORE_GEOMETRY.labelFontSize
+    XMAIN_MARGIN, XSTART_MARGIN, YMARGIN, GEOMETRY = CORE_GEOMETRY.layout(WINDOWWIDTH, WINDOWHEIGHT, INVENTORY_COLUMN_SIZE, TILE_PER_COLUMN_INVENTORY)
+    if TILESIZE != oldTileSize:
+        TILE_CACHE.invalidate()
 
-def main():
-    """ Entry point of the code and main program loop"""
+def setupGUI():
+    """ Opens the window and makes the fonts, sounds, buttons, menus and the example inventory: everything
+    main() needs before its loop (the benchmarks use it to draw without running the loop)"""
     #GUI messages
     global IMPORT_DISCHARGE_PATTERN_MSG, IMPORT_FUEL_INVENTORY_MSG, RESET_MSG, NEW_UNIFORM_MSG, SAVE_EXPORT_MSG, SOLVE_MSG, CLICK_TO_SWAP_MSG, SELECT_SWAP_OR_ROTATE_MSG, SWAPPING_MSG, ROTATE_MSG, REDO_MSG, CORE_SHUFFLE_MSG, EXIT_LOADING_MSG, INVENTORY_MSG, BURN_MSG, SYM_CHECKBOX_MSG, EMPTY_ASSEMBLY_MSG
     global CORE_SHUFFLE_MSG, EXIT_LOADING_MSG, INVENTORY_MSG, BURN_MSG
-    global FPSCLOCK, DISPLAYSURF, BASICFONT, LABELFONT
+    global DISPLAYSURF, BASICFONT, LABELFONT
     global DROPDOWNMENU
     global LOAD_INPUTS_SURF, LOAD_INVENT_SURF, RESET_SURF, NEW_SURF, SAVE_SURF, SOLVE_SURF, BURN_SURF, REDO_SURF
     global LOAD_INPUTS_RECT, LOAD_INVENT_RECT, RESET_RECT, NEW_RECT, SAVE_RECT, SOLVE_RECT, BURN_RECT, REDO_RECT
     global startCore, CYCLE_MOVE_LIST
     global CORE_TYPE
-    global SYMMETRY_LIST
+    global SYMMETRY_LIST, SYMMETRY
     global STORED_INVENTORY
-    global NA_SOUND_LIST
+    global REGIONS, SCENE
 
+    configure() # log level and profile file from LPT_LOG_LEVEL and LPT_PROFILE
     setCoreType() # set the global data to the right data for the core.
-    swapFrom = False # first position selected
-    swapTo = False   # second position.
-    moveFocus = False# when usinng keys we want to keep focus on the new assembly
-    swapFromx = 0    # assembly coords of the assembly to move
-    swapFromy = 0
 
-    ## pygame set up.
-    pygame.init()
-    icon = pygame.image.load('resources/small-window-icon.png')
-    pygame.display.set_icon(icon)
-    FPSCLOCK = pygame.time.Clock()
+    ## pygame set up, only the modules needed to draw (the mixer starts with the first sound)
+    RESOURCES.initDisplay()
+    pygame.display.set_icon(RESOURCES.image(ICON_FILE))
     DISPLAYSURF = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
     pygame.display.set_caption('PWR Loading Pattern Tool')
-    BASICFONT = pygame.font.Font('resources/Oswald-Medium.ttf', BASICFONTSIZE)
-    LABELFONT = pygame.font.Font('resources/Oswald-Medium.ttf', LABELFONTSIZE)
-	
-    NA_SOUND_LIST = [pygame.mixer.Sound('resources/NA1.wav'),pygame.mixer.Sound('resources/NA2.wav'),pygame.mixer.Sound('resources/NA3.wav')]
+    mark("window")
+    REGIONS = DirtyRegions(DISPLAYSURF.get_rect()) # screen areas to redraw this frame
+    SCENE = SceneTracker() # what was drawn last frame, to find the areas that changed
+    BASICFONT = RESOURCES.font(FONT_FILE, BASICFONTSIZE)
+    LABELFONT = RESOURCES.font(FONT_FILE, LABELFONTSIZE)
 
     # Store the option buttons and their rectangles in OPTIONS.
     LOAD_INPUTS_SURF, LOAD_INPUTS_RECT = makeText2(IMPORT_DISCHARGE_PATTERN_MSG,  TEXTCOLOR, BTNCOLOR, RIGHT_MENU_POS, 1* MENU_ITEM_SEPARATION)
@@ -198,111 +238,136 @@ def main():
         "Select Core", CORESHAPES, "Core Pattern Selector:")
     SYMMETRY_LIST = []
     for i, sym in enumerate(["None", "Quarter", "Eighth"]):
-        box = Checkbox(DISPLAYSURF, RIGHT_MENU_POS, (i+7)*MENU_ITEM_SEPARATION, i, TEXTCOLOR, sym[i],
-            TEXTCOLOR, TEXTCOLOR, 10, TEXTCOLOR, (28, 1), LABELFONT)
+        box = Checkbox(DISPLAYSURF, RIGHT_MENU_POS, (i+7)*MENU_ITEM_SEPARATION, i, TEXTCOLOR, sym,
+            TEXTCOLOR, BGCOLOR, 10, TEXTCOLOR, (28, 1), LABELFONT)
         SYMMETRY_LIST.append(box)
     STORED_INVENTORY = generateInventory("Example")
+    mark("setup")
+
+def main():
+    """ Entry point of the code and main program loop"""
+    global startCore, CYCLE_MOVE_LIST
+    global CORE_TYPE
+    global SYMMETRY
+    global STORED_INVENTORY
+    global OVERLAY
+
+    setupGUI()
+    SCHEDULER = EventScheduler(FPS) # sleeps on the event queue while nothing is happening
+    swapFrom = False # first position selected
+    swapTo = False   # second position.
+    moveFocus = False# when usinng keys we want to keep focus on the new assembly
+    swapFromx = 0    # assembly coords of the assembly to move
+    swapFromy = 0
     mainCore, startCore, solutionSeq = generateNewPattern(CORE_TYPE)
-    allMoves = [] # list of moves made from the solved configuration
-    redoMoves = [] # backup of undone moves list.
+    solver = None # background loading pattern search started by the Solve button
+    hovered = None # [x, y] of the Main core tile under the mouse
 
     msg = CLICK_TO_SWAP_MSG # contains the message to show in the upper left corner.
+    renderFrame(mainCore, startCore, STORED_INVENTORY, msg) # before the loop waits for the first event
+    mark("first frame")
+    reportStartup(STARTUP_TARGET_MS)
     while True: # main game loop
-        # start by drawing the screen (in case any junk is left over from the last loop)
-        drawGUI(mainCore, startCore, STORED_INVENTORY, msg)
-        checkForQuit()
-        event_list = pygame.event.get()
+        # blocks until there is input, or a short while if a search is running
+        event_list = SCHEDULER.nextEvents(animating=ANIMATOR.active(), busy=solver is not None or bool(TRAVEL_JOBS))
+        count("events", len(event_list))
+        # the dropdown looks at the whole burst at once (motion is already coalesced)
+        if any(event.type == MOUSEBUTTONDOWN or event.type == MOUSEMOTION for event in event_list):
+            selected_option = DROPDOWNMENU.update(event_list)
+            if selected_option >= 0:
+                CORE_TYPE = DROPDOWNMENU.options[selected_option]
+                log.info("core type %s", CORE_TYPE)
+                ANIMATOR.skip()
+                mainCore, startCore, solutionSeq = generateNewPattern(CORE_TYPE) # a lookup in the core registry
+                # clear any selected assembly
+                #TODO: create an interpreter to change the instruction list...
+                swapFrom = False
+                msg = CLICK_TO_SWAP_MSG
+                DROPDOWNMENU.main = DROPDOWNMENU.options[selected_option]
+                REGIONS.markAll() # the layout and tile size have changed
+        motion = [event.pos for event in event_list if event.type == MOUSEMOTION]
+        if motion: # one lookup for the whole burst
+            coreImage, spotx, spoty = GEOMETRY.hitTest(motion[-1][0], motion[-1][1], [len(row) for row in mainCore], len(STORED_INVENTORY.inventoryList))
+            hovered = [spotx, spoty] if coreImage == "Main" else None
         for event in event_list: # The event handler :processes the event list - any incoming interation
-            if event.type == MOUSEBUTTONDOWN or event.type == MOUSEMOTION:
-                selected_option = DROPDOWNMENU.update(event_list)
-                if selected_option >= 0:
-                    CORE_TYPE = DROPDOWNMENU.options[selected_option]
-                    #print(CORE_TYPE)
-                    setCoreType(CORE_TYPE)
-                    print(len(mainCore))
-                    mainCore = getStartingCore()
-                    startCore=copy.deepcopy(mainCore)
-                    # clear any selected assembly
-                    #TODO: create an interpreter to change the instruction list...
-                    swapFrom = False
-                    msg = CLICK_TO_SWAP_MSG
-                    allMoves = []
-
-                    drawGUI(mainCore, startCore, StoredInventory, msg)
-                    DROPDOWNMENU.main = DROPDOWNMENU.options[selected_option]
-                    DROPDOWNMENU.draw(DISPLAYSURF)
-                    pygame.display.flip()
-
+            if isQuitEvent(event):
+                terminate()
             elif event.type == MOUSEBUTTONUP:
-                # If clicked in inventory
-                spotx, spoty = getSpotClicked(mainCore, event.pos[0], event.pos[1], coreImage="Inventory")
-                if (spotx, spoty) != (None, None):
+                # one lookup finds the Main core tile or the inventory item under the mouse
+                coreImage, spotx, spoty = GEOMETRY.hitTest(event.pos[0], event.pos[1], [len(row) for row in mainCore], len(STORED_INVENTORY.inventoryList))
+                if coreImage == "Inventory":
+                    itemID = STORED_INVENTORY.inventoryList[spoty].itemID # moves refer to items by ID, not by row
                     if swapFrom == False:
                         swapFrom = True
                         msg = str(STORED_INVENTORY.inventoryList[spoty].assembly.label) + SELECTED_INVENTORY_ITEM_MSG
-                        swapFromy = spoty
+                        swapFromy = itemID
                         swapFromx = -1
                     else:
                         if swapFromx == -1: # double inventory selection!
-                            if swapFromy == spoty: # deselect
+                            if swapFromy == itemID: # deselect
                                 swapFrom = False
                                 msg = CLICK_TO_SWAP_MSG
                             else:
                                 swapFrom = True
                                 msg = str(STORED_INVENTORY.inventoryList[spoty].assembly.label) + SELECTED_INVENTORY_ITEM_MSG
-                                swapFromy = spoty
+                                swapFromy = itemID
                                 swapFromx = -1
                         else:
                             swapTo = True
-                            swap1 = (-1, spoty)
+                            swap1 = (-1, itemID)
                             swap2 = (swapFromx, swapFromy)
 
-                spotx, spoty = getSpotClicked(mainCore, event.pos[0], event.pos[1])
                 # If clicked off Main Core
-                if (spotx, spoty) == (None, None): # not in an assembly so
-                    #TODO: checkbox not working labels not shown
-                    changed = False
-                    for i, box in enumerate(SYMMETRY_LIST):
-                        changed = changed or box.update_checkbox(event)
-                        if changed:
-                            tempIndx = i
-                    if changed:
-                        temp = SYMMETRY_LIST[tempIndx].checked
-                        if temp:
+                elif coreImage is None: # not in an assembly so
+                    clicked = [box for box in SYMMETRY_LIST if box.update_checkbox(event)]
+                    if clicked: # the boxes act as radio buttons, unchecking the last one means no symmetry
+                        if clicked[0].checked:
                             for box in SYMMETRY_LIST:
-                                box.checked = False
-                            SYMMETRY = SYMMETRY_LIST[tempIndx].caption
+                                box.checked = box is clicked[0]
+                            SYMMETRY = clicked[0].caption
                         else:
                             SYMMETRY = "None"
-                        SYMMETRY_LIST[tempIndx].checked = temp
-                        #debugging
-                        for box in SYMMETRY_LIST:
-                            if box.checked:
-                                print(str(box.caption)+ " is checked")
-                            if not box.checked:
-                                print(str(box.caption)+ " is not checked")
                     # check if the user clicked on an option button
                     if LOAD_INPUTS_RECT.collidepoint(event.pos):
-                        random.choice(NA_SOUND_LIST).play()
+                        imported, msg = importStartPattern()
+                        if imported is None:
+                            RESOURCES.play(random.choice(NA_SOUNDS))
+                        else: # a core map, or a saved session which may also change the core type and inventory
+                            mainCore, startCore = imported
+                            DROPDOWNMENU.main = CORE_TYPE
+                            REGIONS.markAll()
+                            swapFrom = False
                     elif LOAD_INVENT_RECT.collidepoint(event.pos):
-                        random.choice(NA_SOUND_LIST).play()
+                        imported, msg = importFuelInventory()
+                        if imported is None:
+                            RESOURCES.play(random.choice(NA_SOUNDS))
+                        else:
+                            ANIMATOR.skip()
+                            STORED_INVENTORY = imported
+                            resetSession() # loads and removes refer to items of the old inventory
+                            REGIONS.markAll()
+                            swapFrom = False
                     elif BURN_RECT.collidepoint(event.pos):
-                        mainCore, startCore, allMoves, msg = doBurnup(mainCore, startCore, allMoves)
-                    elif REDO_RECT.collidepoint(event.pos):
-                        allMoves = resetAnimation(mainCore, startCore, redoMoves, reverse=False) # clicked on Reset button
-                    elif RESET_RECT.collidepoint(event.pos):
-                        redoMoves = copy.deepcopy(allMoves)
-                        resetAnimation(mainCore, startCore, allMoves) # clicked on Reset button
-                        allMoves = []
+                        mainCore, startCore, msg = doBurnup(mainCore, startCore)
+                    elif REDO_RECT.collidepoint(event.pos): # shift-click redoes the rest of the cycle
+                        startCore = stepHistory(mainCore, startCore, True, pygame.key.get_mods() & KMOD_SHIFT)
+                    elif RESET_RECT.collidepoint(event.pos): # shift-click undoes back to the start of the cycle
+                        startCore = stepHistory(mainCore, startCore, False, pygame.key.get_mods() & KMOD_SHIFT)
                     elif NEW_RECT.collidepoint(event.pos):
+                        ANIMATOR.skip()
                         mainCore, startCore, solutionSeq = generateNewPattern(CORE_TYPE) # clicked on New Game button
-                        allMoves = []
                     elif SAVE_RECT.collidepoint(event.pos):
-                        random.choice(NA_SOUND_LIST).play()
+                        msg = saveSessionFile(mainCore, startCore)
                     elif SOLVE_RECT.collidepoint(event.pos):# clicked on Solve button
-                        #TODO: Write something nifty to solve the core loading problem...
-                        resetAnimation(mainCore,startCore, solutionSeq + allMoves)
-                        allMoves = []
+                        if solver is not None:
+                            solver.stop()
+                        else:
+                            # shift-click runs the genetic algorithm instead of annealing
+                            method = "genetic" if pygame.key.get_mods() & KMOD_SHIFT else "anneal"
+                            state = CoreState.fromAssemblyCore(mainCore, CORE_TYPE, ALPHABETCOORDS)
+                            solver = OptimizerRunner(LoadingPatternOptimizer(state, STORED_INVENTORY, method, cache=EVAL_CACHE)).start()
+                            solverBase = HISTORY.version
+                            msg = SOLVING_MSG.format(method, 0, float("inf"))
                 else:
                     if mainCore[int(spoty)][int(spotx)].label != BLANK : # allow selection of empty assemblies...
                         if swapFrom == False:
@@ -310,9 +375,7 @@ def main():
                             moveFocus = False
                             swapFromx = spotx
                             swapFromy = spoty
-                            print(swapFrom)
-                            print(swapFromx)
-                            print(swapFromy)
+                            log.debug("selected %s, %s", swapFromx, swapFromy)
                             msg = str(mainCore[int(spoty)][int(spotx)].label) + SELECT_SWAP_OR_ROTATE_MSG
                         else:
                             if swapFromx == spotx  and swapFromy == spoty: # ignore if same
@@ -322,17 +385,38 @@ def main():
                                 swapTo = True
                                 swap1 = [swapFromx, swapFromy]
                                 swap2 = [spotx, spoty]
+            elif event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+                REGIONS.markAll()
+            elif event.type == KEYUP and event.key == K_SPACE: # finish any animations now
+                for rect in ANIMATOR.skip():
+                    REGIONS.mark(rect)
+            elif event.type == KEYUP and event.key in (K_PAGEUP, K_PAGEDOWN): # browse the start cores of past cycles
+                msg = browseCycles(-1 if event.key == K_PAGEUP else 1)
+            elif event.type == KEYUP and event.key == K_f: # toggle fast forward of animations
+                ANIMATOR.toggleFastForward()
+            elif event.type == KEYUP and event.key == K_p: # replay the cycle as the shortest shuffle
+                msg = replayCycle(mainCore, startCore)
+                swapFrom = False
+            elif event.type == KEYUP and event.key == K_F3: # toggle the profiling overlay
+                OVERLAY = not OVERLAY
+                setProfiling(OVERLAY or PROFILE.dumpPath is not None, allocations=OVERLAY)
+                REGIONS.mark(OVERLAY_RECT)
+            elif event.type == KEYUP and event.key == K_F4: # write the timers and counters to a file
+                try:
+                    msg = PROFILE_DUMPED_MSG.format(dump(PROFILE.dumpPath or PROFILE_DUMP_FILE))
+                except OSError as error:
+                    log.error("cannot write the profile: %s", error)
+                    msg = SAVE_FAILED_MSG.format(error)
             elif event.type == KEYUP:
                 if swapFrom != False and swapFromx != -1:
-                    print("key event: " +str(event.key))
+                    log.debug("key %s", event.key)
                     if event.key in (K_e, K_q):
                         direction = -1 if event.key ==K_q else 1
                         swap1 = [swapFromx, swapFromy]
-                        print("Rotate assembly" + str(swapFromx)+" "+str(swapFromy) )
-                        print(direction)
-                        rotateAnimation(mainCore, startCore, STORED_INVENTORY, swap1, direction, ROTATE_MSG, animationSpeedSeconds=0.65)
-                        makeRotate(mainCore, swap1, direction)
-                        allMoves.append(["rotate", swap1, direction])
+                        log.debug("rotate %s, %s direction %s", swapFromx, swapFromy, direction)
+                        moves = symmetricMoves(mainCore, [["rotate", swap1, direction]])
+                        playMoves(mainCore, moves)
+                        HISTORY.recordMoves(moves)
                         swapTo = False  # position to swap to...
                         swapFrom = False
                         msg = CLICK_TO_SWAP_MSG
@@ -341,7 +425,7 @@ def main():
                         if mainCore[int(swapFromy)][int(swapFromx)].label != "Empty":
                             swap1 = [swapFromx, swapFromy]
                             index = makeRemove(mainCore, swap1)
-                            allMoves.append(["remove", swap1, index])#mainCore[int(swapFromy)][int(swapFromx)]])
+                            HISTORY.recordMoves([["remove", swap1, index]])
                             swapTo = False  # position to swap to...
                             swapFrom = False
                             msg = CLICK_TO_SWAP_MSG
@@ -368,16 +452,15 @@ def main():
         # there used to be a separation of animation and function in the main loop...
         # this is being lost... :(
         if swapTo:
-            redoMoves = []
-            #allMoves.append([swapFrom, swapTo]) # record the slide
-            swapAnimation(mainCore, startCore, STORED_INVENTORY, swap1, swap2, SWAPPING_MSG, animationSpeedSeconds=0.65)
+            animateSwap(mainCore, swap1, swap2)
             if(swap1[0] == -1):
                 removed = makeLoad(mainCore, swap2, swap1[1])
-                allMoves.append(removed)
-                allMoves.append(["load", swap2, swap1[1]])
+                HISTORY.recordMoves([removed, ["load", swap2, swap1[1]]])
             else:
+                moves = symmetricMoves(mainCore, [["swap",swap1,swap2]])
+                playMoves(mainCore, moves[1:]) # the requested swap is already animating
                 makeSwap(mainCore, swap1, swap2)
-                allMoves.append(["swap",swap1,swap2])
+                HISTORY.recordMoves(moves)
             swapTo = False  # position to swap to...
             swapFrom = False
             msg = CLICK_TO_SWAP_MSG
@@ -388,315 +471,217 @@ def main():
                 #print(str(swapFromx)+ "  " +str(swapFromy))
                 msg = str(mainCore[swapFromy][swapFromx].label) + SELECT_SWAP_OR_ROTATE_MSG
                 moveFocus = False
-        pygame.display.update()
-        FPSCLOCK.tick(FPS)
+        if solver is not None:
+            update = solver.poll()
+            if update is not None:
+                msg = SOLVING_MSG.format(solver.optimizer.method, update[0], update[1])
+            if solver.done:
+                if solver.result is None:
+                    msg = SOLVE_FAILED_MSG
+                elif solverBase != HISTORY.version:
+                    msg = SOLVE_DISCARDED_MSG
+                else:
+                    score, moves = solver.result
+                    HISTORY.recordMoves(applyMoves(mainCore, moves))
+                    msg = SOLVED_MSG.format(score, len(moves))
+                solver = None
+        if TRAVEL_JOBS:
+            msg = pollTravelJobs() or msg
+        updateConstraintView(mainCore, [swapFromx, swapFromy] if swapFrom and swapFromx != -1 else None, hovered)
+        if ANIMATOR.active():
+            with timer("animator.advance"):
+                for rect in ANIMATOR.advance():
+                    REGIONS.mark(rect)
+        renderFrame(mainCore, cycleView(startCore), STORED_INVENTORY, msg)
+        frame()
 
 def terminate():
+    EVAL_CACHE.close()
+    for cycle, job, coords in TRAVEL_JOBS:
+        job.cancel()
+    TravelOptimizer.shutdown()
     pygame.quit()
     sys.exit()
 
-def checkForQuit():
-    """ Gracefully exit  - animations could take a second or two so we may need to check for exits outside of the event loop..."""
-    # FIXME: this is a bit hacky, events should really be carried out in the event loop, but this is ok at a push...
-    for event in pygame.event.get(QUIT): # get all the QUIT events
-        terminate() # terminate if any QUIT events are present
-    for event in pygame.event.get(KEYUP): # get all the KEYUP events
-        if event.key == K_ESCAPE:
-            terminate() # terminate if the KEYUP event was for the Esc key
-        pygame.event.post(event) # put the other KEYUP event objects back
-
-
 def getStartingCore():
     """ This code sets the data of the core structure. """
     # Return a core data structure
-    if CORE_TYPE == "1/8 BEAVRS":
-        assert COREWIDTH == 6 and COREHEIGHT ==8
-        core =[[Assembly( "H8",1.6),],
-                [Assembly( "H9",2.4),Assembly( "G9",1.6),],
-                [Assembly("H10",1.6),Assembly("G10",2.4),Assembly("F10",1.6),],
-                [Assembly("H11",2.4),Assembly("G11",1.6),Assembly("F11",2.4),Assembly("E11",1.6),],
-                [Assembly("H12",1.6),Assembly("G12",2.4),Assembly("F12",1.6),Assembly("E12",2.4),Assembly("D12",2.4),],
-                [Assembly("H13",2.4),Assembly("G13",1.6),Assembly("F13",2.4),Assembly("E13",1.6),Assembly("D13",2.4),Assembly("C13",3.2),],
-                [Assembly("H14",1.6),Assembly("G14",3.2),Assembly("F14",1.6),Assembly("E14",3.2),Assembly("D14",3.2),Assembly("C14",3.2),],
-                [Assembly("H15",3.2),Assembly("G15",3.2),Assembly("F15",3.2),Assembly("E15",3.2),  Assembly( BL),    Assembly( BL),      ]]
-        return core
-    elif CORE_TYPE == "1/4 BEAVRS" :
-        assert COREWIDTH == 8 and COREHEIGHT ==8
-        core = [ [ Assembly("H8", 1.6),Assembly( "G8",2.4), Assembly("F8",1.6), Assembly("E8",2.4), Assembly("D8",1.6), Assembly("C8",2.4), Assembly("B8", 1.6), Assembly("A8",3.2)],
-                  [ Assembly(       BL),Assembly( "G9",1.6), Assembly("F9",2.4), Assembly("E9",1.6), Assembly("D9",2.4), Assembly("C9",1.6), Assembly("B9", 3.2), Assembly("A9",3.2)],
-                  [ Assembly(       BL),Assembly("G10",2.4),Assembly("F10",1.6),Assembly("E10",2.4),Assembly("D10",1.6),Assembly("C10",2.4),Assembly("B10",1.6), Assembly("A10",3.2)],
-                  [ Assembly(       BL),Assembly("G11",1.6),Assembly("F11",2.4),Assembly("E11",1.6),Assembly("D11",2.4),Assembly("C11",1.6),Assembly("B11",3.2), Assembly("A11",3.2)],
-                  [ Assembly(       BL),Assembly("G12",2.4),Assembly("F12",1.6),Assembly("E12",2.4),Assembly("D12",2.4),Assembly("C12",2.4),Assembly("B12",3.2), Assembly( BL),],
-                  [ Assembly(       BL),Assembly("G13",1.6),Assembly("F13",2.4),Assembly("E13",1.6),Assembly("D13",2.4),Assembly("C13",3.2),Assembly("B13",3.2), Assembly( BL),],
-                  [ Assembly(       BL),Assembly("G14",3.2),Assembly("F14",1.6),Assembly("E14",3.2),Assembly("D14",3.2),Assembly("C14",3.2),Assembly( BL),       Assembly( BL),],
-                  [ Assembly(       BL),Assembly("G15",3.2),Assembly("F15",3.2),Assembly("E15",3.2),  Assembly( BL),    Assembly( BL),      Assembly( BL),       Assembly( BL),],
-                ]
-        return core
-    elif CORE_TYPE == "Quarter":
-        assert COREWIDTH == 8 and COREHEIGHT ==8
-        core = [ [ Assembly("H8"),Assembly( "G8"),Assembly( "F8"),Assembly( "E8"),Assembly( "D8"),Assembly( "C8"),Assembly( "B8"),Assembly( "A8")],
-                  [ Assembly(  BL),Assembly( "G9"),Assembly( "F9"),Assembly( "E9"),Assembly( "D9"),Assembly( "C9"),Assembly( "B9"),Assembly( "A9")],
-                  [ Assembly(  BL),Assembly("G10"),Assembly("F10"),Assembly("E10"),Assembly("D10"),Assembly("C10"),Assembly("B10"),Assembly("A10")],
-                  [ Assembly(  BL),Assembly("G11"),Assembly("F11"),Assembly("E11"),Assembly("D11"),Assembly("C11"),Assembly("B11"),Assembly("A11")],
-                  [ Assembly(  BL),Assembly("G12"),Assembly("F12"),Assembly("E12"),Assembly("D12"),Assembly("C12"),Assembly("B12"),Assembly(   BL)],
-                  [ Assembly(  BL),Assembly("G13"),Assembly("F13"),Assembly("E13"),Assembly("D13"),Assembly("C13"),Assembly("B13"),Assembly(   BL)],
-                  [ Assembly(  BL),Assembly("G14"),Assembly("F14"),Assembly("E14"),Assembly("D14"),Assembly("C14"),Assembly(   BL),Assembly(   BL)],
-                  [ Assembly(  BL),Assembly("G15"),Assembly("F15"),Assembly("E15"),Assembly(   BL),Assembly(   BL),Assembly(   BL),Assembly(   BL)],
-                ]
-        return core
-    elif CORE_TYPE == "BEAVRS":
-        assert COREWIDTH == 15 and COREHEIGHT ==15
-        core = [[Assembly(   BL),    Assembly(   BL),     Assembly(   BL),    Assembly(   BL),    Assembly( "L1",3.2),Assembly( "K1",3.2),Assembly( "J1",3.2),Assembly( "H1",3.2),Assembly( "G1",3.2), Assembly("F1",3.2), Assembly("E1",3.2),  Assembly( BL),    Assembly( BL),      Assembly( BL),       Assembly( BL),],
-                 [Assembly(   BL),    Assembly(   BL),     Assembly( "N2",3.2),Assembly( "M2",3.2),Assembly( "L2",3.2),Assembly( "K2",1.6),Assembly( "J2",3.2),Assembly( "H2",1.6),Assembly( "G2",3.2), Assembly("F2",1.6), Assembly("E2",3.2), Assembly("D2",3.2), Assembly("C2",3.2), Assembly( BL),       Assembly( BL),],
-                 [Assembly(   BL),    Assembly( "P3", 3.2),Assembly( "N3",3.2),Assembly( "M3",2.4),Assembly( "L3",1.6),Assembly( "K3",2.4),Assembly( "J3",1.6),Assembly( "H3",2.4),Assembly( "G3",1.6), Assembly("F3",2.4), Assembly("E3",1.6), Assembly("D3",2.4), Assembly("C3",3.2), Assembly("B3", 3.2), Assembly( BL),],
-                 [Assembly(   BL),    Assembly( "P4", 3.2),Assembly( "N4",2.4),Assembly( "M4",2.4),Assembly( "L4",2.4),Assembly( "K4",1.6),Assembly( "J4",2.4),Assembly( "H4",1.6),Assembly( "G4",2.4), Assembly("F4",1.6), Assembly("E4",2.4), Assembly("D4",2.4), Assembly("C4",2.4), Assembly("B4", 3.2), Assembly( BL),],
-                 [Assembly( "R5",3.2),Assembly( "P5", 3.2),Assembly( "N5",1.6),Assembly( "M5",2.4),Assembly( "L5",1.6),Assembly( "K5",2.4),Assembly( "J5",1.6),Assembly( "H5",2.4),Assembly( "G5",1.6), Assembly("F5",2.4), Assembly("E5",1.6), Assembly("D5",2.4), Assembly("C5",1.6), Assembly("B5", 3.2), Assembly("A5",3.2)],
-                 [Assembly( "R6",3.2),Assembly( "P6", 1.6),Assembly( "N6",2.4),Assembly( "M6",1.6),Assembly( "L6",2.4),Assembly( "K6",1.6),Assembly( "J6",2.4),Assembly( "H6",1.6),Assembly( "G6",2.4), Assembly("F6",1.6), Assembly("E6",2.4), Assembly("D6",1.6), Assembly("C6",2.4), Assembly("B6", 1.6), Assembly("A6",3.2)],
-                 [Assembly( "R7",3.2),Assembly( "P7", 3.2),Assembly( "N7",1.6),Assembly( "M7",2.4),Assembly( "L7",1.6),Assembly( "K7",2.4),Assembly( "J7",1.6),Assembly( "H7",2.4),Assembly( "G7",1.6), Assembly("F7",2.4), Assembly("E7",1.6), Assembly("D7",2.4), Assembly("C7",1.6), Assembly("B7", 3.2), Assembly("A7",3.2)],
-                 [Assembly( "R8",3.2),Assembly( "P8", 1.6),Assembly( "N8",2.4),Assembly( "M8",1.6),Assembly( "L8",2.4),Assembly( "K8",1.6),Assembly( "J8",2.4),Assembly( "H8",1.6),Assembly( "G8",2.4), Assembly("F8",1.6), Assembly("E8",2.4), Assembly("D8",1.6), Assembly("C8",2.4), Assembly("B8", 1.6), Assembly("A8",3.2)],
-                 [Assembly( "R9",3.2),Assembly( "P9", 3.2),Assembly( "N9",1.6),Assembly( "M9",2.4),Assembly( "L9",1.6),Assembly( "K9",2.4),Assembly( "J9",1.6),Assembly( "H9",2.4),Assembly( "G9",1.6), Assembly("F9",2.4), Assembly("E9",1.6), Assembly("D9",2.4), Assembly("C9",1.6), Assembly("B9", 3.2), Assembly("A9",3.2)],
-                 [Assembly("R10",3.2),Assembly("P10", 1.6),Assembly("N10",2.4),Assembly("M10",1.6),Assembly("L10",2.4),Assembly("K10",1.6),Assembly("J10",2.4),Assembly("H10",1.6),Assembly("G10",2.4),Assembly("F10",1.6),Assembly("E10",2.4),Assembly("D10",1.6),Assembly("C10",2.4),Assembly("B10",1.6),Assembly("A10",3.2)],
-                 [Assembly("R11",3.2),Assembly("P11", 3.2),Assembly("N11",1.6),Assembly("M11",2.4),Assembly("L11",1.6),Assembly("K11",2.4),Assembly("J11",1.6),Assembly("H11",2.4),Assembly("G11",1.6),Assembly("F11",2.4),Assembly("E11",1.6),Assembly("D11",2.4),Assembly("C11",1.6),Assembly("B11",3.2),Assembly("A11",3.2)],
-                 [Assembly(   BL),    Assembly("P12", 3.2),Assembly("N12",2.4),Assembly("M12",2.4),Assembly("L12",2.4),Assembly("K12",1.6),Assembly("J12",2.4),Assembly("H12",1.6),Assembly("G12",2.4),Assembly("F12",1.6),Assembly("E12",2.4),Assembly("D12",2.4),Assembly("C12",2.4),Assembly("B12",3.2), Assembly( BL),],
-                 [Assembly(   BL),    Assembly("P13", 3.2),Assembly("N13",3.2),Assembly("M13",2.4),Assembly("L13",1.6),Assembly("K13",2.4),Assembly("J13",1.6),Assembly("H13",2.4),Assembly("G13",1.6),Assembly("F13",2.4),Assembly("E13",1.6),Assembly("D13",2.4),Assembly("C13",3.2),Assembly("B13",3.2), Assembly( BL),],
-                 [Assembly(   BL),    Assembly(   BL),     Assembly("N14",3.2),Assembly("M14",3.2),Assembly("L14",3.2),Assembly("K14",1.6),Assembly("J14",3.2),Assembly("H14",1.6),Assembly("G14",3.2),Assembly("F14",1.6),Assembly("E14",3.2),Assembly("D14",3.2),Assembly("C14",3.2),Assembly( BL),       Assembly( BL),],
-                 [Assembly(   BL),    Assembly(   BL),     Assembly(   BL),    Assembly(   BL),    Assembly("L15",3.2),Assembly("K15",3.2),Assembly("J15",3.2),Assembly("H15",3.2),Assembly("G15",3.2),Assembly("F15",3.2),Assembly("E15",3.2),  Assembly( BL),    Assembly( BL),      Assembly( BL),       Assembly( BL),],
-                ]
-        return core
-    elif CORE_TYPE == "Full":
-        assert COREWIDTH == 15 and COREHEIGHT ==15
-        core = [[Assembly(   BL),Assembly(   BL),Assembly(   BL),Assembly(   BL),Assembly( "L1"),Assembly( "K1"),Assembly( "J1"),Assembly( "H1"),Assembly( "G1"), Assembly("F1"), Assembly("E1"),  Assembly( BL),   Assembly( BL),  Assembly( BL), Assembly( BL),],
-                 [Assembly(   BL),Assembly(   BL),Assembly( "N2"),Assembly( "M2"),Assembly( "L2"),Assembly( "K2"),Assembly( "J2"),Assembly( "H2"),Assembly( "G2"), Assembly("F2"), Assembly("E2"), Assembly("D2"),  Assembly("C2"),  Assembly( BL), Assembly( BL),],
-                 [Assembly(   BL),Assembly( "P3"),Assembly( "N3"),Assembly( "M3"),Assembly( "L3"),Assembly( "K3"),Assembly( "J3"),Assembly( "H3"),Assembly( "G3"), Assembly("F3"), Assembly("E3"), Assembly("D3"),  Assembly("C3"), Assembly("B3"), Assembly( BL),],
-                 [Assembly(   BL),Assembly( "P4"),Assembly( "N4"),Assembly( "M4"),Assembly( "L4"),Assembly( "K4"),Assembly( "J4"),Assembly( "H4"),Assembly( "G4"), Assembly("F4"), Assembly("E4"), Assembly("D4"),  Assembly("C4"), Assembly("B4"), Assembly( BL),],
-                 [Assembly( "R5"),Assembly( "P5"),Assembly( "N5"),Assembly( "M5"),Assembly( "L5"),Assembly( "K5"),Assembly( "J5"),Assembly( "H5"),Assembly( "G5"), Assembly("F5"), Assembly("E5"), Assembly("D5"),  Assembly("C5"), Assembly("B5"), Assembly("A5")],
-                 [Assembly( "R6"),Assembly( "P6"),Assembly( "N6"),Assembly( "M6"),Assembly( "L6"),Assembly( "K6"),Assembly( "J6"),Assembly( "H6"),Assembly( "G6"), Assembly("F6"), Assembly("E6"), Assembly("D6"),  Assembly("C6"), Assembly("B6"), Assembly("A6")],
-                 [Assembly( "R7"),Assembly( "P7"),Assembly( "N7"),Assembly( "M7"),Assembly( "L7"),Assembly( "K7"),Assembly( "J7"),Assembly( "H7"),Assembly( "G7"), Assembly("F7"), Assembly("E7"), Assembly("D7"),  Assembly("C7"), Assembly("B7"), Assembly("A7")],
-                 [Assembly( "R8"),Assembly( "P8"),Assembly( "N8"),Assembly( "M8"),Assembly( "L8"),Assembly( "K8"),Assembly( "J8"),Assembly( "H8"),Assembly( "G8"), Assembly("F8"), Assembly("E8"), Assembly("D8"),  Assembly("C8"), Assembly("B8"), Assembly("A8")],
-                 [Assembly( "R9"),Assembly( "P9"),Assembly( "N9"),Assembly( "M9"),Assembly( "L9"),Assembly( "K9"),Assembly( "J9"),Assembly( "H9"),Assembly( "G9"), Assembly("F9"), Assembly("E9"), Assembly("D9"),  Assembly("C9"), Assembly("B9"), Assembly("A9")],
-                 [Assembly("R10"),Assembly("P10"),Assembly("N10"),Assembly("M10"),Assembly("L10"),Assembly("K10"),Assembly("J10"),Assembly("H10"),Assembly("G10"),Assembly("F10"),Assembly("E10"),Assembly("D10"), Assembly("C10"),Assembly("B10"), Assembly("A10")],
-                 [Assembly("R11"),Assembly("P11"),Assembly("N11"),Assembly("M11"),Assembly("L11"),Assembly("K11"),Assembly("J11"),Assembly("H11"),Assembly("G11"),Assembly("F11"),Assembly("E11"),Assembly("D11"), Assembly("C11"),Assembly("B11"), Assembly("A11")],
-                 [Assembly(   BL),Assembly("P12"),Assembly("N12"),Assembly("M12"),Assembly("L12"),Assembly("K12"),Assembly("J12"),Assembly("H12"),Assembly("G12"),Assembly("F12"),Assembly("E12"),Assembly("D12"), Assembly("C12"),Assembly("B12"), Assembly( BL),],
-                 [Assembly(   BL),Assembly("P13"),Assembly("N13"),Assembly("M13"),Assembly("L13"),Assembly("K13"),Assembly("J13"),Assembly("H13"),Assembly("G13"),Assembly("F13"),Assembly("E13"),Assembly("D13"), Assembly("C13"),Assembly("B13"), Assembly( BL),],
-                 [Assembly(   BL),Assembly(   BL),Assembly("N14"),Assembly("M14"),Assembly("L14"),Assembly("K14"),Assembly("J14"),Assembly("H14"),Assembly("G14"),Assembly("F14"),Assembly("E14"),Assembly("D14"), Assembly("C14"),  Assembly( BL), Assembly( BL),],
-                 [Assembly(   BL),Assembly(   BL),Assembly(   BL),Assembly(   BL),Assembly("L15"),Assembly("K15"),Assembly("J15"),Assembly("H15"),Assembly("G15"),Assembly("F15"),Assembly("E15"),  Assembly( BL),   Assembly( BL),  Assembly( BL), Assembly( BL),],
-                ]
-        # core = [[   BL,   BL,   BL,   BL, "L1", "K1", "J1", "H1", "G1", "F1", "E1",   BL,   BL,   BL,  BL,],
-        #          [   BL,   BL, "N2", "M2", "L2", "K2", "J2", "H2", "G2", "F2", "E2", "D2", "C2",   BL,  BL,],
-        #          [   BL, "P3", "N3", "M3", "L3", "K3", "J3", "H3", "G3", "F3", "E3", "D3", "C3", "B3",  BL,],
-        #          [   BL, "P4", "N4", "M4", "L4", "K4", "J4", "H4", "G4", "F4", "E4", "D4", "C4", "B4",  BL,],
-        #          [ "R5", "P5", "N5", "M5", "L5", "K5", "J5", "H5", "G5", "F5", "E5", "D5", "C5", "B5", "A5"],
-        #          [ "R6", "P6", "N6", "M6", "L6", "K6", "J6", "H6", "G6", "F6", "E6", "D6", "C6", "B6", "A6"],
-        #          [ "R7", "P7", "N7", "M7", "L7", "K7", "J7", "H7", "G7", "F7", "E7", "D7", "C7", "B7", "A7"],
-        #          [ "R8", "P8", "N8", "M8", "L8", "K8", "J8", "H8", "G8", "F8", "E8", "D8", "C8", "B8", "A8"],
-        #          [ "R9", "P9", "N9", "M9", "L9", "K9", "J9", "H9", "G9", "F9", "E9", "D9", "C9", "B9", "A9"],
-        #          ["R10","P10","N10","M10","L10","K10","J10","H10","G10","F10","E10","D10","C10","B10","A10"],
-        #          ["R11","P11","N11","M11","L11","K11","J11","H11","G11","F11","E11","D11","C11","B11","A11"],
-        #          [   BL,"P12","N12","M12","L12","K12","J12","H12","G12","F12","E12","D12","C12","B12",  BL,],
-        #          [   BL,"P13","N13","M13","L13","K13","J13","H13","G13","F13","E13","D13","C13","B13",  BL,],
-        #          [   BL,   BL,"N14","M14","L14","K14","J14","H14","G14","F14","E14","D14","C14",   BL,  BL,],
-        #          [   BL,   BL,   BL,   BL,"L15","K15","J15","H15","G15","F15","E15",   BL,   BL,   BL,  BL,],
-        #         ]
-        return core
-    elif CORE_TYPE == "SIMPLEEIGHTH":
-        assert COREWIDTH == 5 and COREHEIGHT ==7
-        core = [[ 1],
-                 [ 2, 3 ],
-                 [ 4, 5, 6],
-                 [ 7, 8, 9,10],
-                 [11,12,13,14,15],
-                 [16,17,18,19],
-                 [20,21],
-                ]
-    elif CORE_TYPE == "Eighth":
-        assert COREWIDTH == 6 and COREHEIGHT ==8
-        core =[[Assembly( "H8"),],
-                [Assembly( "H9"),Assembly( "G9"),],
-                [Assembly("H10"),Assembly("G10"),Assembly("F10"),],
-                [Assembly("H11"),Assembly("G11"),Assembly("F11"),Assembly("E11"),],
-                [Assembly("H12"),Assembly("G12"),Assembly("F12"),Assembly("E12"),Assembly("D12"),],
-                [Assembly("H13"),Assembly("G13"),Assembly("F13"),Assembly("E13"),Assembly("D13"),Assembly("C13"),],
-                [Assembly("H14"),Assembly("G14"),Assembly("F14"),Assembly("E14"),Assembly("D14"),Assembly("C14"),],
-                [Assembly("H15"),Assembly("G15"),Assembly("F15"),Assembly("E15"),Assembly(   BL),Assembly(   BL),]]
-        return core
-    else:
-        # default to my square microcore
-        core = [[1,2,3,4,5,6],
-                 [1,2,3,4,5,6],
-                 [1,2,3,4,5,6],
-                 [1,2,3,4,5,6],
-                 [1,2,3,4,5,6],
-                 [1,2,3,4,5,6]]
-        core[COREWIDTH-1][COREHEIGHT-1] = BLANK
-    return core
-
-def printSwap(core, swap1, swap2):
-    """ This function takes two ordinates 'swap1' & 'swap2' and returns a text description of a swap operation"""
-    onex, oney = swap1
-    twox, twoy = swap2
-    print("Assembly: "+ALPHABETCOORDS[onex]+","+str(oney)+" has label: "+ core[oney][onex].label)
-    print("Assembly: "+ALPHABETCOORDS[twox]+","+str(twoy)+" has label: "+ core[twoy][twox].label)
-    print("swap: " + ALPHABETCOORDS[onex]+","+str(oney) +" with "+ ALPHABETCOORDS[twox]+","+str(twoy))
+    return CORE_GEOMETRY.startingCore()
 
 def getCoords(x, y):
-    return ALPHABETCOORDS[COREWIDTH-x-1]+str(y+1)
-
-def printRotate(core, rot1, direction):
-    """ This function takes one ordinate 'rot1' and direction returns a text description of a rotation operation"""
-    if(CORE_TYPE == "Full" or CORE_TYPE == "BEAVRS"):  # this only works if COREWIDTH==COREHEIGHT
-        assert COREWIDTH == COREHEIGHT
-        onex, oney = rot1
-        twox, twoy = COREWIDTH-oney-1, onex
-        threex, threey = COREWIDTH-onex-1, COREHEIGHT-oney-1
-        fourx, foury = oney, COREHEIGHT - onex-1
-        if direction == 1:
-            print("Assembly: "+getCoords(onex,oney)+" has label: "+ core[oney][onex].label)
-            print("Assembly: "+getCoords(twox, twoy)+" has label: "+ core[twoy][twox].label)
-            print("Assembly: "+getCoords(threex, threey)+" has label: "+ core[threey][threex].label)
-            print("Assembly: "+getCoords(fourx, foury)+" has label: "+ core[foury][fourx].label)
-            print("clockwise-rotate: " + getCoords(onex,oney) +" to "+ getCoords(twox, twoy)+". "+ \
-                    getCoords(twox, twoy)    +" to "+ getCoords(threex, threey)+". "+\
-                    getCoords(threex, threey)+" to "+ getCoords(fourx, foury)+". "+\
-                    getCoords(fourx, foury)  +" to "+ getCoords(onex,oney) )
-        else:
-            print("Assembly: "+getCoords(onex,oney)+" has label: "+ core[oney][onex].label)
-            print("Assembly: "+getCoords(twox, twoy)+" has label: "+ core[twoy][twox].label)
-            print("Assembly: "+getCoords(threex, threey)+" has label: "+ core[threey][threex].label)
-            print("Assembly: "+getCoords(fourx, foury)+" has label: "+ core[foury][fourx].label)
-            print("aclckwise-rotate: " + getCoords(onex,oney) +" to "+ getCoords(fourx, foury)+". "+ \
-                    getCoords(twox, twoy)   +" to "+ getCoords(onex,oney)+". " + \
-                    getCoords(threex, threey)+" to "+ getCoords(twox, twoy)+". "+ \
-                    getCoords(fourx, foury) +" to "+ getCoords(threex, threey) )
-    else:
-        print("unimplemented Core rotation")
-        random.choice(NA_SOUND_LIST).play()
-        #exit()
+    return CORE_GEOMETRY.coords(x, y)
 
+def symmetricMoves(core, moves):
+    """ moves together with their partners under the selected SYMMETRY, leaving out partner swaps that
+    would move a blank position"""
+    expanded = CORE_GEOMETRY.symmetry.expandMoves(moves, SYMMETRY)
+    return [move for move in expanded if move in moves or move[0] != "swap" or \
+            (core[move[1][1]][move[1][0]].label != BLANK and core[move[2][1]][move[2][0]].label != BLANK)]
+
+@timed("makeRotate")
 def makeRotate(core, rot1, direction):
-    """Carries out a rotation operation on the 'core' data"""
-    if(CORE_TYPE == "Full" or CORE_TYPE == "BEAVRS"):  # this only works if COREWIDTH==COREHEIGHT
-        assert COREWIDTH == COREHEIGHT
-        onex, oney = rot1
-        twox, twoy = COREWIDTH-oney-1, onex
-        threex, threey = COREWIDTH-onex-1, COREHEIGHT-oney-1
-        fourx, foury = oney, COREHEIGHT - onex-1
-        core[oney][onex].moved = True
-        core[twoy][twox].moved = True
-        core[threey][threex].moved = True
-        core[foury][fourx].moved = True
-        if direction == 1:
-            core[oney][onex], core[twoy][twox], core[threey][threex], core[foury][fourx] = core[foury][fourx], core[oney][onex], core[twoy][twox], core[threey][threex]
-        else:
-            core[oney][onex], core[twoy][twox], core[threey][threex], core[foury][fourx] = core[twoy][twox], core[threey][threex], core[foury][fourx], core[oney][onex]
-    else:
-        print("unimplemented Core rotation")
-        random.choice(NA_SOUND_LIST).play()
-        #exit()
+    """Carries out a rotation operation on the 'core' data.  In the quarter and eighth cores the other
+    positions of the orbit are the same stored position, so the assembly is turned where it is."""
+    orbit = CORE_GEOMETRY.symmetry.rotationOrbit(rot1)
+    if orbit is None:
+        assy = core.mutable(*rot1)
+        assy.turn(direction)
+        assy.moved = True
+        return
+    for x, y in orbit:
+        core.mutable(x, y).moved = True
+    core.rotate(orbit if direction == 1 else orbit[::-1])
 
+@timed("makeSwap")
 def makeSwap(core, swap1, swap2):
     """Carries out a swap operation on the core data"""
     # This function does not check if the move is valid.
-    onex, oney = swap1
-    twox, twoy = swap2
-    core[oney][onex].moved = True
-    core[twoy][twox].moved = True
-    core[oney][onex], core[twoy][twox] = core[twoy][twox], core[oney][onex]
+    core.mutable(*swap1).moved = True
+    core.mutable(*swap2).moved = True
+    core.swap(swap1, swap2)
 
+@timed("makeLoad")
 def makeLoad(core, loadCoords, inventoryID):
     """Carries out a 'load' operation from the inventory global variable to the core data"""
-    print(inventoryID)
-    print(len(STORED_INVENTORY.inventoryList))
     assy = STORED_INVENTORY.removeInventoryItem(inventoryID)
+    removed = ["noMove",0,0]
     if core[loadCoords[1]][loadCoords[0]].label != "Empty":
-        #retiredAssembly = copy.deepcopy(core[loadCoords[1]][loadCoords[0]])
-        retiredAssemblyIdx = makeRemove(core, loadCoords)
-        core[loadCoords[1]][loadCoords[0]] = assy
-        core[loadCoords[1]][loadCoords[0]].moved = True;
-        return ["remove", loadCoords, retiredAssemblyIdx]
-    core[loadCoords[1]][loadCoords[0]] = assy
-    core[loadCoords[1]][loadCoords[0]].moved = True;
-    return["noMove",0,0]
+        removed = ["remove", loadCoords, makeRemove(core, loadCoords)]
+    core.set(loadCoords[0], loadCoords[1], assy) # shared with the inventory until it is changed
+    core.mutable(*loadCoords).moved = True
+    return removed
 
+@timed("makeRemove")
 def makeRemove(core, removeCoords):
     """Carries out a 'remove' operation from the core to the STORED_INVENTORY global"""
-    retiredAssembly = copy.deepcopy(core[removeCoords[1]][removeCoords[0]])
-    core[removeCoords[1]][removeCoords[0]]=Assembly("Empty")
+    retiredAssembly = core.get(*removeCoords) # shared, nobody changes it without copying
+    core.set(removeCoords[0], removeCoords[1], Assembly("Empty"), owned=True)
     return STORED_INVENTORY.addInventoryItem(retiredAssembly, 1, EXTRACTED_ASSEMBLY_MSG +str(getCoords(removeCoords[0],removeCoords[1])))
 
+@timed("applyMoves")
+def applyMoves(core, moves):
+    """Carries out a list of new moves (in the allMoves format) on the core data, returns the moves to record
+    (a load also records the remove of the assembly it replaced)"""
+    made = []
+    for move in moves:
+        if move[0] == "swap":
+            makeSwap(core, move[1], move[2])
+            made.append(move)
+        elif move[0] == "rotate":
+            makeRotate(core, move[1], move[2])
+            made.append(move)
+        elif move[0] == "load":
+            made.append(makeLoad(core, move[1], move[2]))
+            made.append(move)
+    return made
+
+@timed("playMoves")
+def playMoves(core, moves, stagger=None):
+    """Carries out moves that are already in the history (redoing them or undoing them with their inverse).
+    Swaps and rotations are animated, all at once or, with stagger, each starting a little after the last."""
+    step = 0
+    for move in moves:
+        delay, duration = (0, SWAP_SECONDS) if stagger is None else (step * stagger, REPLAY_SECONDS)
+        if move[0] == "swap":
+            animateSwap(core, move[1], move[2], delay, duration)
+            makeSwap(core, move[1], move[2])
+            step += 1
+        elif move[0] == "rotate":
+            animateRotate(core, move[1], move[2], delay, duration)
+            makeRotate(core, move[1], move[2])
+            step += 1
+        elif move[0] == "remove":
+            removedID = makeRemove(core, move[1]) # item IDs are stable so it goes back into the same item
+            if removedID != move[2]: # the core no longer matches the history, the rest would make it worse
+                log.error("replay stopped: the assembly at %s went into item %s, the history says %s",
+                          move[1], removedID, move[2])
+                return
+        elif move[0] == "load":
+            makeLoad(core, move[1], move[2])
+        elif move[0] != "noMove":
+            log.warning("unknown command in history: %s", move)
+
+def restoreCores(mainCore, saved):
+    """Puts the saved (mainCore, startCore) snapshots back, mainCore in place.  Returns the new startCore"""
+    savedMain, savedStart = saved
+    mainCore.assign(savedMain)
+    return savedStart.snapshot()
+
+def stepHistory(mainCore, startCore, forward, jump=False):
+    """Undo (forward False) or redo one command, or with jump a whole cycle.  Returns startCore."""
+    if jump:
+        if forward:
+            target = HISTORY.cycleEnd()
+            if target == HISTORY.position:
+                target = HISTORY.cycleEnd(target + 1)
+        else:
+            target = HISTORY.cycleStart()
+            if target == HISTORY.position and target > 0:
+                target = HISTORY.cycleStart(target - 1)
+        steps = HISTORY.jumpTo(target)
+    else:
+        command = HISTORY.redo() if forward else HISTORY.undo()
+        steps = [] if command is None else [(command, forward)]
+    for command, redo in steps:
+        if isinstance(command, BurnCommand):
+            ANIMATOR.skip()
+            if redo:
+                startCore = restoreCores(mainCore, command.after)
+                CYCLE_MOVE_LIST.append(command.cycleMoves)
+            else:
+                startCore = restoreCores(mainCore, command.before)
+                CYCLE_MOVE_LIST.pop()
+            REGIONS.markAll()
+        else:
+            playMoves(mainCore, command.moves if redo else command.inverse, REPLAY_STAGGER if jump else None)
+    if steps and HISTORY.position == HISTORY.cycleStart(): # back to startCore, nothing has moved
+        for tiley, row in enumerate(mainCore):
+            for tilex, assy in enumerate(row):
+                if assy.moved:
+                    mainCore.mutable(tilex, tiley).moved = False
+    return startCore
+
 def isValidSwap(core, swap1, swap2):
-    """ Function to check if a swap operation can be carried out"""
-    """ TODO: Improve this implementation - currently it just checks for blanks"""
-    try:
-        if core[swap1[0]][swap1[1]].label == BLANK and core[swap2[0]][swap2[1]].label == BLANK:
-            pass
-    except IndexError:
-        return False
-    if core[swap1[0]][swap1[1]].label == BLANK:
-        return False
-    elif core[swap2[0]][swap2[1]].label == BLANK:
-        return False
+    """ Function to check if a swap operation can be carried out: both positions are in the core.
+    The loading pattern rules do not stop a swap, they are highlighted (see updateConstraintView)"""
+    for x, y in (swap1, swap2):
+        if not (0 <= y < len(core) and 0 <= x < len(core[y])) or core[y][x].label == BLANK:
+            return False
+    return True
+
+def updateConstraintView(core, selected, hovered):
+    """ Sets VIOLATIONS and CONSTRAINT_TEXT, previewing the swap of selected and hovered when both are set"""
+    global VIOLATIONS, CONSTRAINT_TEXT, CONSTRAINT_KEY
+    checker = core.constraintChecker(CORE_GEOMETRY)
+    target = None
+    if selected is not None and hovered is not None and hovered != selected and isValidSwap(core, selected, hovered):
+        target = hovered
+    key = (checker, checker.version, target and (tuple(selected), tuple(target), SYMMETRY))
+    if key == CONSTRAINT_KEY:
+        return
+    CONSTRAINT_KEY = key
+    if target is None:
+        VIOLATIONS, found = checker.violatingPositions(), checker.violations()
+        CONSTRAINT_TEXT = CONSTRAINTS_MSG.format(", ".join(found) or CONSTRAINTS_MET_MSG)
     else:
-        return True
+        VIOLATIONS, found = checker.tryMoves(symmetricMoves(core, [["swap", selected, target]]))
+        CONSTRAINT_TEXT = CONSTRAINTS_PREVIEW_MSG.format(getCoords(*target), ", ".join(found) or CONSTRAINTS_MET_MSG)
 
 def getLeftTopOfTile(tileX, tileY, coreImage="Main"):
     """ Gets the screen coordinates from the assembly coordinates for cores or inventory"""
-    if coreImage == "Main":
-        left = XMAIN_MARGIN + (tileX * TILESIZE) + (tileX - 1)
-        top = YMARGIN + (tileY * TILESIZE) + (tileY - 1)
-        return (left, top)
-    elif coreImage == "Start":
-        left = XSTART_MARGIN + (tileX * TILESIZE) + (tileX - 1)
-        top = YMARGIN + (tileY * TILESIZE) + (tileY - 1)
-        return (left, top)
-    elif coreImage == "Inventory":
-        left = 2*XSTART_MARGIN + (tileX * TILESIZE) + (tileX - 1) + ( (tileY//TILE_PER_COLUMN_INVENTORY) * INVENTORY_COLUMN_SIZE)
-        top = 5 + YMARGIN + ((COREHEIGHT+2) * TILESIZE)  + ((tileY%TILE_PER_COLUMN_INVENTORY) * TILESIZE+2)
-        return (left, top)
-    else:
-        print("Unknown core position requested!")
-        exit()
+    return GEOMETRY.leftTop(tileX, tileY, coreImage)
 
 def getSpotClicked(core, x, y, coreImage="Main"):
     """ Gets the position clicked by the mouse in assembly coordinates for a given core or inventory"""
-    if coreImage == "Main":
-        # from the x & y pixel coordinates, get the x & y core coordinates
-        for  tileY, row in enumerate(core):
-            for tileX, column in enumerate(row):
-                left, top = getLeftTopOfTile(tileX, tileY, coreImage)
-                tileRect = pygame.Rect(left, top, TILESIZE, TILESIZE)
-                if tileRect.collidepoint(x, y):
-                    return (tileX, tileY)
-    elif coreImage == "Inventory":
-        for i, item in enumerate(STORED_INVENTORY.inventoryList):
-            left, top = getLeftTopOfTile(0, i, coreImage=coreImage)
-            tileRect = pygame.Rect(left, top,TILESIZE,TILESIZE)
-            if tileRect.collidepoint(x, y):
-                return (0, i)
-    return (None, None)
+    return GEOMETRY.spotAt(x, y, [len(row) for row in core], len(STORED_INVENTORY.inventoryList), coreImage)
 
 def drawTile(tilex, tiley, label, adjx=0, adjy=0, color=TILECOLOR, outline=BGCOLOR, coreImage="Main"):
     """Draw an assembly in assembly coordinates tilex, tiley.  adjx and adjy are used in animations"""
     # draw a tile at core coordinates tilex and tiley, optionally a few
-    # pixels over (determined by adjx and adjy)
-    if len(color) == 4:
-        left, top = getLeftTopOfTile(tilex, tiley, coreImage)
-        pygame.draw.rect(DISPLAYSURF, outline, (left + adjx-1, top + adjy-1, TILESIZE+2, TILESIZE+2))
-        pygame.draw.rect(DISPLAYSURF, color[0], (left + adjx, top + adjy, TILESIZE, TILESIZE))
-        pygame.draw.rect(DISPLAYSURF, color[1], (left + adjx+TILESIZE/2, top + adjy, TILESIZE/2, TILESIZE/2))
-        pygame.draw.rect(DISPLAYSURF, color[2], (left + adjx, top + adjy + TILESIZE/2, TILESIZE/2, TILESIZE/2))
-        pygame.draw.rect(DISPLAYSURF, color[3], (left + adjx+TILESIZE/2, top + adjy+TILESIZE/2, TILESIZE/2, TILESIZE/2))
-        textSurf = LABELFONT.render(str(label), True, TEXTCOLOR)
-        textRect = textSurf.get_rect()
-        textRect.center = left + int(TILESIZE / 2) + adjx, top + int(TILESIZE / 2) + adjy
-        DISPLAYSURF.blit(textSurf, textRect)
-    else:
-        left, top = getLeftTopOfTile(tilex, tiley, coreImage)
-        pygame.draw.rect(DISPLAYSURF, outline, (left + adjx-1, top + adjy-1, TILESIZE+2, TILESIZE+2))
-        pygame.draw.rect(DISPLAYSURF, color, (left + adjx, top + adjy, TILESIZE, TILESIZE))
-        textSurf = LABELFONT.render(str(label), True, TEXTCOLOR)
-        textRect = textSurf.get_rect()
-        textRect.center = left + int(TILESIZE / 2) + adjx, top + int(TILESIZE / 2) + adjy
-        DISPLAYSURF.blit(textSurf, textRect)
+    # pixels over (determined by adjx and adjy).  The tile comes pre-rendered from TILE_CACHE
+    tileSurf = TILE_CACHE.getTile(label, color, outline, TILESIZE, LABELFONT, TEXTCOLOR)
+    left, top = getLeftTopOfTile(tilex, tiley, coreImage)
+    DISPLAYSURF.blit(tileSurf, (left + adjx - 1, top + adjy - 1))
 
 def makeText(text, color, bgcolor, top, left):
     """ A function that returns rendered text"""
@@ -717,12 +702,20 @@ def makeText2(text, color, bgcolor, top, left):
     textRect = Rect((top-3, left-3), textRectwidthheight)
     return (textSurf, textRect)
 
+@timed("drawCoreLayout")
 def drawCoreLayout(core, coreImage="Main"):
     """Given a coreImage this function renders the core data passed to it.  N.B. core must be othe type denoted by coreImage"""
+    clip = DISPLAYSURF.get_clip()
+    culling = clip != DISPLAYSURF.get_rect() # only a dirty region is being redrawn
+    hidden = ANIMATOR.hiddenTiles() # tiles still on their way to these positions
     if coreImage == "Inventory":
         for i, invItem in enumerate(core.inventoryList):
+            if culling and not clip.colliderect(inventoryRowRect(i)):
+                continue
+            if ("Inventory", 0, i) in hidden:
+                continue
             drawTile(0, i, invItem.assembly.label, 0,0, invItem.assembly.quadColor, coreImage=coreImage)
-            textSurf = LABELFONT.render("x"+str(invItem.quantity)+" "+str(invItem.description), True, TEXTCOLOR)
+            textSurf = TILE_CACHE.getText("x"+str(invItem.quantity)+" "+str(invItem.description), LABELFONT, TEXTCOLOR)
             textRect = textSurf.get_rect()
             left, top = getLeftTopOfTile(0, i, coreImage=coreImage)
             textRect.topleft = (left + TILESIZE + XSTART_MARGIN/3 , top)
@@ -733,8 +726,14 @@ def drawCoreLayout(core, coreImage="Main"):
         for  tiley, row in enumerate(core):
             maxX = len(row) if len(row)>maxX else maxX
             for tilex, column in enumerate(row):
+                if culling and not clip.colliderect(tileRect(tilex, tiley, coreImage)):
+                    continue
+                if (coreImage, tilex, tiley) in hidden:
+                    continue
                 if core[tiley][tilex].label != BLANK and core[tiley][tilex].label != "Empty":
-                    if core[tiley][tilex].moved:
+                    if coreImage == "Main" and (tilex, tiley) in VIOLATIONS:
+                        drawTile(tilex, tiley, core[tiley][tilex].label, 0,0, core[tiley][tilex].quadColor, outline=VIOLATION_OUTLINE, coreImage=coreImage)
+                    elif core[tiley][tilex].moved:
                         drawTile(tilex, tiley, core[tiley][tilex].label, 0,0, core[tiley][tilex].quadColor, outline=TILEOUTLINE, coreImage=coreImage)
                     else:
                         drawTile(tilex, tiley, core[tiley][tilex].label, 0,0, core[tiley][tilex].quadColor, coreImage=coreImage)
@@ -751,18 +750,84 @@ def drawCoreLayout(core, coreImage="Main"):
         pygame.draw.rect(DISPLAYSURF, BORDERCOLOR, (left-margin, top-margin, width + margin+linethickness, height + margin+linethickness), linethickness)
 
 
+def tileRect(tilex, tiley, coreImage="Main"):
+    """ The screen area covered by a tile, including its outline"""
+    left, top = getLeftTopOfTile(tilex, tiley, coreImage)
+    return Rect(left - 1, top - 1, TILESIZE + 2, TILESIZE + 2)
+
+def constraintRect():
+    """ The screen area of the constraint line under the Main core"""
+    left, top = getLeftTopOfTile(0, COREHEIGHT)
+    return Rect(left - 5, top + 8, RIGHT_MENU_POS - left, LABELFONT.get_linesize())
+
+def inventoryRowRect(i):
+    """ The screen area covered by an inventory entry: the tile and its description"""
+    left, top = getLeftTopOfTile(0, i, coreImage="Inventory")
+    return Rect(left - 1, top - 1, INVENTORY_COLUMN_SIZE, TILESIZE + 2)
+
+@timed("markSceneChanges")
+def markSceneChanges(core, startCore, inventory, message):
+    """ Compares what is about to be drawn with what was drawn last frame and marks the changed areas dirty"""
+    if SCENE.changed("message", message):
+        REGIONS.mark((0, 0, WINDOWWIDTH, 8 + BASICFONT.get_linesize()))
+    if SCENE.changed("constraints", CONSTRAINT_TEXT):
+        REGIONS.mark(constraintRect())
+    for coreImage, layout in (("Main", core), ("Start", startCore)):
+        for tiley, row in enumerate(layout):
+            for tilex, assy in enumerate(row):
+                violating = coreImage == "Main" and (tilex, tiley) in VIOLATIONS
+                if SCENE.changed((coreImage, tilex, tiley), (assy.label, assy.moved, tuple(assy.quadColor), violating)):
+                    REGIONS.mark(tileRect(tilex, tiley, coreImage))
+    items = inventory.inventoryList
+    rows = max(len(items), SCENE.drawn.get("inventoryRows", 0))
+    SCENE.changed("inventoryRows", len(items))
+    for i in range(rows):
+        item = items[i] if i < len(items) else None
+        signature = item and (item.assembly.label, item.quantity, item.description, tuple(item.assembly.quadColor))
+        if SCENE.changed(("Inventory", i), signature):
+            REGIONS.mark(inventoryRowRect(i))
+    menu = DROPDOWNMENU
+    if SCENE.changed("dropdown", (menu.menu_active, menu.active_option, menu.draw_menu, menu.main)):
+        height = menu.rect.height * (len(menu.options) + 1) + BASICFONT.get_linesize()
+        REGIONS.mark((menu.rect.left, menu.rect.top - BASICFONT.get_linesize(), menu.rect.width, height))
+    if SCENE.changed("symmetry", tuple(box.checked for box in SYMMETRY_LIST)):
+        REGIONS.mark(SYMMETRY_LIST[0].checkbox_outline.unionall([box.checkbox_outline for box in SYMMETRY_LIST] +
+                                                                  [box.rect for box in SYMMETRY_LIST]).inflate(4, 4))
+
+@timed("renderFrame")
+def renderFrame(core, startCore, inventory, message):
+    """ Redraws only the regions that changed since the last frame and pushes them to the display"""
+    markSceneChanges(core, startCore, inventory, message)
+    if OVERLAY:
+        REGIONS.mark(OVERLAY_RECT) # the figures change every frame
+    full, rects = REGIONS.take()
+    count("dirtyRects", len(rects))
+    if full:
+        drawGUI(core, startCore, inventory, message)
+        pygame.display.update()
+    elif rects:
+        DISPLAYSURF.set_clip(rects[0].unionall(rects[1:])) # one pass over the scene, the display gets the rects alone
+        drawGUI(core, startCore, inventory, message)
+        DISPLAYSURF.set_clip(None)
+        pygame.display.update(rects)
+
+@timed("drawGUI")
 def drawGUI(core, startCore, inventory, message):
     """ This function draws the GUI and cores """
     DISPLAYSURF.fill(BGCOLOR)
     if message:
-        textSurf, textRect = makeText(message, MESSAGECOLOR, BGCOLOR, 8, 8)
-        DISPLAYSURF.blit(textSurf, textRect)
+        DISPLAYSURF.blit(TILE_CACHE.getText(message, BASICFONT, MESSAGECOLOR), (8, 8))
     #reload core loading
-    coreTxt = BASICFONT.render(CORE_SHUFFLE_MSG, 1, DARKTEXT)
+    coreTxt = TILE_CACHE.getText(CORE_SHUFFLE_MSG, BASICFONT, DARKTEXT)
     DISPLAYSURF.blit(coreTxt, coreTxt.get_rect(bottomleft = getLeftTopOfTile(2,-1)))
     drawCoreLayout(core)
+    if CONSTRAINT_TEXT:
+        met = CONSTRAINT_TEXT.endswith(CONSTRAINTS_MET_MSG)
+        constraintSurf = TILE_CACHE.getText(CONSTRAINT_TEXT, LABELFONT, MESSAGECOLOR if met else VIOLATION_OUTLINE)
+        rect = constraintRect()
+        DISPLAYSURF.blit(constraintSurf, rect.move(5, 0), (0, 0, rect.width - 5, rect.height))
     # Discharge core loading
-    exitTxt = BASICFONT.render(EXIT_LOADING_MSG, 1, DARKTEXT)
+    exitTxt = TILE_CACHE.getText(EXIT_LOADING_MSG, BASICFONT, DARKTEXT)
     DISPLAYSURF.blit(exitTxt, exitTxt.get_rect(bottomleft = getLeftTopOfTile(2,-1, coreImage="Start")))
     drawCoreLayout(startCore, coreImage="Start")
     #Fuel Inventory
@@ -776,12 +841,12 @@ def drawGUI(core, startCore, inventory, message):
     rect.bottomleft = (25, WINDOWHEIGHT-25)
     pygame.draw.rect(DISPLAYSURF, BORDERCOLOR, rect, linethickness)
     #Label
-    invenTxt = BASICFONT.render(INVENTORY_MSG, 1, DARKTEXT)
+    invenTxt = TILE_CACHE.getText(INVENTORY_MSG, BASICFONT, DARKTEXT)
     DISPLAYSURF.blit(invenTxt, invenTxt.get_rect(bottomleft = rect.topleft))#   getLeftTopOfTile(2,COREHEIGHT+2, coreImage="Start")))
     drawCoreLayout(inventory, coreImage="Inventory")
 
     #the Checkboxes for symmetry functions
-    symmetryTitle = LABELFONT.render(SYM_CHECKBOX_MSG, 1, DARKTEXT)
+    symmetryTitle = TILE_CACHE.getText(SYM_CHECKBOX_MSG, LABELFONT, DARKTEXT)
     DISPLAYSURF.blit(symmetryTitle, symmetryTitle.get_rect(bottomleft = SYMMETRY_LIST[0].rect.topleft))
     for box in SYMMETRY_LIST:
         box.render_checkbox()
@@ -796,154 +861,240 @@ def drawGUI(core, startCore, inventory, message):
     DISPLAYSURF.blit(LOAD_INPUTS_SURF, LOAD_INPUTS_RECT)
     DISPLAYSURF.blit(LOAD_INVENT_SURF, LOAD_INVENT_RECT)
     DISPLAYSURF.blit(SAVE_SURF, SAVE_RECT)
+    # tiles on their way to a new position go on top of everything
+    ANIMATOR.draw(DISPLAYSURF)
+    if OVERLAY:
+        drawOverlay()
 
-def rotateAnimation(core, startCore, inventory, one, direction, message, animationSpeedSeconds):
-    """Animate the effective rotation of assemblies. by moving quadrant"""
-    animationSpeed = int(FPS/animationSpeedSeconds)
-    # Note: This function does not check if the move is valid.
-    #print(CORE_TYPE)
-    if not(CORE_TYPE == "Full" or CORE_TYPE =="BEAVRS"):
-        print("Not implemented for "+str(CORE_TYPE))
-        random.choice(NA_SOUND_LIST).play()
-    else:
-        # four swaps = 1 rotation...
-        onex, oney = one
-        twox, twoy = COREWIDTH-oney-1, onex
-        threex, threey = COREWIDTH-onex-1, COREHEIGHT-oney-1
-        fourx, foury = oney, COREHEIGHT - onex-1
+def drawOverlay():
+    """ Frame times, allocations and the slowest timers in a box over the top of the window"""
+    pygame.draw.rect(DISPLAYSURF, BLACK, OVERLAY_RECT)
+    top = OVERLAY_RECT.top + 4
+    hits, misses, cached = TILE_CACHE.stats()
+    evalHits, evalMisses, diskHits, lookupMs, computeMs, results = EVAL_CACHE.stats()
+    rate = 100.0 * evalHits / (evalHits + evalMisses) if evalHits + evalMisses else 0.0
+    for line in overlayLines() + ["tile cache {} hits, {} misses, {} surfaces".format(hits, misses, cached),
+                                  "eval cache {:.0f}% of {} ({} from disk), {:.2f} ms lookup, {:.1f} ms compute".format(
+                                      rate, evalHits + evalMisses, diskHits, lookupMs, computeMs)]:
+        textSurf = LABELFONT.render(line, True, WHITE) # not cached, the figures change every frame
+        DISPLAYSURF.blit(textSurf, (OVERLAY_RECT.left + 6, top))
+        top += LABELFONT.get_linesize()
 
-        # prepare the base surface
-        drawGUI(core, startCore, inventory, message)
-        baseSurf = DISPLAYSURF.copy()
-        # draw a blank space over the moving tile on the baseSurf Surface.
-        oneLeft, oneTop = getLeftTopOfTile(onex, oney)
-        twoLeft, twoTop = getLeftTopOfTile(twox, twoy)
-        threeLeft, threeTop = getLeftTopOfTile(threex, threey)
-        fourLeft, fourTop = getLeftTopOfTile(fourx, foury)
-
-        pygame.draw.rect(baseSurf, BGCOLOR, (oneLeft, oneTop, TILESIZE, TILESIZE))
-        pygame.draw.rect(baseSurf, BGCOLOR, (twoLeft, twoTop, TILESIZE, TILESIZE))
-        pygame.draw.rect(baseSurf, BGCOLOR, (threeLeft, threeTop, TILESIZE, TILESIZE))
-        pygame.draw.rect(baseSurf, BGCOLOR, (fourLeft, fourTop, TILESIZE, TILESIZE))
-
-        xdist = abs(onex-twox)
-        ydist = abs(oney-twoy)
-        dist = sqrt(xdist**2 + ydist**2) # not needed
-        xdir = -(onex-twox)/dist if xdist !=0 else 0
-        ydir = -(oney-twoy)/dist if ydist !=0 else 0
-        frames_required = animationSpeed
-        for j in range(0, int(frames_required)):
-            i = j#dist * j/frames_required#dist* (j/frames_required)
-            # animate the tile sliding over
-            adjx = (xdir*i*dist*TILESIZE)/frames_required if xdist !=0 else 0
-            adjy = (ydir*i*dist*TILESIZE)/frames_required if ydist !=0 else 0
-            checkForQuit()
-            DISPLAYSURF.blit(baseSurf, (0, 0))
-            #
-            if direction == 1:
-                if core[oney][onex].label != "Empty":
-                    drawTile(onex, oney, core[oney][onex].label, adjx, adjy, color=core[oney][onex].quadColor)
-                if core[twoy][twox].label != "Empty":
-                    drawTile(twox, twoy, core[twoy][twox].label, -1*adjy, adjx, color=core[twoy][twox].quadColor)
-                if core[threey][threex].label != "Empty":
-                    drawTile(threex, threey, core[threey][threex].label, -1*adjx, -1*adjy, color=core[threey][threex].quadColor)
-                if core[foury][fourx].label != "Empty":
-                    drawTile(fourx, foury, core[foury][fourx].label, adjy, -1*adjx, color=core[foury][fourx].quadColor)
-            else:
-                if core[oney][onex].label != "Empty":
-                    drawTile(onex, oney, core[oney][onex].label, -1*adjy, adjx, color=core[oney][onex].quadColor)
-                if core[twoy][twox].label != "Empty":
-                    drawTile(twox, twoy, core[twoy][twox].label, -1*adjx, -1*adjy, color=core[twoy][twox].quadColor)
-                if core[threey][threex].label != "Empty":
-                    drawTile(threex, threey, core[threey][threex].label, adjy, -1*adjx, color=core[threey][threex].quadColor)
-                if core[foury][fourx].label != "Empty":
-                    drawTile(fourx, foury, core[foury][fourx].label, adjx, adjy, color=core[foury][fourx].quadColor)
-
-            pygame.display.update()
-            FPSCLOCK.tick(FPS)
-
-def swapAnimation(core, startCore, inventory, one, two, message, animationSpeedSeconds):
-    """Animate the swapping of assemblies from one location to another.  This can be in the core or in the inventory"""
-    animationSpeed = int(FPS*animationSpeedSeconds)
-    # Note: This function does not check if the move is valid.
+def animateTile(assy, fromTile, toTile, delay, duration):
+    """Queue one tile sliding between two (tilex, tiley, coreImage) slots, the tile at toTile is hidden until it arrives"""
+    if assy.label == BLANK or assy.label == "Empty":
+        return
+    outline = TILEOUTLINE if assy.moved else BGCOLOR
+    surf = TILE_CACHE.getTile(assy.label, assy.quadColor, outline, TILESIZE, LABELFONT, TEXTCOLOR)
+    startLeft, startTop = getLeftTopOfTile(*fromTile)
+    endLeft, endTop = getLeftTopOfTile(*toTile)
+    ANIMATOR.add(surf, (startLeft - 1, startTop - 1), (endLeft - 1, endTop - 1), delay, duration,
+                 hides=(toTile[2], toTile[0], toTile[1]))
+
+@timed("animateRotate")
+def animateRotate(core, one, direction, delay=0, duration=SWAP_SECONDS):
+    """Animate the effective rotation of assemblies.  Call before the core data is changed."""
+    orbit = CORE_GEOMETRY.symmetry.rotationOrbit(one)
+    if orbit is None:
+        return # the assembly turns in place, the redrawn tile shows it
+    for i, (x, y) in enumerate(orbit):
+        tox, toy = orbit[(i + direction) % 4]
+        animateTile(core[y][x], (x, y, "Main"), (tox, toy, "Main"), delay, duration)
+
+@timed("animateSwap")
+def animateSwap(core, one, two, delay=0, duration=SWAP_SECONDS):
+    """Animate the swapping of assemblies, or a load from inventory item one[1] when one[0] is -1"""
     onex, oney = one
     twox, twoy = two
-    # prepare the base surface
-    drawGUI(core, startCore, inventory, message)
-    baseSurf = DISPLAYSURF.copy()
-    # draw a blank space over the moving tile on the baseSurf Surface.
     if onex == -1:
-        oneLeft, oneTop = getLeftTopOfTile(onex, oney, coreImage= "Inventory")
-        #convert onex and oney into approximations of screen coordinates in assembly positions..
-        posOneX = -17
-        posOneY = 17 + oney
-    else:
-        oneLeft, oneTop = getLeftTopOfTile(onex, oney)
-        posOneX = onex
-        posOneY = oney
-    if twox == -1:
-        twoLeft, twoTop = getLeftTopOfTile(twox, twoy, coreImage= "Inventory")
-        posTwoX = -17
-        posTwoY = 17 +twoy
+        item = STORED_INVENTORY.getItem(oney)
+        row = STORED_INVENTORY.rowOf(oney)
+        animateTile(item.assembly, (0, row, "Inventory"), (twox, twoy, "Main"), delay, duration)
+        # the retired assembly lands in its own item if it has one, otherwise at the end of the list
+        retiredID = STORED_INVENTORY.findItem(core[twoy][twox])
+        retiredRow = sum(1 for other in STORED_INVENTORY.inventoryList if retiredID is None or other.itemID < retiredID)
+        if item.quantity == 1 and (retiredID is None or oney < retiredID):
+            retiredRow -= 1
+        animateTile(core[twoy][twox], (twox, twoy, "Main"), (0, retiredRow, "Inventory"), delay, duration)
     else:
-        twoLeft, twoTop = getLeftTopOfTile(twox, twoy)
-        posTwoX = twox
-        posTwoY = twoy
-
-    pygame.draw.rect(baseSurf, BGCOLOR, (oneLeft, oneTop, TILESIZE, TILESIZE))
-    pygame.draw.rect(baseSurf, BGCOLOR, (twoLeft, twoTop, TILESIZE, TILESIZE))
-
-    xdist = abs(posOneX-posTwoX)
-    ydist = abs(posOneY-posTwoY)
-    dist = sqrt(xdist**2 + ydist**2) # not needed
-    xdir = -(posOneX-posTwoX)/dist if xdist !=0 else 0 # should be +/- 1 for x direction
-    ydir = -(posOneY-posTwoY)/dist if ydist !=0 else 0 # should be +/- 1 for y direction
-    frames_required = animationSpeed
-    #print(animationSpeed)
-    for j in range(0, int(frames_required)):
-        i = j#dist * j/frames_required#dist* (j/frames_required)
-        # animate the tile sliding over
-
-        adjx = (xdir*i*dist*TILESIZE)/frames_required if xdist !=0 else 0
-        adjy = (ydir*i*dist*TILESIZE)/frames_required if ydist !=0 else 0
-        checkForQuit()
-        DISPLAYSURF.blit(baseSurf, (0, 0))
-        #
-        if core[oney][onex].label != "Empty":
-            drawTile(posOneX, posOneY, core[oney][onex].label, adjx, adjy, color=core[oney][onex].quadColor)
-        if core[twoy][twox].label != "Empty":
-            drawTile(posTwoX, posTwoY, core[twoy][twox].label, -1*adjx, -1*adjy, color=core[twoy][twox].quadColor)
-        pygame.display.update()
-        FPSCLOCK.tick(FPS)
+        animateTile(core[oney][onex], (onex, oney, "Main"), (twox, twoy, "Main"), delay, duration)
+        animateTile(core[twoy][twox], (twox, twoy, "Main"), (onex, oney, "Main"), delay, duration)
 
 def generateInventory(inventoryString):
-    """ This function generates an invenotry object"""
-    """ TODO: Enable the loading of data into this function"""
+    """ This function generates an invenotry object: the built in "Example" or one read from a
+    .csv, .json or .jsonl file (see Importer.py).  Raises ValueError when it cannot."""
     listOfAssemblies = [Assembly("3.2",3.2),Assembly("2.4",2.4),Assembly("1.6", 1.6)]
     listOfQuantities = [30, 45, 25]
     listOfDescriptions = ["Fresh Uniform 3.2 wt/o U235","Fresh Uniform 2.4 wt/o U235","Fresh Uniform 1.6 wt/o U235"]
     if inventoryString == "Example":
         return StoredInventory(listOfAssemblies, listOfQuantities, listOfDescriptions)
-    else:
-        print("Error unkonwn inventory import")
-        exit()
+    return importInventory(inventoryString)
+
+def askFileName(title, save=False):
+    """ Asks the user for a file to open (or with save, to write), returns its path or None.  tkinter is only
+    loaded when needed and the dialog is given up (with a message on the console) where it is not available."""
+    try:
+        import tkinter
+        from tkinter import filedialog
+        root = tkinter.Tk()
+    except Exception as error: # no tkinter, or no display for it
+        log.warning("cannot open a file dialog: %s", error)
+        return None
+    try:
+        root.withdraw()
+        if save:
+            path = filedialog.asksaveasfilename(parent=root, title=title, filetypes=SESSION_FILE_TYPES,
+                                                defaultextension=SESSION_EXTENSION)
+        else:
+            path = filedialog.askopenfilename(parent=root, title=title, filetypes=IMPORT_FILE_TYPES)
+    finally:
+        root.destroy()
+    return path or None
+
+def importStartPattern():
+    """ Asks for a core map of the current core type, or a saved session, and reads it.  Returns
+    ((mainCore, startCore), message), the cores are None when nothing was imported."""
+    path = askFileName(IMPORT_DISCHARGE_PATTERN_MSG)
+    if path is None:
+        return None, CLICK_TO_SWAP_MSG
+    try:
+        if path.lower().endswith(SESSION_EXTENSION):
+            return openSession(path)
+        state = importCoreMap(path, CORE_GEOMETRY)
+    except (OSError, ValueError) as error:
+        log.warning("import of %s failed: %s", path, error)
+        return None, IMPORT_FAILED_MSG.format(error)
+    ANIMATOR.skip()
+    resetSession()
+    core = CoreSnapshot(state.toAssemblyCore())
+    return (core, core.snapshot()), IMPORTED_MSG.format(CORE_TYPE + " start pattern", path)
+
+def resetSession(session=None):
+    """ Starts the record of cycles again (a new pattern), or from an opened session file whose
+    earlier cycles are then read from the file when they are needed"""
+    global SESSION, VIEW_CYCLE
+    if SESSION is not None and SESSION is not session:
+        SESSION.close()
+    SESSION = session
+    VIEW_CYCLE = None
+    HISTORY.clear()
+    del CYCLE_MOVE_LIST[:]
+    if session is not None:
+        # left encoded (views of the file): only saving them again reads them, and it takes them as they are
+        CYCLE_MOVE_LIST.extend(session.moveTable(cycle) for cycle in range(session.cycleCount - 1))
+
+def openSession(path):
+    """ Continues a saved session: the core type, inventory and cores of the cycle in progress are loaded
+    and its moves so far can be undone.  Returns ((mainCore, startCore), message)."""
+    global STORED_INVENTORY
+    session = SessionFile(path)
+    try:
+        if session.cycleCount < 1 or session.coreType not in CORE_TYPES:
+            raise SessionFormatError(path + ": no cycles of a known core type")
+        inventory = session.inventory()
+        moves = session.moves(session.cycleCount - 1)
+    except ValueError:
+        session.close()
+        raise
+    ANIMATOR.skip()
+    setCoreType(session.coreType)
+    STORED_INVENTORY = inventory
+    resetSession(session)
+    mainCore = CoreSnapshot(session.currentState(ALPHABETCOORDS).toAssemblyCore())
+    startCore = CoreSnapshot(session.cycleState(session.cycleCount - 1, ALPHABETCOORDS).toAssemblyCore())
+    if moves:
+        HISTORY.recordMoves(moves) # already made, recorded so that they can be undone and exported
+    return (mainCore, startCore), SESSION_OPENED_MSG.format(path, session.cycleCount)
+
+def cycleStartState(cycle):
+    """ CoreState of the core at the start of a completed cycle, from the opened session or the history"""
+    saved = 0 if SESSION is None else SESSION.cycleCount - 1
+    if cycle < saved:
+        return SESSION.cycleState(cycle, ALPHABETCOORDS)
+    burns = [command for command in HISTORY.commands[:HISTORY.position] if isinstance(command, BurnCommand)]
+    return CoreState.fromAssemblyCore(burns[cycle - saved].before[1], CORE_TYPE, ALPHABETCOORDS)
+
+def saveSessionFile(mainCore, startCore):
+    """ Asks for a file name and saves the cores of every cycle, the inventory and the moves to it.
+    Returns the message to show."""
+    path = askFileName(SAVE_EXPORT_MSG, save=True)
+    if path is None:
+        return CLICK_TO_SWAP_MSG
+    cycles = [cycleStartState(cycle) for cycle in range(len(CYCLE_MOVE_LIST))]
+    cycles.append(CoreState.fromAssemblyCore(startCore, CORE_TYPE, ALPHABETCOORDS))
+    reopen = SESSION is not None and os.path.exists(path) and os.path.samefile(path, SESSION.path)
+    if reopen: # the open file is mapped, and a mapped file cannot be replaced on Windows
+        cycles = [state.copy() for state in cycles]
+        CYCLE_MOVE_LIST[:SESSION.cycleCount - 1] = [moves.copy() for moves in CYCLE_MOVE_LIST[:SESSION.cycleCount - 1]]
+        SESSION.close()
+    try:
+        saveSession(path, CORE_TYPE, cycles, CoreState.fromAssemblyCore(mainCore, CORE_TYPE, ALPHABETCOORDS),
+                    CYCLE_MOVE_LIST + [HISTORY.cycleMoves()], STORED_INVENTORY)
+    except (OSError, ValueError) as error:
+        log.warning("save to %s failed: %s", path, error)
+        return SAVE_FAILED_MSG.format(error)
+    finally:
+        if reopen:
+            reopenSession()
+    return SESSION_SAVED_MSG.format(len(cycles), path)
+
+def reopenSession():
+    """ Opens the session file again after saving over it; only the cycles it had before are read from it,
+    the later ones are still in the history"""
+    global SESSION
+    count = SESSION.cycleCount
+    SESSION = SessionFile(SESSION.path)
+    SESSION.cycleCount = count
+    CYCLE_MOVE_LIST[:count - 1] = [SESSION.moveTable(cycle) for cycle in range(count - 1)]
+
+def browseCycles(step):
+    """ Shows the start core of the previous (step -1) or next cycle on the left, after the last one
+    the live startCore again.  Returns the message to show."""
+    global VIEW_CYCLE
+    positions = list(range(len(CYCLE_MOVE_LIST))) + [None]
+    current = positions.index(VIEW_CYCLE) if VIEW_CYCLE in positions else len(positions) - 1
+    VIEW_CYCLE = positions[max(0, min(current + step, len(positions) - 1))]
+    if VIEW_CYCLE is None:
+        return CLICK_TO_SWAP_MSG
+    return CYCLE_VIEW_MSG.format(VIEW_CYCLE + 1, len(CYCLE_MOVE_LIST))
+
+def cycleView(startCore):
+    """ The core shown on the left: startCore, or the start of the cycle being browsed (made when first shown)"""
+    global VIEW_CYCLE, CYCLE_VIEW
+    if VIEW_CYCLE is not None and VIEW_CYCLE >= len(CYCLE_MOVE_LIST): # the cycle has been undone
+        VIEW_CYCLE = None
+    if VIEW_CYCLE is None:
+        return startCore
+    key = (VIEW_CYCLE, HISTORY.version, id(SESSION))
+    if CYCLE_VIEW[0] != key:
+        CYCLE_VIEW = (key, CoreSnapshot(cycleStartState(VIEW_CYCLE).toAssemblyCore()))
+    return CYCLE_VIEW[1]
+
+def importFuelInventory():
+    """ Asks for an inventory file and reads it.  Returns (inventory, message), the inventory is None
+    when nothing was imported."""
+    path = askFileName(IMPORT_FUEL_INVENTORY_MSG)
+    if path is None:
+        return None, CLICK_TO_SWAP_MSG
+    try:
+        inventory = generateInventory(path)
+    except (OSError, ValueError) as error:
+        log.warning("import of %s failed: %s", path, error)
+        return None, IMPORT_FAILED_MSG.format(error)
+    return inventory, IMPORTED_MSG.format("fuel inventory", path)
 
 def generateNewPattern(coreString):
     """Reset the core data """
-    global CORE_TYPE
-    global STORED_INVENTORY
     setCoreType(coreString)
-    #CORE_TYPE = coreString
+    resetSession()
     sequence = []
-    core = getStartingCore()
-    start = copy.deepcopy(core)
-    inventory = STORED_INVENTORY
-    drawGUI(core, start, inventory, '')
-    pygame.display.update()
-    lastMove = None
+    core = CoreSnapshot(getStartingCore())
+    start = core.snapshot()
+    REGIONS.markAll()
     return (core, start, sequence)
 
-def doBurnup(mainCore, startCore, moves):
+@timed("doBurnup")
+def doBurnup(mainCore, startCore):
     """Burnup the core"""
     """TODO: link this code into PANTHER or other modelling programs"""
     global CYCLE_MOVE_LIST
@@ -955,103 +1106,93 @@ def doBurnup(mainCore, startCore, moves):
                 proceed = False
                 message = EMPTY_ASSEMBLY_MSG
     if proceed:
+        moves = HISTORY.cycleMoves()
+        before = (mainCore.snapshot(), startCore)
+        plan = shufflePlan(startCore, mainCore, moves) # before the burnup changes the assemblies
+        transfers = travelTasks(startCore, mainCore) if TRANSFER_FILES else None
         CYCLE_MOVE_LIST.append(moves)
-        dist = 0
-        maxdist =0
-        for  tiley, row in enumerate(mainCore):
-            #print ("dist= "+str(dist) +"max "+str(maxdist))
-            for tilex, column in enumerate(row):
-                if mainCore[tiley][tilex].label != BLANK and mainCore[tiley][tilex].label != "Empty":
-                    posy = -2*tiley + 15.5
-                    posx = -2*tilex + 15.5
-                    dist = 10 * sqrt(posy*posy + posx*posx)
-                    maxdist = dist if dist>maxdist else maxdist
-                    r,g,b = mainCore[tiley][tilex].quadColor[0]
-                    mainCore[tiley][tilex].quadColor[0]= (min(255, r + 255-dist), g*0.7, b)
-                    dist = 10 * sqrt(posy*posy + (posx+1)*(posx+1))
-                    r,g,b = mainCore[tiley][tilex].quadColor[1]
-                    mainCore[tiley][tilex].quadColor[1]=(min(255, r + 255-dist), g*0.7, b)
-                    dist = 10 * sqrt((posy+1)*(posy+1) + posx*posx)
-                    r,g,b = mainCore[tiley][tilex].quadColor[2]
-                    mainCore[tiley][tilex].quadColor[2]=(min(255, r + 255-dist), g*0.7, b)
-                    dist = 10 * sqrt((posy+1)*(posy+1) + (posx+1)*(posx+1))
-                    r,g,b = mainCore[tiley][tilex].quadColor[3]
-                    mainCore[tiley][tilex].quadColor[3]=(min(255, r + 255-dist), g*0.7, b)
-                    mainCore[tiley][tilex].moved = False
-        exportMovesList(mainCore, moves)
-        moves = []
-        startCore = copy.deepcopy(mainCore)
-    return mainCore, startCore, moves, message
-
-def exportMovesList(core, moves):
-    """ export a list of moves to a text file"""
-    original_stdout = sys.stdout
-    with open('./fuel_move_list.txt', 'w') as f:
-        sys.stdout = f # Change the standard output to the file we created.
-        print('#To reload the Core:')
-        for move in moves:
-            if move[0] == "swap":
-                printSwap(core, move[1], move[2])
-                print("swap: " )
-            elif move[0] == "rotate":
-                printRotate(core, move[1], move[2])
-            else:
-                print("unknown command in history")
-    sys.stdout = original_stdout # Reset the standard output to its original value
+        state = CoreState.fromAssemblyCore(mainCore, CORE_TYPE, ALPHABETCOORDS)
+        BurnupModel.burnState(state)
+        colors = BurnupModel.quadColors(state.burnup, state.enrichment, state.poisons)
+        for tiley, row in enumerate(mainCore):
+            for tilex, assy in enumerate(row):
+                if assy.label != BLANK and assy.label != "Empty":
+                    assy = mainCore.mutable(tilex, tiley)
+                    assy.Burnup = [float(b) for b in state.burnup[tiley, tilex]]
+                    assy.BurnablePoisons = float(state.poisons[tiley, tilex])
+                    assy.quadColor = [tuple(c) for c in colors[tiley, tilex].tolist()]
+                    assy.moved = False
+        exportMovesList(startCore, plan, len(CYCLE_MOVE_LIST))
+        if transfers:
+            TRAVEL_JOBS.append((len(CYCLE_MOVE_LIST), TravelRunner(transfers, poolLocation(startCore), TRAVEL_BUDGET),
+                                CORE_GEOMETRY.coords)) # the core type may change before the search ends
+        startCore = mainCore.snapshot()
+        HISTORY.record(BurnCommand(before, (mainCore.snapshot(), startCore), moves))
+    return mainCore, startCore, message
 
-def resetAnimation(core, startCore, moves, reverse=True):
-    """Carry out moves in the moves list of moves.  This can reset the core if the 'reverse' variable is true, or can 'redo' if it is false..."""
-    global STORED_INVENTORY
-    # make all of the moves in allMoves in reverse
-    revAllMoves = moves[:] # gets a copy of the list
-    print("move list:")
-    print(moves)
-    if reverse:
-        revAllMoves.reverse()
-        rotationDir = -1
-    else:
-        rotationDir = 1
-    print("reversed:")
-    print(revAllMoves)
-    for move in revAllMoves:
-        if move[0] == "swap":
-            swapAnimation(core, startCore, STORED_INVENTORY, move[1], move[2], RESET_MSG, animationSpeedSeconds=0.45)
-            makeSwap(core, move[1], move[2])
-        elif move[0] == "rotate":
-            rotateAnimation(core, startCore, STORED_INVENTORY, move[1], rotationDir*move[2], RESET_MSG, animationSpeedSeconds=0.45)
-            makeRotate(core, move[1], rotationDir*move[2])
-        elif move[0] == "remove":
-            removed = makeLoad(core, move[1], move[2])
+def shufflePlan(startCore, mainCore, moves):
+    """ The shortest moves from startCore to mainCore, or moves (those made) if the planner cannot
+    account for every assembly"""
+    try:
+        return planShuffle(startCore, mainCore, STORED_INVENTORY, not CORE_GEOMETRY.fullCore)
+    except ValueError as error:
+        log.warning("no shuffle plan, using the moves made: %s", error)
+        return moves
 
-        elif move[0] == "load":
-            removedIdx = makeRemove(core, move[1])
-            #print(removedIdx)
-            #print(move[2])
-            assert STORED_INVENTORY.inventoryList[removedIdx].assembly.isSame(STORED_INVENTORY.inventoryList[move[2]].assembly)
-            STORED_INVENTORY.inventoryList[move[2]].quantity +=1
-            del STORED_INVENTORY.inventoryList[removedIdx]
-        else:
-            print("unknown command in history")
-    assert core
-    if reverse:
-        moves =[]
-        for i, row in enumerate(core):
-            for j, assy in enumerate(row):
-                assy.moved = False
-                #print(assy.label)
-                #print(startCore[i][j].label)
-                assert assy.label == startCore[i][j].label
-    moves = switchLoadRemoveOrder(moves)
-    return moves
-
-def switchLoadRemoveOrder(moves):
-    """Not implemented yet, function to fix the fact that a load to  location
-    that already contains an assembly results in a remove then a load, this
-    needs to be switched in order in the record when the reverse is kept..."""
-    #TODO: implement this function - understand why things break
-    pass
-
-    return moves
+def replayCycle(mainCore, startCore):
+    """ Replaces the moves made this cycle with the shortest shuffle giving the same core (see ShufflePlanner)
+    and replays it, animated, from the start of the cycle.  Returns the message to show."""
+    made = [move for move in HISTORY.cycleMoves() if move[0] != "noMove"]
+    if not made or HISTORY.position != HISTORY.cycleEnd():
+        return CLICK_TO_SWAP_MSG # nothing made, or moves that could be redone would be lost
+    plan = shufflePlan(startCore, mainCore, None)
+    if plan is None:
+        return CLICK_TO_SWAP_MSG
+    stepHistory(mainCore, startCore, False, jump=True) # back to the start of the cycle
+    for rect in ANIMATOR.skip():
+        REGIONS.mark(rect)
+    if plan:
+        playMoves(mainCore, plan, REPLAY_STAGGER)
+        HISTORY.recordMoves(plan)
+    return REPLAY_PLAN_MSG.format(len(plan), len(made))
+
+def travelTasks(startCore, mainCore):
+    """ The crane's transfers from startCore to mainCore (see TravelOptimizer), None if the planner cannot
+    account for every assembly"""
+    try:
+        return transferTasks(startCore, mainCore, STORED_INVENTORY, not CORE_GEOMETRY.fullCore)
+    except ValueError as error:
+        log.warning("no crane transfers: %s", error)
+        return None
+
+def pollTravelJobs():
+    """ Writes the transfers of every finished transfer order search to the TRANSFER_FILES.  Returns the message to show or None"""
+    message = None
+    for entry in [entry for entry in TRAVEL_JOBS if entry[1].done]:
+        TRAVEL_JOBS.remove(entry)
+        cycle, job, coords = entry
+        if job.result is None:
+            log.error("transfer order for cycle %s failed: %s", cycle, job.error)
+            continue
+        order, travel, greedy, initial = job.result
+        log.info("transfer order for cycle %s: travel %s, greedy %s, plan order %s", cycle, travel, greedy, initial)
+        try:
+            for path in TRANSFER_FILES:
+                MoveExporter(path).writeTransfers(cycle, job.ordered(), coords)
+        except OSError as error:
+            log.error("cannot write the transfers: %s", error)
+            message = SAVE_FAILED_MSG.format(error)
+            continue
+        message = TRANSFERS_ORDERED_MSG.format(cycle, travel, initial)
+    return message
+
+def exportMovesList(core, moves, cycle):
+    """ Append the moves of a cycle, made from core (the core at the start of the cycle), to the EXPORT_FILES"""
+    for path in EXPORT_FILES:
+        labels = [[assy.label for assy in row] for row in core]
+        MoveExporter(path).writeCycle(cycle, labels, moves, getCoords, CORE_GEOMETRY.symmetry,
+                                      lambda itemID: STORED_INVENTORY.getItem(itemID).assembly.label)
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support() # the Solve button starts worker processes
     main()
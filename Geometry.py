@@ -0,0 +1,80 @@
+#
+#  Screen layout of the core images and the inventory list, and its inverse.
+#
+import numpy as np
+
+class TileGeometry:
+    """ Pixel positions of the tiles of one core type.  leftTop() is the layout used by getLeftTopOfTile(),
+    spotAt() inverts it: Main and Start through a precomputed pixel -> tile table, the Inventory arithmetically."""
+    def __init__(self, tileSize, xMainMargin, xStartMargin, yMargin, coreHeight, inventoryColumnSize, tilesPerColumn):
+        self.tileSize = tileSize
+        self.xMainMargin = xMainMargin
+        self.xStartMargin = xStartMargin
+        self.yMargin = yMargin
+        self.coreHeight = coreHeight
+        self.inventoryColumnSize = inventoryColumnSize
+        self.tilesPerColumn = tilesPerColumn
+        self.inventoryLeft = 2 * xStartMargin - 1
+        self.inventoryTop = 5 + yMargin + (coreHeight + 2) * tileSize + 2
+        self.lookupTables = {} # row lengths -> pixel to tile table for the core images
+
+    def leftTop(self, tileX, tileY, coreImage="Main"):
+        """ Gets the screen coordinates from the assembly coordinates for cores or inventory"""
+        if coreImage == "Main":
+            return (self.xMainMargin + (tileX * self.tileSize) + (tileX - 1), self.yMargin + (tileY * self.tileSize) + (tileY - 1))
+        elif coreImage == "Start":
+            return (self.xStartMargin + (tileX * self.tileSize) + (tileX - 1), self.yMargin + (tileY * self.tileSize) + (tileY - 1))
+        elif coreImage == "Inventory":
+            left = self.inventoryLeft + (tileX * (self.tileSize + 1)) + ((tileY // self.tilesPerColumn) * self.inventoryColumnSize)
+            top = self.inventoryTop + (tileY % self.tilesPerColumn) * self.tileSize
+            return (left, top)
+        raise ValueError("Unknown core position requested: " + str(coreImage))
+
+    def lookupTable(self, rowLengths):
+        """ Table over the pixels of a core image giving the flat tile index (y * width + x) under
+        each pixel, or -1 for the one pixel gaps and positions beyond the end of a row"""
+        rowLengths = tuple(rowLengths)
+        table = self.lookupTables.get(rowLengths)
+        if table is None:
+            pitch = self.tileSize + 1
+            width, height = max(rowLengths), len(rowLengths)
+            cols = np.arange(width * pitch)
+            rows = np.arange(height * pitch)
+            tileX = np.where(cols % pitch < self.tileSize, cols // pitch, -1)
+            tileY = np.where(rows % pitch < self.tileSize, rows // pitch, -1)
+            inRow = tileX[None, :] < np.asarray(rowLengths)[tileY][:, None]
+            valid = (tileX[None, :] >= 0) & (tileY[:, None] >= 0) & inRow
+            table = np.where(valid, tileY[:, None] * width + tileX[None, :], -1).astype(np.int32)
+            self.lookupTables[rowLengths] = table
+        return table
+
+    def spotAt(self, x, y, rowLengths, inventorySize, coreImage="Main"):
+        """ The tile (tileX, tileY) under pixel x, y in the given core image, or (None, None)"""
+        if coreImage == "Inventory":
+            u = x - self.inventoryLeft
+            v = y - self.inventoryTop
+            if u < 0 or v < 0:
+                return (None, None)
+            column, offset = divmod(u, self.inventoryColumnSize)
+            row = v // self.tileSize
+            index = column * self.tilesPerColumn + row
+            if offset < self.tileSize and row < self.tilesPerColumn and index < inventorySize:
+                return (0, int(index))
+            return (None, None)
+        table = self.lookupTable(rowLengths)
+        originX, originY = self.leftTop(0, 0, coreImage)
+        u, v = int(x - originX), int(y - originY)
+        if 0 <= v < table.shape[0] and 0 <= u < table.shape[1]:
+            index = table[v, u]
+            if index >= 0:
+                tileY, tileX = divmod(int(index), max(rowLengths))
+                return (tileX, tileY)
+        return (None, None)
+
+    def hitTest(self, x, y, rowLengths, inventorySize):
+        """ Returns (coreImage, tileX, tileY) for the Main core or the Inventory under pixel x, y, or (None, None, None)"""
+        for coreImage in ("Main", "Inventory"):
+            tileX, tileY = self.spotAt(x, y, rowLengths, inventorySize, coreImage)
+            if tileX is not None:
+                return (coreImage, tileX, tileY)
+        return (None, None, None)
@@ -0,0 +1,126 @@
+#
+#  Undo/redo history of the shuffle, one invertible command per action.
+#
+
+def invertMove(move):
+    """ The move (in the allMoves format) that undoes move"""
+    kind = move[0]
+    if kind == "swap":
+        return ["swap", move[1], move[2]]
+    elif kind == "rotate":
+        return ["rotate", move[1], -move[2]]
+    elif kind == "load": # the loaded assembly goes back into the item it came from
+        return ["remove", move[1], move[2]]
+    elif kind == "remove":
+        return ["load", move[1], move[2]]
+    elif kind == "noMove":
+        return move
+    raise ValueError("unknown command in history: " + str(kind))
+
+def invertMoves(moves):
+    return [invertMove(move) for move in reversed(moves)]
+
+class MoveCommand:
+    """ One user action made of moves (a swap, a rotation, a load with the retirement it caused, a remove
+    or a whole solver result) and the moves that undo it"""
+    def __init__(self, moves):
+        self.moves = list(moves)
+        self.inverse = invertMoves(self.moves)
+
+class BurnCommand:
+    """ A cycle burn.  Burning cannot be inverted by moves, so the command keeps the cores (copies of
+    the assemblies) from before and after the burn together with the moves of the cycle it ended."""
+    def __init__(self, before, after, cycleMoves):
+        self.before = before   # (mainCore, startCore)
+        self.after = after
+        self.cycleMoves = cycleMoves
+
+class History:
+    """ The commands done and undone; position counts those applied and version changes with every step"""
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.commands = []
+        self.position = 0
+        self.version = getattr(self, "version", 0) + 1
+
+    def record(self, command):
+        """ Adds a command that has just been carried out, dropping anything that could have been redone"""
+        del self.commands[self.position:]
+        self.commands.append(command)
+        self.position += 1
+        self.version += 1
+        return command
+
+    def recordMoves(self, moves):
+        return self.record(MoveCommand(moves))
+
+    def canUndo(self):
+        return self.position > 0
+
+    def canRedo(self):
+        return self.position < len(self.commands)
+
+    def undo(self):
+        """ Steps back one command and returns it (the caller applies its inverse), or None"""
+        if not self.canUndo():
+            return None
+        self.position -= 1
+        self.version += 1
+        return self.commands[self.position]
+
+    def redo(self):
+        """ Steps forward one command and returns it (the caller applies its moves), or None"""
+        if not self.canRedo():
+            return None
+        self.position += 1
+        self.version += 1
+        return self.commands[self.position - 1]
+
+    def cycleStart(self, position=None):
+        """ Position just after the last burn before position (default the current position)"""
+        position = self.position if position is None else position
+        for i in range(position, 0, -1):
+            if isinstance(self.commands[i - 1], BurnCommand):
+                return i
+        return 0
+
+    def cycleEnd(self, position=None):
+        """ Position just before the next burn after position (or the end of the history)"""
+        position = self.position if position is None else position
+        for i in range(position, len(self.commands)):
+            if isinstance(self.commands[i], BurnCommand):
+                return i
+        return len(self.commands)
+
+    def jumpTo(self, position):
+        """ Moves to position, returning the (command, forward) steps with consecutive moves merged"""
+        position = max(0, min(position, len(self.commands)))
+        if position >= self.position:
+            path = [(command, True) for command in self.commands[self.position:position]]
+        else:
+            path = [(command, False) for command in reversed(self.commands[position:self.position])]
+        if position != self.position:
+            self.position = position
+            self.version += 1
+        steps = []
+        batch = []
+        for command, forward in path:
+            if isinstance(command, MoveCommand):
+                batch.extend(command.moves if forward else command.inverse)
+                continue
+            if batch:
+                steps.append((MoveCommand(batch), True))
+                batch = []
+            steps.append((command, forward))
+        if batch:
+            steps.append((MoveCommand(batch), True))
+        return steps
+
+    def cycleMoves(self):
+        """ The moves made since the last burn, in the allMoves format"""
+        moves = []
+        for command in self.commands[self.cycleStart():self.position]:
+            moves.extend(command.moves)
+        return moves
@@ -0,0 +1,313 @@
+#
+#  Import of start patterns and fuel inventories from CSV, JSON and JSON Lines.
+#
+import csv
+import json
+import os
+from Assembly import Assembly
+from CoreState import CoreState
+from StoredInventory import StoredInventory
+
+READ_CHUNK = 1 << 16   # characters read at a time from a JSON array
+MAX_ENRICHMENT = 20.0  # wt/o, anything above is a typing error
+
+# accepted column names (lower case) for each field
+ALIASES = {
+    "label":       ("label", "name", "id", "assembly"),
+    "position":    ("position", "pos", "location", "coords"),
+    "x":           ("x",),
+    "y":           ("y",),
+    "enrichment":  ("enrichment", "uo2wt", "wt", "u235"),
+    "mox":         ("mox",),
+    "burnup":      ("burnup", "bu"),
+    "poisons":     ("poisons", "burnablepoisons", "bp"),
+    "leak":        ("leak", "suspected_for_leak", "leaker"),
+    "quantity":    ("quantity", "qty", "count"),
+    "description": ("description", "desc", "comment"),
+    "cycle":       ("cycle",),
+}
+QUADRANT_COLUMNS = ("burnup1", "burnup2", "burnup3", "burnup4")
+TRUE_WORDS = ("1", "true", "yes", "y", "t")
+FALSE_WORDS = ("", "0", "false", "no", "n", "f")
+
+class ImportFormatError(ValueError):
+    """ A record that cannot be imported, with the file and line (or record number) it came from"""
+    def __init__(self, source, line, message):
+        ValueError.__init__(self, str(source) + ":" + str(line) + ": " + message)
+        self.source = source
+        self.line = line
+
+def _fieldMap(keys):
+    """ field -> key of the record holding it, for the keys (column names) of a file"""
+    lookup = {str(key).strip().lower(): key for key in keys}
+    fields = {}
+    for field, names in ALIASES.items():
+        for name in names:
+            if name in lookup:
+                fields[field] = lookup[name]
+                break
+    quadrants = [lookup[name] for name in QUADRANT_COLUMNS if name in lookup]
+    if quadrants:
+        if len(quadrants) != 4:
+            raise ValueError("burnup needs all four columns " + ", ".join(QUADRANT_COLUMNS))
+        fields["burnup"] = tuple(quadrants)
+    return fields
+
+def iterCsvRecords(file):
+    """ Yields (line, record) with the record a dict keyed by the header of the CSV file"""
+    reader = csv.DictReader(file)
+    for record in reader:
+        if any(value not in (None, "") for value in record.values()):
+            yield reader.line_num, record
+
+def iterJsonRecords(file):
+    """ Yields (number, record) for the objects of a JSON array, of a JSON Lines file, or of the list held
+    under "records" in a single object.  Arrays and JSON Lines are decoded one record at a time."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = file.read(READ_CHUNK)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def skip(separators=" \t\r\n"):
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in separators:
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+
+    def decode():
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buffer) and not eof and not isinstance(value, (dict, list, str)):
+                fill() # a number may continue in the next chunk
+                continue
+            position = end
+            return value
+
+    fill()
+    skip()
+    number = 0
+    if buffer[position:position + 1] == "[":
+        position += 1
+        while True:
+            skip(" \t\r\n,")
+            if eof and position >= len(buffer):
+                raise ValueError("JSON array is not closed")
+            if buffer[position] == "]":
+                return
+            number += 1
+            yield number, decode()
+    while True:
+        skip()
+        if position >= len(buffer):
+            return
+        value = decode()
+        if isinstance(value, dict) and isinstance(value.get("records"), list):
+            for record in value["records"]:
+                number += 1
+                yield number, record
+        else:
+            number += 1
+            yield number, value
+
+def iterRecords(path):
+    """ Yields (line or record number, record dict) from a .csv, .json or .jsonl file"""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="") as file:
+        if extension == ".csv":
+            records = iterCsvRecords(file)
+        elif extension in (".json", ".jsonl", ".ndjson"):
+            records = iterJsonRecords(file)
+        else:
+            raise ValueError("unknown import format '" + extension + "', use .csv, .json or .jsonl")
+        for line, record in records:
+            if not isinstance(record, dict):
+                raise ImportFormatError(path, line, "expected a record (an object with named fields)")
+            yield line, record
+
+class RecordReader:
+    """ Turns the fields of one record into checked values.  The column names are matched once per file."""
+    def __init__(self, source):
+        self.source = source
+        self.keys = None
+        self.fields = None
+
+    def start(self, line, record):
+        keys = tuple(record)
+        if keys != self.keys:
+            try:
+                self.fields = _fieldMap(keys)
+            except ValueError as error:
+                raise ImportFormatError(self.source, line, str(error))
+            self.keys = keys
+        self.line = line
+        self.record = record
+
+    def fail(self, message):
+        raise ImportFormatError(self.source, self.line, message)
+
+    def raw(self, field):
+        key = self.fields.get(field)
+        if key is None:
+            return None
+        if isinstance(key, tuple):
+            return [self.record.get(k) for k in key]
+        value = self.record.get(key)
+        return None if isinstance(value, str) and not value.strip() else value
+
+    def text(self, field, default=None):
+        value = self.raw(field)
+        if value is None:
+            if default is None:
+                self.fail("missing " + field)
+            return default
+        return str(value).strip()
+
+    def number(self, field, default=None, low=0.0, high=None):
+        value = self.raw(field)
+        if value is None:
+            if default is None:
+                self.fail("missing " + field)
+            return default
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            self.fail(field + " is not a number: " + repr(value))
+        if value != value or value < low or (high is not None and value > high):
+            self.fail(field + " out of range: " + repr(value))
+        return value
+
+    def integer(self, field, default=None, low=0):
+        value = self.number(field, default, low)
+        if value != int(value):
+            self.fail(field + " is not a whole number: " + repr(value))
+        return int(value)
+
+    def flag(self, field):
+        value = self.raw(field)
+        if value is None or isinstance(value, bool):
+            return bool(value)
+        word = str(value).strip().lower()
+        if word in TRUE_WORDS:
+            return True
+        if word in FALSE_WORDS:
+            return False
+        self.fail(field + " is not yes or no: " + repr(value))
+
+    def burnup(self):
+        """ Four quadrant burnups from one value (all quadrants), a list, a 'b1;b2;b3;b4' string or four columns"""
+        value = self.raw("burnup")
+        if value is None:
+            return (0.0, 0.0, 0.0, 0.0)
+        if isinstance(value, str):
+            value = value.replace(";", " ").replace(",", " ").split()
+        elif not isinstance(value, (list, tuple)):
+            value = [value]
+        if len(value) == 1:
+            value = list(value) * 4
+        if len(value) != 4:
+            self.fail("burnup needs one or four values, got " + str(len(value)))
+        try:
+            quads = tuple(float(b) for b in value)
+        except (TypeError, ValueError):
+            self.fail("burnup is not a number: " + repr(value))
+        if any(b != b or b < 0 for b in quads):
+            self.fail("burnup out of range: " + repr(value))
+        return quads
+
+    def fuel(self):
+        """ (label, enrichment, mox, burnup, poisons, leak) of the record"""
+        return (self.text("label"),
+                self.number("enrichment", high=MAX_ENRICHMENT),
+                self.number("mox", 0.0, high=100.0),
+                self.burnup(),
+                self.number("poisons", 10.0),
+                self.flag("leak"))
+
+def importInventory(path, cycle=None):
+    """ Reads a fuel inventory, merging identical assemblies and keeping only cycle (the last by default).
+    Returns a StoredInventory."""
+    reader = RecordReader(path)
+    cycles = {} # cycle -> {fuel key: [quantity, description]}
+    for line, record in iterRecords(path):
+        reader.start(line, record)
+        key = reader.fuel()
+        quantity = reader.integer("quantity", 1, low=1)
+        description = reader.text("description", "imported from " + os.path.basename(path))
+        recordCycle = reader.text("cycle", "")
+        if cycle is not None and recordCycle != str(cycle):
+            continue
+        batches = cycles.setdefault(recordCycle, {})
+        batch = batches.get(key)
+        if batch is None:
+            batches[key] = [quantity, description]
+        else:
+            batch[0] += quantity
+    if not cycles:
+        raise ValueError(str(path) + ": no inventory records" + ("" if cycle is None else " for cycle " + str(cycle)))
+    batches = cycles[max(cycles, key=_cycleOrder)]
+    inventory = StoredInventory([], [], [])
+    for (label, enrichment, mox, burnup, poisons, leak), (quantity, description) in batches.items():
+        assembly = Assembly(label, enrichment, burnup, poisons, mox)
+        assembly.SUSPECTED_FOR_LEAK = leak
+        inventory.addInventoryItem(assembly, quantity, description)
+    return inventory
+
+def _cycleOrder(cycle):
+    try:
+        return (1, float(cycle), cycle)
+    except ValueError:
+        return (0, 0.0, cycle)
+
+def importCoreMap(path, coreType):
+    """ Reads a start pattern for coreType, each fuel position given exactly once.  Returns a CoreState."""
+    state = CoreState(coreType.width, coreType.height, coreType.name, coreType.alphabetCoords)
+    state.rowLengths = list(coreType.rowLengths)
+    blank = coreType.blankMask
+    positions = {coreType.coords(x, y): (x, y) for y in range(coreType.height) for x in range(coreType.width) if not blank[y, x]}
+    seen = {}
+    reader = RecordReader(path)
+    for line, record in iterRecords(path):
+        reader.start(line, record)
+        name = reader.raw("position")
+        if name is not None:
+            name = str(name).strip().upper()
+            if name not in positions:
+                reader.fail("no fuel position " + name + " in a " + coreType.name + " core")
+            x, y = positions[name]
+        else:
+            x = reader.integer("x")
+            y = reader.integer("y")
+            if not (y < coreType.height and x < coreType.width) or blank[y, x]:
+                reader.fail("no fuel position at x " + str(x) + ", y " + str(y) + " in a " + coreType.name + " core")
+            name = coreType.coords(x, y)
+        if (x, y) in seen:
+            reader.fail(name + " is already given on line " + str(seen[(x, y)]))
+        seen[(x, y)] = line
+        label = reader.text("label")
+        if label == "Empty":
+            state.labelIndex[y, x] = state.internLabel(label)
+            continue
+        label, enrichment, mox, burnup, poisons, leak = reader.fuel()
+        state.setRecord(x, y, label, enrichment, burnup, poisons, mox, leak)
+    missing = [name for name, position in positions.items() if position not in seen]
+    if missing:
+        raise ValueError(str(path) + ": " + str(len(missing)) + " fuel positions are not given: " + ", ".join(missing[:8]) +
+                         (", ..." if len(missing) > 8 else ""))
+    return state
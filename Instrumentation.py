@@ -0,0 +1,200 @@
+#
+#  Logging, timers and counters.  LPT_LOG_LEVEL sets the level, LPT_PROFILE a
+#  file the profile is written to on exit.
+#
+import atexit
+import json
+import logging
+import os
+import time
+import tracemalloc
+from collections import deque
+from functools import wraps
+
+STARTED = time.perf_counter() # startup is timed from the first import of this module
+FRAME_WINDOW = 120 # frames kept for the frame time figures
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+log = logging.getLogger("lpt")
+
+class Stat:
+    """ Calls and time spent (seconds) in one timed section"""
+    __slots__ = ("calls", "total", "worst")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.worst = 0.0
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.worst:
+            self.worst = seconds
+
+    def asDict(self):
+        return {"calls": self.calls, "totalMs": self.total * 1000.0, "worstMs": self.worst * 1000.0,
+                "meanMs": self.total * 1000.0 / self.calls if self.calls else 0.0}
+
+class Profile:
+    """ The timers, counters and recent frame times.  enabled switches recording on and off,
+    allocations also traces memory (tracemalloc, which slows everything down while it is on)."""
+    def __init__(self):
+        self.enabled = False
+        self.timers = {}
+        self.counters = {}
+        self.frames = deque(maxlen=FRAME_WINDOW)
+        self.frameStart = None
+        self.allocations = deque(maxlen=FRAME_WINDOW)
+        self.lastTraced = None
+        self.dumpPath = None
+        self.marks = [] # (stage, seconds since STARTED), recorded even when profiling is off
+
+    def reset(self):
+        self.timers.clear()
+        self.counters.clear()
+        self.frames.clear()
+        self.allocations.clear()
+        self.frameStart = None
+        self.lastTraced = None
+
+PROFILE = Profile()
+
+def setProfiling(on, allocations=False):
+    """ Starts (or stops) recording timers and counters, and optionally the memory allocated per frame"""
+    PROFILE.enabled = on
+    PROFILE.frameStart = None
+    if on and allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        PROFILE.lastTraced = None
+    elif not (on and allocations) and tracemalloc.is_tracing():
+        tracemalloc.stop()
+        PROFILE.allocations.clear()
+
+def timed(name):
+    """ Decorator timing every call of a function under name"""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not PROFILE.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stat = PROFILE.timers.get(name)
+                if stat is None:
+                    stat = PROFILE.timers[name] = Stat()
+                stat.add(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+class timer:
+    """ Context manager timing a block under name"""
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter() if PROFILE.enabled else None
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            stat = PROFILE.timers.get(self.name)
+            if stat is None:
+                stat = PROFILE.timers[self.name] = Stat()
+            stat.add(time.perf_counter() - self.start)
+
+def count(name, n=1):
+    """ Adds n to a counter"""
+    if PROFILE.enabled:
+        PROFILE.counters[name] = PROFILE.counters.get(name, 0) + n
+
+def frame():
+    """ Marks the end of a frame of the main loop: records the frame time and, when traced, the
+    memory allocated during the frame"""
+    if not PROFILE.enabled:
+        return
+    now = time.perf_counter()
+    if PROFILE.frameStart is not None:
+        PROFILE.frames.append(now - PROFILE.frameStart)
+    PROFILE.frameStart = now
+    PROFILE.counters["frames"] = PROFILE.counters.get("frames", 0) + 1
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        if PROFILE.lastTraced is not None:
+            PROFILE.allocations.append(max(0, current - PROFILE.lastTraced))
+        PROFILE.lastTraced = current
+
+def mark(stage):
+    """ Records that startup has reached stage"""
+    PROFILE.marks.append((stage, time.perf_counter() - STARTED))
+
+def reportStartup(target=None):
+    """ Logs the time (ms) to each startup stage, as a warning when the last one took longer than target ms.
+    Returns the time to the last stage."""
+    if not PROFILE.marks:
+        return 0.0
+    total = PROFILE.marks[-1][1] * 1000.0
+    level = logging.WARNING if target is not None and total > target else logging.INFO
+    if log.isEnabledFor(level):
+        stages = ", ".join("{} {:.0f}".format(stage, seconds * 1000.0) for stage, seconds in PROFILE.marks)
+        log.log(level, "startup %.0f ms (%s)%s", total, stages, "" if target is None else ", target " + str(target) + " ms")
+    return total
+
+def overlayLines(top=3):
+    """ Short lines for the on-screen overlay: frame times, allocations and the slowest timers"""
+    lines = []
+    frames = PROFILE.frames
+    if frames:
+        mean = sum(frames) / len(frames)
+        lines.append("frame {:.1f} ms mean, {:.1f} ms worst ({} frames)".format(mean * 1000.0, max(frames) * 1000.0, len(frames)))
+    else:
+        lines.append("frame - (waiting for input)")
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        perFrame = sum(PROFILE.allocations) / len(PROFILE.allocations) if PROFILE.allocations else 0
+        lines.append("memory {:.0f} kB, peak {:.0f} kB, +{:.1f} kB/frame".format(current / 1024.0, peak / 1024.0, perFrame / 1024.0))
+    slowest = sorted(PROFILE.timers.items(), key=lambda item: item[1].total, reverse=True)[:top]
+    for name, stat in slowest:
+        lines.append("{} {:.2f} ms x{}".format(name, stat.total * 1000.0 / stat.calls, stat.calls))
+    return lines
+
+def report():
+    """ The startup stages, timers, counters and frame times as a dict (what dump writes)"""
+    frames = sorted(PROFILE.frames)
+    return {"startupMs": {stage: seconds * 1000.0 for stage, seconds in PROFILE.marks},
+            "timers": {name: stat.asDict() for name, stat in sorted(PROFILE.timers.items())},
+            "counters": dict(sorted(PROFILE.counters.items())),
+            "frames": {"count": len(frames),
+                       "meanMs": sum(frames) * 1000.0 / len(frames) if frames else 0.0,
+                       "p95Ms": frames[int(len(frames) * 0.95)] * 1000.0 if frames else 0.0,
+                       "worstMs": frames[-1] * 1000.0 if frames else 0.0}}
+
+def dump(path=None):
+    """ Writes report() to path (by default the LPT_PROFILE file), returns the path or None"""
+    path = path or PROFILE.dumpPath
+    if not path:
+        return None
+    with open(path, "w") as file:
+        json.dump(report(), file, indent=1)
+    log.info("profile written to %s", path)
+    return path
+
+def configure(level=None, profilePath=None):
+    """ Sets the log level and the profile dump file, by default from LPT_LOG_LEVEL and LPT_PROFILE"""
+    level = (level or os.environ.get("LPT_LOG_LEVEL") or "warning").upper()
+    if not log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        log.addHandler(handler)
+        log.propagate = False
+    log.setLevel(getattr(logging, level, logging.WARNING))
+    profilePath = profilePath or os.environ.get("LPT_PROFILE")
+    if profilePath and PROFILE.dumpPath is None:
+        atexit.register(dump)
+    if profilePath:
+        PROFILE.dumpPath = profilePath
+        setProfiling(True)
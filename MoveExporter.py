@@ -0,0 +1,141 @@
+#
+#  Export of the moves of each cycle as text, CSV and JSON Lines.
+#
+import csv
+import json
+import os
+
+BUFFER_SIZE = 1 << 16
+POOL = "POOL" # the location of the inventory (spent fuel pool) in exported moves
+CSV_COLUMNS = ("cycle", "step", "kind", "label", "from", "to", "item", "direction")
+TRANSFER_KINDS = ("move", "park", "unpark") # the crane's transfers that are not loads or removes
+FORMATS = {".txt": "text", ".csv": "csv", ".jsonl": "jsonl"}
+
+class MoveRecord:
+    """ One assembly that moves in one step of a cycle.  source and target are position names or POOL."""
+    __slots__ = ("cycle", "step", "kind", "label", "source", "target", "item", "direction")
+
+    def __init__(self, cycle, step, kind, label, source, target, item=None, direction=None):
+        self.cycle = cycle
+        self.step = step
+        self.kind = kind
+        self.label = label
+        self.source = source
+        self.target = target
+        self.item = item
+        self.direction = direction
+
+    def fields(self):
+        return (self.cycle, self.step, self.kind, self.label, self.source, self.target, self.item, self.direction)
+
+def describeMoves(cycle, labels, moves, coords, symmetry, itemLabel):
+    """ Yields the MoveRecords of each move of a cycle, replayed on labels (changed in place)"""
+    step = 0
+    for move in moves:
+        kind = move[0]
+        if kind == "noMove":
+            continue
+        step += 1
+        if kind == "swap":
+            (onex, oney), (twox, twoy) = move[1], move[2]
+            one, two = labels[oney][onex], labels[twoy][twox]
+            labels[oney][onex], labels[twoy][twox] = two, one
+            yield [MoveRecord(cycle, step, kind, one, coords(onex, oney), coords(twox, twoy)),
+                   MoveRecord(cycle, step, kind, two, coords(twox, twoy), coords(onex, oney))]
+        elif kind == "rotate":
+            direction = move[2]
+            orbit = symmetry.rotationOrbit(move[1])
+            if orbit is None: # quarter and eighth cores: the assembly turns where it is
+                x, y = move[1]
+                yield [MoveRecord(cycle, step, "turn", labels[y][x], coords(x, y), coords(x, y), direction=direction)]
+                continue
+            moving = [labels[y][x] for x, y in orbit]
+            records = []
+            for i, (x, y) in enumerate(orbit):
+                tox, toy = orbit[(i + direction) % 4]
+                records.append(MoveRecord(cycle, step, kind, moving[i], coords(x, y), coords(tox, toy), direction=direction))
+            for i, (x, y) in enumerate(orbit):
+                labels[y][x] = moving[(i - direction) % 4]
+            yield records
+        elif kind == "load":
+            x, y = move[1]
+            label = itemLabel(move[2])
+            labels[y][x] = label
+            yield [MoveRecord(cycle, step, kind, label, POOL, coords(x, y), item=move[2])]
+        elif kind == "remove":
+            x, y = move[1]
+            label = labels[y][x]
+            labels[y][x] = "Empty"
+            yield [MoveRecord(cycle, step, kind, label, coords(x, y), POOL, item=move[2])]
+        else:
+            raise ValueError("unknown move: " + str(kind))
+
+def describeTransfers(cycle, transfers, coords):
+    """ Yields a list of one MoveRecord for each transfer (TravelOptimizer.Transfer), in order.  The turns of
+    a transfer are its direction."""
+    for step, transfer in enumerate(transfers, 1):
+        source = POOL if transfer.source == POOL else coords(*transfer.source)
+        target = POOL if transfer.target == POOL else coords(*transfer.target)
+        yield [MoveRecord(cycle, step, transfer.kind, transfer.label, source, target, transfer.item, transfer.turns or None)]
+
+def describeText(records):
+    """ One line for the records of a step"""
+    first = records[0]
+    if first.kind == "swap":
+        return "swap: {} ({}) with {} ({})".format(first.source, first.label, first.target, records[1].label)
+    elif first.kind == "rotate":
+        sense = "clockwise" if first.direction == 1 else "aclckwise"
+        return sense + "-rotate: " + ". ".join("{} ({}) to {}".format(r.source, r.label, r.target) for r in records)
+    elif first.kind == "turn":
+        sense = "clockwise" if first.direction == 1 else "aclckwise"
+        return sense + "-turn in place: {} ({})".format(first.source, first.label)
+    elif first.kind in TRANSFER_KINDS or first.kind == "load":
+        if first.kind == "load":
+            text = "load: {} from inventory item {} into {}".format(first.label, first.item, first.target)
+        else:
+            text = "{}: {} from {} to {}".format(first.kind, first.label, first.source, first.target)
+        if first.direction: # only transfers turn on the way
+            text += ", turned {} quarter turns clockwise".format(first.direction)
+        return text
+    return "remove: {} ({}) to inventory item {}".format(first.source, first.label, first.item)
+
+class MoveExporter:
+    """ Appends the moves of each cycle to a file.  The format is text, csv or jsonl, by default from the
+    extension of path.  Lines go through a BUFFER_SIZE buffer, nothing is collected in memory."""
+    def __init__(self, path, format=None, bufferSize=BUFFER_SIZE):
+        self.path = path
+        self.format = format or FORMATS.get(os.path.splitext(path)[1].lower())
+        if self.format not in FORMATS.values():
+            raise ValueError("unknown export format for " + str(path) + ", use " + ", ".join(FORMATS))
+        self.bufferSize = bufferSize
+
+    def writeCycle(self, cycle, labels, moves, coords, symmetry, itemLabel):
+        """ Appends the moves of cycle (see describeMoves), returns the number of steps written"""
+        return self._write(cycle, describeMoves(cycle, labels, moves, coords, symmetry, itemLabel))
+
+    def writeTransfers(self, cycle, transfers, coords):
+        """ Appends the crane's transfers for cycle in order (see describeTransfers), returns the number written"""
+        return self._write(cycle, describeTransfers(cycle, transfers, coords))
+
+    def _write(self, cycle, steps):
+        count = 0
+        with open(self.path, "a", buffering=self.bufferSize, newline="") as file:
+            if self.format == "text":
+                file.write("#To reload the Core for cycle " + str(cycle) + ":\n")
+                for records in steps:
+                    count += 1
+                    file.write(str(count) + ". " + describeText(records) + "\n")
+            elif self.format == "csv":
+                writer = csv.writer(file)
+                if file.tell() == 0:
+                    writer.writerow(CSV_COLUMNS)
+                for records in steps:
+                    count += 1
+                    writer.writerows(record.fields() for record in records)
+            else:
+                for records in steps:
+                    count += 1
+                    for record in records:
+                        file.write(json.dumps(dict(zip(CSV_COLUMNS, record.fields()))))
+                        file.write("\n")
+        return count
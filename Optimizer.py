@@ -0,0 +1,204 @@
+#
+#  Loading pattern search run by the 'Solve' button, scored in a process pool.
+#
+import math
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from BurnupModel import peakingFactor
+from CoreState import BLANK_INDEX, EMPTY_INDEX
+from EvalCache import EvalCache, PEAKING, peakingKey
+
+INFEASIBLE = float("inf")
+MOVE_PENALTY = 0.001   # prefer short move lists when patterns score the same
+EMPTY_PENALTY = 1.0    # every empty position makes the core unusable
+
+WORKER_CACHE_SIZE = 8192 # peaking factors each worker keeps
+
+_WORKER_DATA = None  # (CoreState, inventory, EvalCache) the candidates in this worker start from
+
+def powerPeaking(state):
+    """Radial power peaking factor of a core state from the burnup model"""
+    fuel = state.labelIndex >= 0
+    if not fuel.any():
+        return INFEASIBLE
+    return float(peakingFactor(state.burnup, state.enrichment, state.poisons, fuel, state.centre))
+
+def evaluateMoves(state, inventory, moves, cache=None):
+    """Score (lower is better) of the pattern produced by applying moves to state.  With a cache (an
+    EvalCache) returns (score, peaking key or None, peaking factor, cached, seconds spent computing it)."""
+    trial = state.copy()
+    try:
+        trial.apply_moves(moves, inventory.snapshot())
+    except (IndexError, KeyError, ValueError):
+        return INFEASIBLE if cache is None else (INFEASIBLE, None, None, False, 0.0)
+    penalty = EMPTY_PENALTY * int((trial.labelIndex == EMPTY_INDEX).sum()) + MOVE_PENALTY * len(moves)
+    if cache is None:
+        return powerPeaking(trial) + penalty
+    key = peakingKey(trial)
+    peak = cache.get(key)
+    if peak is not None:
+        return (peak + penalty, key, peak, True, 0.0)
+    start = time.perf_counter()
+    peak = powerPeaking(trial)
+    seconds = time.perf_counter() - start
+    cache.put(key, peak)
+    return (peak + penalty, key, peak, False, seconds)
+
+def _initWorker(state, inventory, known):
+    global _WORKER_DATA
+    state.coreHash() # once, the candidates' copies keep it up to date
+    cache = EvalCache(WORKER_CACHE_SIZE)
+    for key, peak in known.items():
+        cache.put(key, peak)
+    _WORKER_DATA = (state, inventory, cache)
+
+def _scoreCandidate(moves):
+    state, inventory, cache = _WORKER_DATA
+    return evaluateMoves(state, inventory, moves, cache)
+
+class LoadingPatternOptimizer:
+    """Simulated annealing or genetic algorithm search over swap, rotate and load moves"""
+    def __init__(self, state, inventory, method="anneal", iterations=200, workers=None, seed=None, cache=None):
+        self.state = state.copy()
+        self.state.moved[:] = False
+        self.inventory = inventory.snapshot() # copy-on-write, the search never changes the GUI's inventory
+        self.method = method
+        self.iterations = iterations
+        self.workers = workers or os.cpu_count() or 1
+        self.random = random.Random(seed)
+        self.fuelPositions = [(int(x), int(y)) for y, x in zip(*np.nonzero(state.labelIndex != BLANK_INDEX))]
+        self.freshItems = [item.itemID for item in self.inventory.inventoryList]
+        self.cache = cache if cache is not None else EvalCache(WORKER_CACHE_SIZE)
+
+    def randomMove(self):
+        r = self.random.random()
+        if r < 0.1 and self.freshItems:
+            return ["load", list(self.random.choice(self.fuelPositions)), self.random.choice(self.freshItems)]
+        elif r < 0.25: # partial cores turn the assembly in place
+            return ["rotate", list(self.random.choice(self.fuelPositions)), self.random.choice((-1, 1))]
+        one, two = self.random.sample(self.fuelPositions, 2)
+        return ["swap", list(one), list(two)]
+
+    def mutate(self, moves):
+        moves = list(moves)
+        r = self.random.random()
+        if moves and r < 0.25:
+            del moves[self.random.randrange(len(moves))]
+        elif moves and r < 0.5:
+            moves[self.random.randrange(len(moves))] = self.randomMove()
+        else:
+            moves.append(self.randomMove())
+        return moves
+
+    def crossover(self, first, second):
+        cut1 = self.random.randint(0, len(first))
+        cut2 = self.random.randint(0, len(second))
+        return first[:cut1] + second[cut2:]
+
+    def run(self, progress=None, stop=None):
+        """Run the search, calling progress(iteration, bestScore, bestMoves) until stop() is True.
+        Returns (bestScore, bestMoves)."""
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_initWorker,
+                                 initargs=(self.state, self.inventory, self.cache.items(PEAKING))) as pool:
+            if self.method == "genetic":
+                return self._genetic(pool, progress, stop)
+            return self._anneal(pool, progress, stop)
+
+    def _score(self, pool, candidates):
+        chunk = max(1, len(candidates) // (4 * self.workers))
+        return [self._remember(result) for result in pool.map(_scoreCandidate, candidates, chunksize=chunk)]
+
+    def _remember(self, result):
+        """ Keeps a worker's new peaking factor in the cache, returns the score"""
+        score, key, peak, cached, seconds = result
+        if key is not None:
+            self.cache.record(cached, seconds)
+            if not cached:
+                self.cache.put(key, peak)
+        return score
+
+    def _anneal(self, pool, progress, stop):
+        current = []
+        currentScore = self._remember(evaluateMoves(self.state, self.inventory, current, self.cache))
+        best, bestScore = current, currentScore
+        temperature = 0.05
+        for iteration in range(self.iterations):
+            if stop and stop():
+                break
+            # score a neighbourhood per step so every worker is busy
+            neighbours = [self.mutate(current) for i in range(2 * self.workers)]
+            scores = self._score(pool, neighbours)
+            score, candidate = min(zip(scores, neighbours), key=lambda pair: pair[0])
+            if score < currentScore or self.random.random() < math.exp((currentScore - score) / temperature):
+                current, currentScore = candidate, score
+            if currentScore < bestScore:
+                best, bestScore = current, currentScore
+            temperature *= 0.98
+            if progress:
+                progress(iteration + 1, bestScore, best)
+        return bestScore, best
+
+    def _genetic(self, pool, progress, stop, populationSize=None):
+        populationSize = populationSize or max(16, 4 * self.workers)
+        population = [[self.randomMove()] for i in range(populationSize)]
+        scores = self._score(pool, population)
+        for iteration in range(self.iterations):
+            if stop and stop():
+                break
+            ranked = sorted(zip(scores, population), key=lambda pair: pair[0])
+            elite = [moves for score, moves in ranked[:max(2, populationSize // 4)]]
+            children = []
+            while len(children) < populationSize - len(elite):
+                first, second = self.random.sample(elite, 2)
+                children.append(self.mutate(self.crossover(first, second)))
+            population = elite + children
+            scores = [score for score, moves in ranked[:len(elite)]] + self._score(pool, children)
+            if progress:
+                index = min(range(len(scores)), key=scores.__getitem__)
+                progress(iteration + 1, scores[index], population[index])
+        index = min(range(len(scores)), key=scores.__getitem__)
+        return scores[index], population[index]
+
+class OptimizerRunner:
+    """Runs a LoadingPatternOptimizer in a background thread so that the GUI event loop
+    keeps going.  The GUI calls poll() once per frame to collect the latest progress."""
+    def __init__(self, optimizer):
+        self.optimizer = optimizer
+        self.updates = queue.Queue()
+        self.stopRequested = False
+        self.done = False
+        self.result = None
+        self.thread = threading.Thread(target=self._work, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopRequested = True
+
+    def _work(self):
+        def progress(iteration, score, moves):
+            self.updates.put((iteration, score, list(moves)))
+        try:
+            self.result = self.optimizer.run(progress, lambda: self.stopRequested)
+        finally:
+            self.done = True
+            self.updates.put(None)
+
+    def poll(self):
+        """Returns the most recent (iteration, bestScore, bestMoves) or None if nothing new"""
+        latest = None
+        while True:
+            try:
+                update = self.updates.get_nowait()
+            except queue.Empty:
+                return latest
+            if update is not None:
+                latest = update
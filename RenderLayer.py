@@ -0,0 +1,55 @@
+import pygame
+
+class DirtyRegions:
+    """ Collects the screen rectangles that need redrawing before the next display update"""
+    def __init__(self, screenRect, maxRects=24):
+        self.screenRect = pygame.Rect(screenRect)
+        self.maxRects = maxRects  # beyond this many rectangles the union is redrawn instead
+        self.full = True
+        self.rects = []
+
+    def markAll(self):
+        self.full = True
+        self.rects = []
+
+    def mark(self, rect):
+        if self.full:
+            return
+        rect = pygame.Rect(rect).clip(self.screenRect)
+        if rect.width == 0 or rect.height == 0:
+            return
+        # merge with any rectangle it overlaps so each pixel is only redrawn once
+        index = rect.collidelist(self.rects)
+        while index != -1:
+            rect.union_ip(self.rects.pop(index))
+            index = rect.collidelist(self.rects)
+        self.rects.append(rect)
+        if len(self.rects) > self.maxRects:
+            self.rects = [self.rects[0].unionall(self.rects[1:])]
+
+    def pending(self):
+        return self.full or bool(self.rects)
+
+    def take(self):
+        """ Returns (full, rects) and clears the pending regions"""
+        full, rects = self.full, self.rects
+        self.full = False
+        self.rects = []
+        return full, rects
+
+class SceneTracker:
+    """ Remembers what was last drawn in each slot (a tile, a panel, a widget) so that only
+    the slots whose signature changed are marked dirty"""
+    MISSING = object()
+
+    def __init__(self):
+        self.drawn = {}
+
+    def changed(self, slot, signature):
+        if self.drawn.get(slot, self.MISSING) != signature:
+            self.drawn[slot] = signature
+            return True
+        return False
+
+    def forget(self):
+        self.drawn.clear()
@@ -0,0 +1,66 @@
+#
+#  Fonts, sounds and images, loaded when first asked for.
+#
+import os
+import sys
+import pygame
+from Instrumentation import log, timer
+
+# next to this file, or where a PyInstaller build unpacked it
+RESOURCE_DIRECTORY = os.path.join(getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__))), "resources")
+
+def resourcePath(name):
+    """ Full path of a file in resources/"""
+    return os.path.join(RESOURCE_DIRECTORY, name)
+
+class ResourceCache:
+    """ Loads resources on first use, keyed by file name (and size for fonts)"""
+    def __init__(self, directory=RESOURCE_DIRECTORY):
+        self.directory = directory
+        self.fonts = {}
+        self.sounds = {}
+        self.images = {}
+        self.mixerReady = None # None until a sound is first played
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def initDisplay(self):
+        """ Starts the pygame modules needed to open the window and draw text (pygame.init() starts them all)"""
+        pygame.display.init()
+        pygame.font.init()
+
+    def font(self, name, size):
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = self.fonts[key] = pygame.font.Font(self.path(name), size)
+        return font
+
+    def image(self, name):
+        image = self.images.get(name)
+        if image is None:
+            image = self.images[name] = pygame.image.load(self.path(name))
+        return image
+
+    def sound(self, name):
+        """ The Sound, or None when there is no audio"""
+        if self.mixerReady is None:
+            try:
+                with timer("mixer.init"):
+                    pygame.mixer.init()
+                self.mixerReady = True
+            except pygame.error as error:
+                log.warning("no sound: %s", error)
+                self.mixerReady = False
+        if not self.mixerReady:
+            return None
+        sound = self.sounds.get(name)
+        if sound is None:
+            sound = self.sounds[name] = pygame.mixer.Sound(self.path(name))
+        return sound
+
+    def play(self, name):
+        sound = self.sound(name)
+        if sound is not None:
+            sound.play()
@@ -0,0 +1,243 @@
+#
+#  Binary session files, read through a memory map as sections are asked for.
+#
+import json
+import mmap
+import os
+import struct
+import numpy as np
+from Assembly import Assembly
+from CoreState import CoreState
+from StoredInventory import StoredInventory
+
+MAGIC = b"LPTSESS\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQ") # magic, version, reserved, number of sections, offset of the index
+ALIGNMENT = 8
+
+# section kinds
+META, CORE, MOVES, INVENTORY = range(4)
+CURRENT = -1 # cycle number of the core as it is now
+
+INDEX_DTYPE = np.dtype([("kind", "<u4"), ("cycle", "<i4"), ("offset", "<u8"), ("length", "<u8")])
+# the arrays of a core section, one after the other, each padded to ALIGNMENT bytes
+CORE_FIELDS = (("labelIndex", "<i4", ()), ("enrichment", "<f4", ()), ("mox", "<f4", ()), ("burnup", "<f4", (4,)),
+               ("poisons", "<f4", ()), ("leak", "?", ()), ("moved", "?", ()))
+MOVE_KINDS = ("noMove", "swap", "rotate", "load", "remove")
+MOVE_DTYPE = np.dtype([("kind", "u1"), ("x1", "<i2"), ("y1", "<i2"), ("x2", "<i2"), ("y2", "<i2"), ("arg", "<i4")])
+ITEM_DTYPE = np.dtype([("itemID", "<i4"), ("label", "<i4"), ("description", "<i4"), ("quantity", "<i4"),
+                       ("enrichment", "<f8"), ("mox", "<f8"), ("burnup", "<f8", (4,)), ("poisons", "<f8"), ("leak", "?")])
+
+class SessionFormatError(ValueError):
+    """ The file is not a session file, or not one this version can read"""
+
+def _padded(length):
+    return -(-length // ALIGNMENT) * ALIGNMENT
+
+def _coreLayout(width, height):
+    """ [(name, dtype, shape, offset)] of the arrays in a core section and the section length"""
+    layout = []
+    offset = 0
+    for name, dtype, extra in CORE_FIELDS:
+        shape = (height, width) + extra
+        layout.append((name, np.dtype(dtype), shape, offset))
+        offset += _padded(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    return layout, offset
+
+def encodeMoves(moves):
+    """ A list of moves (in the allMoves format) as a MOVE_DTYPE array"""
+    if isinstance(moves, np.ndarray) and moves.dtype == MOVE_DTYPE: # already encoded, from SessionFile.moveTable()
+        return moves
+    table = np.zeros(len(moves), dtype=MOVE_DTYPE)
+    for row, move in zip(table, moves):
+        kind = move[0]
+        row["kind"] = MOVE_KINDS.index(kind)
+        if kind == "noMove":
+            continue
+        row["x1"], row["y1"] = move[1]
+        if kind == "swap":
+            row["x2"], row["y2"] = move[2]
+        else:
+            row["arg"] = move[2]
+    return table
+
+def decodeMoves(table):
+    """ The moves (in the allMoves format) of a MOVE_DTYPE array"""
+    moves = []
+    for kind, x1, y1, x2, y2, arg in table.tolist():
+        kind = MOVE_KINDS[kind]
+        if kind == "noMove":
+            moves.append(["noMove", 0, 0])
+        elif kind == "swap":
+            moves.append(["swap", [x1, y1], [x2, y2]])
+        else:
+            moves.append([kind, [x1, y1], arg])
+    return moves
+
+class _Strings:
+    """ A table of strings shared by the sections of a file"""
+    def __init__(self):
+        self.strings = []
+        self.lookup = {}
+
+    def index(self, text):
+        index = self.lookup.get(text)
+        if index is None:
+            index = self.lookup[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+def saveSession(path, coreType, cycleStates, currentState, moveLog, inventory):
+    """ Writes the start CoreState and the moves of each cycle, the core now and the inventory to path"""
+    if len(moveLog) != len(cycleStates):
+        raise ValueError("a move list is needed for each of the " + str(len(cycleStates)) + " cycles")
+    width, height = currentState.width, currentState.height
+    layout, coreLength = _coreLayout(width, height)
+    labels = _Strings()
+    descriptions = _Strings()
+    sections = [] # (kind, cycle, bytes)
+
+    def coreBytes(state):
+        mapping = np.array([labels.index(label) for label in state.labels] or [0], dtype=np.int32)
+        block = bytearray(coreLength)
+        for name, dtype, shape, offset in layout:
+            array = getattr(state, name)
+            if name == "labelIndex":
+                array = np.where(array >= 0, mapping[np.maximum(array, 0)], array)
+            data = np.ascontiguousarray(array, dtype=dtype).tobytes()
+            block[offset:offset + len(data)] = data
+        return bytes(block)
+
+    for cycle, state in enumerate(cycleStates):
+        sections.append((CORE, cycle, coreBytes(state)))
+        sections.append((MOVES, cycle, encodeMoves(moveLog[cycle]).tobytes()))
+    sections.append((CORE, CURRENT, coreBytes(currentState)))
+    items = np.zeros(len(inventory.items), dtype=ITEM_DTYPE)
+    for row, item in zip(items, inventory.items.values()):
+        assy = item.assembly
+        row["itemID"] = item.itemID
+        row["label"] = labels.index(assy.label)
+        row["description"] = descriptions.index(item.description)
+        row["quantity"] = item.quantity
+        row["enrichment"], row["mox"], row["burnup"] = assy.UO2WT, assy.MOX, assy.Burnup
+        row["poisons"], row["leak"] = assy.BurnablePoisons, assy.SUSPECTED_FOR_LEAK
+    sections.append((INVENTORY, 0, items.tobytes()))
+    meta = {"coreType": coreType, "width": width, "height": height, "rowLengths": list(currentState.rowLengths),
+            "cycles": len(cycleStates), "labels": labels.strings, "descriptions": descriptions.strings}
+    sections.insert(0, (META, 0, json.dumps(meta).encode("utf-8")))
+
+    index = np.zeros(len(sections), dtype=INDEX_DTYPE)
+    temporary = path + ".part"
+    with open(temporary, "wb") as file:
+        file.write(b"\0" * _padded(HEADER.size))
+        for entry, (kind, cycle, data) in zip(index, sections):
+            entry["kind"], entry["cycle"], entry["offset"], entry["length"] = kind, cycle, file.tell(), len(data)
+            file.write(data)
+            file.write(b"\0" * (_padded(len(data)) - len(data)))
+        indexOffset = file.tell()
+        file.write(index.tobytes())
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(sections), indexOffset))
+    os.replace(temporary, path)
+
+class SessionFile:
+    """ An open session file, reading each section when asked; the CoreStates returned are read only views"""
+    def __init__(self, path):
+        self.path = path
+        self._states = {}
+        self.file = open(path, "rb")
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # an empty file cannot be mapped
+            self.file.close()
+            raise SessionFormatError(str(path) + ": not a session file")
+        if len(self.buffer) < HEADER.size:
+            self.close()
+            raise SessionFormatError(str(path) + ": not a session file")
+        magic, version, reserved, count, indexOffset = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION or indexOffset + count * INDEX_DTYPE.itemsize > len(self.buffer):
+            self.close()
+            raise SessionFormatError(str(path) + ": not a session file of version " + str(VERSION))
+        index = np.frombuffer(self.buffer, INDEX_DTYPE, count, indexOffset)
+        self.sections = {(int(kind), int(cycle)): (int(offset), int(length)) for kind, cycle, offset, length in index.tolist()}
+        del index
+        meta = json.loads(self._bytes(META, 0).decode("utf-8"))
+        self.coreType = meta["coreType"]
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.rowLengths = meta["rowLengths"]
+        self.cycleCount = meta["cycles"]
+        self.labels = meta["labels"]
+        self.descriptions = meta["descriptions"]
+        self.layout, self.coreLength = _coreLayout(self.width, self.height)
+
+    def _section(self, kind, cycle):
+        try:
+            return self.sections[(kind, cycle)]
+        except KeyError:
+            raise SessionFormatError(str(self.path) + ": no section " + str(kind) + " for cycle " + str(cycle)) from None
+
+    def _bytes(self, kind, cycle):
+        offset, length = self._section(kind, cycle)
+        return self.buffer[offset:offset + length]
+
+    def cycleState(self, cycle, alphabetCoords=None):
+        """ CoreState at the start of cycle (0 is the first), or of the core now for CURRENT"""
+        state = self._states.get(cycle)
+        if state is None:
+            offset, length = self._section(CORE, cycle)
+            if length != self.coreLength:
+                raise SessionFormatError(str(self.path) + ": core section of cycle " + str(cycle) + " has the wrong size")
+            state = CoreState.__new__(CoreState)
+            state.width, state.height = self.width, self.height
+            state.coreType = self.coreType
+            state.alphabetCoords = alphabetCoords
+            state.rowLengths = list(self.rowLengths)
+            state.labels = list(self.labels)
+            state.labelLookup = {label: i for i, label in enumerate(self.labels)}
+            state.zobrist = None
+            for name, dtype, shape, fieldOffset in self.layout:
+                count = int(np.prod(shape))
+                setattr(state, name, np.frombuffer(self.buffer, dtype, count, offset + fieldOffset).reshape(shape))
+            self._states[cycle] = state
+        return state
+
+    def currentState(self, alphabetCoords=None):
+        return self.cycleState(CURRENT, alphabetCoords)
+
+    def moveTable(self, cycle):
+        """ The moves made in cycle as a read only MOVE_DTYPE view of the file, not decoded"""
+        offset, length = self._section(MOVES, cycle)
+        return np.frombuffer(self.buffer, MOVE_DTYPE, length // MOVE_DTYPE.itemsize, offset)
+
+    def moves(self, cycle):
+        """ The moves made in cycle (in the allMoves format)"""
+        return decodeMoves(self.moveTable(cycle))
+
+    def inventory(self):
+        """ A new StoredInventory with the items, and item IDs, that were saved"""
+        offset, length = self._section(INVENTORY, 0)
+        items = np.frombuffer(self.buffer, ITEM_DTYPE, length // ITEM_DTYPE.itemsize, offset)
+        inventory = StoredInventory([], [], [])
+        for itemID, label, description, quantity, enrichment, mox, burnup, poisons, leak in sorted(items.tolist()):
+            assembly = Assembly(self.labels[label], enrichment, burnup, poisons, mox)
+            assembly.SUSPECTED_FOR_LEAK = leak
+            if inventory.addInventoryItem(assembly, quantity, self.descriptions[description]) != itemID:
+                raise SessionFormatError(str(self.path) + ": inventory item IDs are not in order")
+        return inventory
+
+    def close(self):
+        self._states.clear()
+        try:
+            self.buffer.close()
+        except BufferError:
+            pass # arrays handed out still use the mapping, it goes when they do
+        except AttributeError:
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
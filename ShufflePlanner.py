@@ -0,0 +1,141 @@
+#
+#  The shortest shuffle from one core to another.
+#
+from StoredInventory import fingerprint
+
+EMPTY = "Empty"
+
+def orientations(assembly):
+    """ [(turns, fingerprint)] of the assembly turned 0, 1, 2 and 3 quarter turns clockwise"""
+    turned = assembly.copy()
+    result = []
+    for turns in range(4):
+        result.append((turns, fingerprint(turned)))
+        turned.turn(1)
+    return result
+
+def shapeKey(assembly):
+    """ Fingerprint of the assembly whichever way round it stands"""
+    return min(fp for turns, fp in orientations(assembly))
+
+def turnsBetween(one, two):
+    """ Clockwise quarter turns that make assembly one stand like two (0 to 3), None if they differ otherwise"""
+    target = fingerprint(two)
+    for turns, fp in orientations(one):
+        if fp == target:
+            return turns
+    return None
+
+def turnMoves(pos, turns):
+    """ Rotate moves turning the assembly at pos clockwise by turns quarter turns, the short way round"""
+    if turns == 3:
+        return [["rotate", list(pos), -1]]
+    return [["rotate", list(pos), 1] for _ in range(turns)]
+
+def decompose(destinations):
+    """ Splits the moves {from position: to position} into paths and cycles of positions"""
+    arrivals = {to: frm for frm, to in destinations.items() if frm != to}
+    paths = []
+    cycles = []
+    done = set()
+    for frm, to in destinations.items():
+        if frm == to or frm in arrivals: # fixed, or not the first position of a path
+            continue
+        path = [frm]
+        while path[-1] in destinations:
+            path.append(destinations[path[-1]])
+        done.update(path)
+        paths.append(path)
+    for frm, to in destinations.items():
+        if frm == to or frm in done:
+            continue
+        cycle = [frm]
+        done.add(frm)
+        while destinations[cycle[-1]] != frm:
+            cycle.append(destinations[cycle[-1]])
+            done.add(cycle[-1])
+        cycles.append(cycle)
+    return paths, cycles
+
+def matchCores(start, target, inventory, turnInPlace=False):
+    """ Matches the assemblies of start with those of target.  Returns (destinations, removes, loads);
+    raises ValueError when target needs fuel the inventory never had."""
+    if [len(row) for row in start] != [len(row) for row in target]:
+        raise ValueError("the two cores are not the same shape")
+    destinations = {}
+    positions = []
+    for y, row in enumerate(start):
+        for x, assy in enumerate(row):
+            if assy is target[y][x]: # the cores share it (see Snapshot.py): not touched, no key needed
+                if assy.label is not None and assy.label != EMPTY:
+                    destinations[(x, y)] = (x, y)
+            elif assy.label is not None:
+                positions.append((x, y))
+    keyOf = shapeKey if turnInPlace else fingerprint # only turns in place change which way round an assembly stands
+    startKeys = {}
+    sources = {} # key -> {position: None} of the start assemblies not matched yet
+    for x, y in positions:
+        assy = start[y][x]
+        if assy.label != EMPTY:
+            key = startKeys[(x, y)] = keyOf(assy)
+            sources.setdefault(key, {})[(x, y)] = None
+    targetKeys = {}
+    for x, y in positions: # assemblies that have not moved
+        assy = target[y][x]
+        if assy.label == EMPTY:
+            continue
+        key = targetKeys[(x, y)] = keyOf(assy)
+        if startKeys.get((x, y)) == key:
+            destinations[(x, y)] = (x, y)
+            del sources[key][(x, y)]
+    loadPositions = []
+    for pos, key in targetKeys.items(): # the rest come from anywhere holding the same fuel, or are loaded
+        if destinations.get(pos) == pos:
+            continue
+        matches = sources.get(key)
+        if matches:
+            frm = next(iter(matches))
+            del matches[frm]
+            destinations[frm] = pos
+        else:
+            loadPositions.append(pos)
+
+    removes = []
+    newIDs = {}
+    for matches in sources.values(): # left over: they leave the core
+        for x, y in matches:
+            fp = fingerprint(start[y][x])
+            itemID = inventory.idsByFingerprint.get(fp)
+            if itemID is None:
+                itemID = newIDs.setdefault(fp, inventory.nextID + len(newIDs))
+            removes.append(((x, y), itemID))
+    loads = []
+    for x, y in loadPositions:
+        for turns, fp in orientations(target[y][x]):
+            itemID = inventory.idsByFingerprint.get(fp)
+            if itemID is not None and (turns == 0 or turnInPlace):
+                break
+        else:
+            raise ValueError(str(target[y][x].label) + " is in neither the first core nor the inventory")
+        loads.append(((x, y), itemID, (4 - turns) % 4))
+    return destinations, removes, loads
+
+def planShuffle(start, target, inventory, turnInPlace=False):
+    """ The fewest moves (allMoves format) that turn core start into core target"""
+    destinations, removes, loads = matchCores(start, target, inventory, turnInPlace)
+    moves = [["remove", list(pos), itemID] for pos, itemID in removes]
+    paths, cycles = decompose(destinations)
+    for path in paths: # the last position is empty now: fill it from the one before, and so on back
+        for i in range(len(path) - 2, -1, -1):
+            moves.append(["swap", list(path[i]), list(path[i + 1])])
+    for cycle in cycles:
+        for pos in cycle[1:]:
+            moves.append(["swap", list(cycle[0]), list(pos)])
+    for pos, itemID, turns in loads:
+        moves.append(["load", list(pos), itemID])
+        moves.extend(turnMoves(pos, turns))
+    if turnInPlace:
+        for (frmx, frmy), (x, y) in destinations.items():
+            if start[frmy][frmx] is not target[y][x]:
+                moves.extend(turnMoves((x, y), turnsBetween(start[frmy][frmx], target[y][x]) or 0))
+    return moves
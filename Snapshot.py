@@ -0,0 +1,175 @@
+#
+#  Copy-on-write cores.
+#
+from Zobrist import CoreHash, assemblyKeys
+from Constraints import ConstraintChecker
+
+def exchangeMarks(marks, one, two):
+    """ Positions one and two exchange their membership of the set marks"""
+    if (one in marks) != (two in marks):
+        if one in marks:
+            marks.discard(one)
+            marks.add(two)
+        else:
+            marks.discard(two)
+            marks.add(one)
+
+class CoreSnapshot:
+    """ A core that snapshots in constant time; writes go through set(), swap() or mutable()"""
+    __slots__ = ("rows", "sharedSpine", "ownedRows", "owned", "zobrist", "stale", "checker", "unchecked")
+
+    def __init__(self, core):
+        """ Takes over the assemblies of core (a list of rows), which must not be used elsewhere"""
+        self.rows = [list(row) for row in core]
+        self.sharedSpine = False
+        self.ownedRows = set(range(len(self.rows)))
+        self.owned = set((x, y) for y, row in enumerate(self.rows) for x in range(len(row)))
+        self.zobrist = None # CoreHash, from the first coreHash()
+        self.stale = set() # positions handed out by mutable() since the hash was last brought up to date
+        self.checker = None # ConstraintChecker, from the first constraintChecker()
+        self.unchecked = set() # the same for the checker
+
+    def snapshot(self):
+        """ A copy of the core in O(1).  Afterwards neither core owns anything, so each copies on write."""
+        other = CoreSnapshot.__new__(CoreSnapshot)
+        other.rows = self.rows
+        other.sharedSpine = self.sharedSpine = True
+        other.ownedRows = set()
+        other.owned = set()
+        self.ownedRows = set()
+        self.owned = set()
+        other.zobrist = None if self.zobrist is None else self.coreHash(self.zobrist.table).copy()
+        other.stale = set()
+        other.checker = None # the copy is mostly looked at, it makes its own if asked
+        other.unchecked = set()
+        return other
+
+    def assign(self, other):
+        """ Makes this core a copy of other (in O(1), as snapshot) keeping this object"""
+        self.rows = other.rows
+        self.sharedSpine = other.sharedSpine = True
+        self.ownedRows, other.ownedRows = set(), set()
+        self.owned, other.owned = set(), set()
+        self.zobrist = None if other.zobrist is None else other.coreHash(other.zobrist.table).copy()
+        self.stale = set()
+        self.checker = None # made again when next asked for, everything may have changed
+        self.unchecked = set()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, y):
+        return self.rows[y]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def get(self, x, y):
+        return self.rows[y][x]
+
+    def _writableRow(self, y):
+        if self.sharedSpine:
+            self.rows = list(self.rows)
+            self.sharedSpine = False
+        if y not in self.ownedRows:
+            self.rows[y] = list(self.rows[y])
+            self.ownedRows.add(y)
+        return self.rows[y]
+
+    def _place(self, x, y, assembly, owned):
+        self._writableRow(y)[x] = assembly
+        if owned:
+            self.owned.add((x, y))
+        else:
+            self.owned.discard((x, y))
+
+    def set(self, x, y, assembly, owned=False):
+        """ Puts assembly at x, y.  owned says the caller made it for this core alone."""
+        self._place(x, y, assembly, owned)
+        if self.zobrist is not None:
+            self.stale.discard((x, y))
+            self.zobrist.set(self.zobrist.table.flatIndex(x, y), assemblyKeys(assembly, self.zobrist.table.names))
+        if self.checker is not None:
+            self.unchecked.discard((x, y))
+            self.checker.set(x, y, assembly)
+
+    def swap(self, one, two):
+        """ Exchanges the assemblies at positions one and two (each (x, y)), ownership, hash keys and
+        checker records travel with them"""
+        one, two = tuple(one), tuple(two)
+        (onex, oney), (twox, twoy) = one, two
+        a, b = self.rows[oney][onex], self.rows[twoy][twox]
+        ownA, ownB = one in self.owned, two in self.owned
+        self._place(onex, oney, b, ownB)
+        self._place(twox, twoy, a, ownA)
+        if self.checker is not None:
+            checker = self.checker
+            ka, kb = oney * checker.width + onex, twoy * checker.width + twox
+            recordA, recordB = checker.records[ka], checker.records[kb]
+            checker.setRecord(ka, recordB)
+            checker.setRecord(kb, recordA)
+            exchangeMarks(self.unchecked, one, two)
+        if self.zobrist is not None:
+            table = self.zobrist.table
+            self.zobrist.swap(table.flatIndex(onex, oney), table.flatIndex(twox, twoy))
+            exchangeMarks(self.stale, one, two)
+
+    def rotate(self, positions):
+        """ Moves the assembly at each of positions to the next one (the last to the first).  Their hash
+        keys and checker records move with them, nothing is worked out again."""
+        positions = [tuple(pos) for pos in positions]
+        targets = positions[1:] + positions[:1]
+        moving = [(self.rows[y][x], (x, y) in self.owned, (x, y) in self.stale) for x, y in positions]
+        for (x, y), (assembly, owned, stale) in zip(targets, moving):
+            self._place(x, y, assembly, owned)
+        if self.checker is not None:
+            checker = self.checker
+            records = [checker.records[y * checker.width + x] for x, y in positions]
+            unchecked = [pos in self.unchecked for pos in positions]
+            for (x, y), record, flag in zip(targets, records, unchecked):
+                checker.setRecord(y * checker.width + x, record)
+                if flag:
+                    self.unchecked.add((x, y))
+                else:
+                    self.unchecked.discard((x, y))
+        if self.zobrist is not None:
+            table = self.zobrist.table
+            keys = [self.zobrist.content[table.flatIndex(x, y)] for x, y in positions]
+            for (x, y), key, (assembly, owned, stale) in zip(targets, keys, moving):
+                self.zobrist.set(table.flatIndex(x, y), key)
+                if stale:
+                    self.stale.add((x, y))
+                else:
+                    self.stale.discard((x, y))
+
+    def mutable(self, x, y):
+        """ The assembly at x, y, copied first if another core (or the inventory) may share it"""
+        if (x, y) not in self.owned:
+            self._place(x, y, self.rows[y][x].copy(), owned=True)
+        if self.zobrist is not None:
+            self.stale.add((x, y))
+        if self.checker is not None:
+            self.unchecked.add((x, y))
+        return self.rows[y][x]
+
+    def coreHash(self, table):
+        """ The CoreHash of the core for table (a ZobristTable), kept up to date from now on"""
+        if self.zobrist is None or self.zobrist.table is not table:
+            self.zobrist = CoreHash.fromCore(self.rows, table)
+            self.stale = set()
+        elif self.stale:
+            for x, y in self.stale:
+                self.zobrist.set(table.flatIndex(x, y), assemblyKeys(self.rows[y][x], table.names))
+            self.stale = set()
+        return self.zobrist
+
+    def constraintChecker(self, coreType):
+        """ The ConstraintChecker of the core for coreType (a CoreType), kept up to date from now on"""
+        if self.checker is None or self.checker.coreType is not coreType:
+            self.checker = ConstraintChecker.fromCore(self.rows, coreType)
+            self.unchecked = set()
+        elif self.unchecked:
+            for x, y in self.unchecked:
+                self.checker.set(x, y, self.rows[y][x])
+            self.unchecked = set()
+        return self.checker
@@ -1,30 +1,111 @@
-from Assembly import Assembly
-import copy
+
+FINGERPRINT_DIGITS = 5 # CoreState and session files keep float32, values that went through them differ in the last bits
+
+def fingerprint(assembly):
+    """ Hashable key of the data that makes two stored assemblies interchangeable: label, enrichment,
+    MOX, burnup, poisons and leak status.  Assemblies with the same fingerprint share one inventory item."""
+    return (assembly.label, round(assembly.UO2WT, FINGERPRINT_DIGITS), round(assembly.MOX, FINGERPRINT_DIGITS),
+            tuple(round(b, FINGERPRINT_DIGITS) for b in assembly.Burnup),
+            round(assembly.BurnablePoisons, FINGERPRINT_DIGITS), assembly.SUSPECTED_FOR_LEAK)
 
 class InventoryItem:
     """ A class to hold wordy descriptions and quantity data about an assembly that is not stored inside the assembly object."""
-    def __init__(self, assembly, quantity, description):
+    def __init__(self, assembly, quantity, description, itemID=None):
         self.assembly  = assembly
         self.quantity = quantity
         self.description = description
+        self.itemID = itemID
 
 class StoredInventory:
-    """Class contain the list of fuel inventory"""
-    inventoryList = []
+    """Class contain the list of fuel inventory.  Items are kept in a dict by item ID and found by the
+    fingerprint of their assembly, so adding and removing are O(1) and identical assemblies merge.
+    Item IDs are never reused or shifted: an item that runs out keeps its ID (and gets it back when
+    the same assembly returns).  inventoryList is the ordered view of the items in stock.
+    snapshot() copies the inventory in O(1); the two then copy the dict and an item only when they change it."""
     def __init__(self, listOfAssemblies, listOfQuantities, listOfDescriptions):
         assert len(listOfAssemblies) == len(listOfQuantities)
+        self.items = {}      # item ID -> InventoryItem, in order of first arrival
+        self.idsByFingerprint = {}
+        self.nextID = 0
+        self._view = None
+        self.shared = False # items are shared with a snapshot
+        self.ownedItems = set()
         for a, q, d in zip (listOfAssemblies, listOfQuantities, listOfDescriptions):
-            self.inventoryList.append(InventoryItem(a,q,d))
+            self.addInventoryItem(a, q, d)
+
+    def snapshot(self):
+        """ A copy of the inventory in O(1), sharing the items until either copy changes"""
+        other = StoredInventory.__new__(StoredInventory)
+        other.items = self.items
+        other.idsByFingerprint = self.idsByFingerprint
+        other.nextID = self.nextID
+        other._view = self._view
+        other.shared = self.shared = True
+        other.ownedItems = set()
+        self.ownedItems = set()
+        return other
+
+    def _unshare(self):
+        if self.shared:
+            self.items = dict(self.items)
+            self.idsByFingerprint = dict(self.idsByFingerprint)
+            self.shared = False
+
+    def _writableItem(self, itemID):
+        self._unshare()
+        if itemID not in self.ownedItems:
+            item = self.items[itemID]
+            self.items[itemID] = InventoryItem(item.assembly, item.quantity, item.description, itemID)
+            self.ownedItems.add(itemID)
+            self._view = None
+        return self.items[itemID]
+
+    @property
+    def inventoryList(self):
+        """ The items in stock in the order they are shown (rebuilt only when an item appears or runs out)"""
+        if self._view is None:
+            self._view = [item for item in self.items.values() if item.quantity > 0]
+        return self._view
+
+    def getItem(self, itemID):
+        return self.items[itemID]
+
+    def findItem(self, assembly):
+        """ ID of the item holding assemblies like this one, or None"""
+        return self.idsByFingerprint.get(fingerprint(assembly))
+
+    def rowOf(self, itemID):
+        """ Position of an item in inventoryList"""
+        for row, item in enumerate(self.inventoryList):
+            if item.itemID == itemID:
+                return row
+        raise ValueError("inventory item " + str(itemID) + " is not in stock")
 
     def addInventoryItem(self, assembly, quantity, description):
-        """ Add an assembly to the Inventory of stored fuel """
-        self.inventoryList.append(InventoryItem(assembly,quantity,description))
-        return len(self.inventoryList)-1
+        """ Add an assembly to the Inventory of stored fuel, returns the ID of the item it was stored in """
+        key = fingerprint(assembly)
+        itemID = self.idsByFingerprint.get(key)
+        if itemID is None:
+            self._unshare()
+            itemID = self.nextID
+            self.nextID += 1
+            self.idsByFingerprint[key] = itemID
+            self.items[itemID] = InventoryItem(assembly, 0, description, itemID)
+            self.ownedItems.add(itemID)
+        item = self._writableItem(itemID)
+        if item.quantity == 0:
+            item.description = description
+            self._view = None
+        item.quantity += quantity
+        return itemID
 
-    def removeInventoryItem(self, index):
-        """ Remove an assembly from the inventory """
-        temp = self.inventoryList[index]
+    def removeInventoryItem(self, itemID):
+        """ Remove an assembly from the inventory and return it.  The assembly is shared with the item,
+        so callers must not change it: a core copies it first (see CoreSnapshot.mutable)"""
+        if self.items[itemID].quantity <= 0:
+            raise ValueError("inventory item " + str(itemID) + " is out of stock")
+        temp = self._writableItem(itemID)
         temp.quantity -= 1
         if temp.quantity == 0:
-            del self.inventoryList[index]
-        return copy.deepcopy(temp.assembly)
+            self._view = None
+        return temp.assembly
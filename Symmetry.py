@@ -0,0 +1,130 @@
+#
+#  Rotation and mirror symmetry of the core geometries, as lookup tables.
+#
+from functools import lru_cache
+import numpy as np
+
+# transforms of the centred coordinates (X right, Y down, the centre assembly at 0, 0)
+TRANSFORMS = {
+    "identity":   lambda X, Y: (X, Y),
+    "rot90":      lambda X, Y: (-Y, X),   # clockwise on screen
+    "rot180":     lambda X, Y: (-X, -Y),
+    "rot270":     lambda X, Y: (Y, -X),
+    "mirrorX":    lambda X, Y: (-X, Y),   # left <-> right
+    "mirrorY":    lambda X, Y: (X, -Y),   # top <-> bottom
+    "mirrorDiag": lambda X, Y: (Y, X),
+    "mirrorAnti": lambda X, Y: (-Y, -X),
+}
+REFLECTIONS = ("mirrorX", "mirrorY", "mirrorDiag", "mirrorAnti")
+
+# the symmetry checkbox captions and the transforms that leave such a loading pattern unchanged
+SYMMETRIES = {
+    "None":    ("identity",),
+    "Quarter": ("identity", "mirrorX", "mirrorY", "rot180"),
+    "Eighth":  tuple(TRANSFORMS),
+}
+
+# quadrant order is top left, top right, bottom left, bottom right
+QUADRANT_TURN = {1: (2, 0, 3, 1), -1: (1, 3, 0, 2)} # new quadrant i takes old quadrant QUADRANT_TURN[direction][i]
+
+class CoreSymmetry:
+    """ Transform tables for one core geometry: tables[name][k] is where position k goes, -1 if outside"""
+    def __init__(self, rowLengths, centre):
+        self.rowLengths = tuple(rowLengths)
+        self.width = max(self.rowLengths)
+        self.height = len(self.rowLengths)
+        self.centre = centre
+        self.tables = {}
+        for name, transform in TRANSFORMS.items():
+            table = np.full(self.width * self.height, -1, dtype=np.intp)
+            for y, length in enumerate(self.rowLengths):
+                for x in range(length):
+                    tx, ty = transform(x - centre[0], y - centre[1])
+                    tx, ty = tx + centre[0], ty + centre[1]
+                    if 0 <= ty < self.height and 0 <= tx < self.rowLengths[ty]:
+                        table[y * self.width + x] = ty * self.width + tx
+            self.tables[name] = table
+        # a full core is closed under rotation, a partial core represents the rest of the core
+        stored = np.array([x < length for length in self.rowLengths for x in range(self.width)])
+        self.fullCore = bool((self.tables["rot90"][stored] >= 0).all())
+
+    def flatIndex(self, pos):
+        return int(pos[1]) * self.width + int(pos[0])
+
+    def position(self, index):
+        y, x = divmod(int(index), self.width)
+        return (x, y)
+
+    def image(self, pos, name):
+        """ Where the transform moves pos, or None"""
+        index = self.tables[name][self.flatIndex(pos)]
+        return None if index < 0 else self.position(index)
+
+    def rotationOrbit(self, pos):
+        """ The four positions (clockwise) a rotation moves assemblies between, None for partial cores"""
+        if not self.fullCore:
+            return None
+        return [self.image(pos, name) for name in ("identity", "rot90", "rot180", "rot270")]
+
+    def rotationPerm(self, pos, direction):
+        """ (targets, sources) flat indices: a rotation puts the data of sources into targets, one gather"""
+        orbit = [self.flatIndex(p) for p in self.rotationOrbit(pos)]
+        return orbit, orbit[-direction:] + orbit[:-direction]
+
+    def symmetricSwaps(self, one, two, symmetry):
+        """ The swaps that keep the pattern symmetric when one and two are swapped, the requested one first"""
+        pairs = [(tuple(one), tuple(two))]
+        used = {tuple(one), tuple(two)}
+        for name in SYMMETRIES[symmetry][1:]:
+            a, b = self.image(one, name), self.image(two, name)
+            if a is None or b is None or a == b:
+                continue
+            if {a, b} == {tuple(one), tuple(two)} or (a, b) in pairs or (b, a) in pairs:
+                continue
+            if a in used or b in used:
+                continue # the image overlaps another pair: it is not a plain swap, leave it out
+            pairs.append((a, b))
+            used.update((a, b))
+        return pairs
+
+    def symmetricRotations(self, pos, direction, symmetry):
+        """ The rotations [(pos, direction)] that keep the pattern symmetric, the requested one first.
+        A reflected position turns the other way.  Rotations of the same orbit are only made once."""
+        rotations = []
+        seen = set()
+        for name in SYMMETRIES[symmetry]:
+            image = self.image(pos, name)
+            if image is None:
+                continue
+            turn = -direction if name in REFLECTIONS else direction
+            orbit = frozenset(self.rotationOrbit(image) or (image,))
+            if orbit in seen:
+                continue
+            seen.add(orbit)
+            rotations.append((image, turn))
+        return rotations
+
+    def expandMoves(self, moves, symmetry):
+        """ Adds the symmetric partners of every swap and rotation in a list of moves (allMoves format)"""
+        if symmetry == "None":
+            return list(moves)
+        expanded = []
+        for move in moves:
+            if move[0] == "swap":
+                expanded.extend(["swap", list(a), list(b)] for a, b in self.symmetricSwaps(move[1], move[2], symmetry))
+            elif move[0] == "rotate":
+                expanded.extend(["rotate", list(p), d] for p, d in self.symmetricRotations(move[1], move[2], symmetry))
+            else:
+                expanded.append(move)
+        return expanded
+
+@lru_cache(maxsize=None)
+def _coreSymmetry(rowLengths, centre):
+    return CoreSymmetry(rowLengths, centre)
+
+def coreSymmetry(rowLengths, fullCore):
+    """ The (cached) CoreSymmetry of a geometry.  fullCore: a square core centred in the middle, otherwise
+    a quarter or eighth core with the centre assembly at the top left."""
+    rowLengths = tuple(rowLengths)
+    centre = ((max(rowLengths) - 1) // 2, (len(rowLengths) - 1) // 2) if fullCore else (0, 0)
+    return _coreSymmetry(rowLengths, centre)
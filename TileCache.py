@@ -0,0 +1,64 @@
+import pygame
+from collections import OrderedDict
+
+class TileCache:
+    """ Bounded LRU cache of pre-rendered tile and label surfaces, so that drawing a tile is one blit.
+    Tiles are keyed by label, quadColor, outline and tile size.  Call invalidate() when the tile size changes."""
+    def __init__(self, maxSize=2048):
+        self.maxSize = maxSize
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        """ Drop every cached surface (e.g. after setCoreType changed TILESIZE)"""
+        self.surfaces.clear()
+
+    def stats(self):
+        """ Returns (hits, misses, number of cached surfaces)"""
+        return (self.hits, self.misses, len(self.surfaces))
+
+    def _lookup(self, key, render):
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surf
+        self.misses += 1
+        surf = render()
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert_alpha() if surf.get_flags() & pygame.SRCALPHA else surf.convert()
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.maxSize:
+            self.surfaces.popitem(last=False)
+        return surf
+
+    def getTile(self, label, color, outline, tileSize, font, textColor):
+        """ A (tileSize+2) square surface: the outline, one or four quadrant colours and the centred label"""
+        if len(color) == 4:
+            colorKey = tuple(tuple(c) for c in color)
+        else:
+            colorKey = tuple(color)
+        key = ("tile", label, colorKey, tuple(outline), tileSize)
+        return self._lookup(key, lambda: self._renderTile(label, color, outline, tileSize, font, textColor))
+
+    def getText(self, text, font, color):
+        """ A rendered text surface (the inventory descriptions, titles and messages)"""
+        key = ("text", text, tuple(color), id(font))
+        return self._lookup(key, lambda: font.render(text, True, color))
+
+    def _renderTile(self, label, color, outline, tileSize, font, textColor):
+        surf = pygame.Surface((tileSize + 2, tileSize + 2))
+        surf.fill(outline)
+        if len(color) == 4:
+            half = tileSize // 2
+            rest = tileSize - half
+            surf.fill(color[0], (1, 1, half, half))
+            surf.fill(color[1], (1 + half, 1, rest, half))
+            surf.fill(color[2], (1, 1 + half, half, rest))
+            surf.fill(color[3], (1 + half, 1 + half, rest, rest))
+        else:
+            surf.fill(color, (1, 1, tileSize, tileSize))
+        textSurf = font.render(str(label), True, textColor)
+        surf.blit(textSurf, textSurf.get_rect(center=(1 + tileSize // 2, 1 + tileSize // 2)))
+        return surf
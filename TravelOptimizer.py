@@ -0,0 +1,202 @@
+#
+#  Order of the crane's transfers for a reload, searched in a worker process.
+#
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from MoveExporter import POOL
+from ShufflePlanner import matchCores, decompose, turnsBetween
+
+TIME_BUDGET = 2.0 # seconds a search may take
+STALE_LIMIT = 50 # a search stops after this many times the number of transfers tries without improvement
+POOL_GAP = 3 # pitches between the edge of the core grid and the pool
+
+_EXECUTOR = None # the worker process of every search, see travelExecutor()
+
+class Transfer:
+    """ One pick and place between positions and the POOL, after the transfers that must come first"""
+    __slots__ = ("kind", "source", "target", "label", "item", "turns", "after")
+
+    def __init__(self, kind, source, target, label, item=None, turns=0, after=()):
+        self.kind = kind
+        self.source = source
+        self.target = target
+        self.label = label
+        self.item = item
+        self.turns = turns
+        self.after = after
+
+    def __getstate__(self): # slots only, for the worker process
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+def poolLocation(core):
+    """ Where the spent fuel pool is, in pitches of the core grid: beside the middle of the right edge"""
+    return (max(len(row) for row in core) - 1 + POOL_GAP, len(core) // 2)
+
+def transferTasks(start, target, inventory, turnInPlace=False):
+    """ The transfers that turn core start into core target (see ShufflePlanner.matchCores), with their
+    precedence, in an order that is already valid.  Raises ValueError as matchCores does."""
+    destinations, removes, loads = matchCores(start, target, inventory, turnInPlace)
+    pool = poolLocation(start)
+    tasks = [Transfer("remove", pos, POOL, start[pos[1]][pos[0]].label, itemID) for pos, itemID in removes]
+
+    def turns(frm, to):
+        return (turnsBetween(start[frm[1]][frm[0]], target[to[1]][to[0]]) or 0) if turnInPlace else 0
+    paths, cycles = decompose(destinations)
+    parkedBy = {} # unpark index -> park index
+    for path in paths: # from the end, which is empty (or emptied by a remove)
+        for i in range(len(path) - 2, -1, -1):
+            frm, to = path[i], path[i + 1]
+            tasks.append(Transfer("move", frm, to, start[frm[1]][frm[0]].label, turns=turns(frm, to)))
+    for cycle in cycles: # park the assembly nearest the pool, the rest become a path, then bring it back
+        j = min(range(len(cycle)), key=lambda i: distance(cycle[i], pool))
+        cycle = cycle[j:] + cycle[:j]
+        parked = cycle[0]
+        parkIndex = len(tasks)
+        tasks.append(Transfer("park", parked, POOL, start[parked[1]][parked[0]].label))
+        for i in range(len(cycle) - 1, 0, -1):
+            frm, to = cycle[i], cycle[(i + 1) % len(cycle)]
+            tasks.append(Transfer("move", frm, to, start[frm[1]][frm[0]].label, turns=turns(frm, to)))
+        parkedBy[len(tasks)] = parkIndex
+        tasks.append(Transfer("unpark", POOL, cycle[1], start[parked[1]][parked[0]].label, turns=turns(parked, cycle[1])))
+    for pos, itemID, quarterTurns in loads:
+        tasks.append(Transfer("load", POOL, pos, target[pos[1]][pos[0]].label, itemID, quarterTurns))
+
+    emptiedBy = {task.source: i for i, task in enumerate(tasks) if task.source != POOL}
+    for i, task in enumerate(tasks):
+        after = [emptiedBy[task.target]] if task.target in emptiedBy else []
+        if task.kind == "unpark":
+            after.append(parkedBy[i])
+        task.after = tuple(after)
+    return tasks
+
+def distance(one, two):
+    return max(abs(one[0] - two[0]), abs(one[1] - two[1]))
+
+def travel(tasks, order, pool):
+    """ Distance the crane goes from the pool through the transfers in order, loaded and empty"""
+    here = pool
+    total = 0
+    for i in order:
+        source, target = _ends(tasks[i], pool)
+        total += distance(here, source) + distance(source, target)
+        here = target
+    return total
+
+def _ends(task, pool):
+    return (pool if task.source == POOL else task.source, pool if task.target == POOL else task.target)
+
+def isValidOrder(tasks, order):
+    """ True when order has every transfer once, each after those it must follow"""
+    position = {i: k for k, i in enumerate(order)}
+    return len(position) == len(tasks) == len(order) and \
+        all(position[before] < position[i] for i in order for before in tasks[i].after)
+
+def greedyOrder(tasks, pool):
+    """ The nearest transfer that is ready (everything it follows done), from where the crane is"""
+    followers = [[] for _ in tasks]
+    waiting = [len(task.after) for task in tasks]
+    for i, task in enumerate(tasks):
+        for before in task.after:
+            followers[before].append(i)
+    ends = [_ends(task, pool) for task in tasks]
+    ready = {i for i, n in enumerate(waiting) if n == 0}
+    here = pool
+    order = []
+    while ready:
+        i = min(ready, key=lambda i: (distance(here, ends[i][0]), i))
+        ready.discard(i)
+        order.append(i)
+        here = ends[i][1]
+        for follower in followers[i]:
+            waiting[follower] -= 1
+            if waiting[follower] == 0:
+                ready.add(follower)
+    if len(order) != len(tasks):
+        raise ValueError("the transfers depend on each other in a circle")
+    return order
+
+def orderTransfers(tasks, pool, budget=TIME_BUDGET, seed=None):
+    """ A short valid order of tasks.  Returns (order, travel, greedy travel, travel in the given order)."""
+    deadline = time.perf_counter() + budget
+    rng = random.Random(seed)
+    ends = [_ends(task, pool) for task in tasks]
+    order = greedyOrder(tasks, pool)
+    greedy = travel(tasks, order, pool)
+    n = len(order)
+
+    def gaps(order, lo, hi): # empty travel into the lo'th to hi'th transfers of order
+        here = ends[order[lo - 1]][1] if lo > 0 else pool
+        total = 0
+        for k in range(lo, min(hi + 1, n)):
+            total += distance(here, ends[order[k]][0])
+            here = ends[order[k]][1]
+        return total
+    stale = 0
+    while n > 2 and stale < STALE_LIMIT * n and time.perf_counter() < deadline:
+        stale += 1
+        i, j = rng.sample(range(n), 2)
+        lo, hi = min(i, j), max(i, j)
+        if rng.random() < 0.5: # or-opt: move the i'th transfer to the j'th place
+            candidate = order[:i] + order[i + 1:]
+            candidate.insert(j, order[i])
+        else: # 2-opt: reverse the run from the lo'th to the hi'th
+            candidate = order[:lo] + order[lo:hi + 1][::-1] + order[hi + 1:]
+        # only the transfers from lo to hi and the one after them are reached differently
+        if gaps(candidate, lo, hi + 1) >= gaps(order, lo, hi + 1):
+            continue
+        position = {t: k for k, t in enumerate(candidate)}
+        if any(position[before] > k for k in range(lo, hi + 1) for before in tasks[candidate[k]].after):
+            continue
+        order = candidate
+        stale = 0
+    return order, travel(tasks, order, pool), greedy, travel(tasks, range(len(tasks)), pool)
+
+def travelExecutor():
+    """ The one worker process the searches share, started when first needed"""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ProcessPoolExecutor(max_workers=1)
+    return _EXECUTOR
+
+def shutdown():
+    """ Stops the worker process (if started) without waiting for a search still running"""
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _EXECUTOR = None
+
+class TravelRunner:
+    """ Runs orderTransfers in the worker process, after any search queued before it.  The GUI checks done
+    once per frame and then reads result (or error, if the search failed); cancel() gives up on it."""
+    def __init__(self, tasks, pool, budget=TIME_BUDGET, seed=None):
+        self.tasks = tasks
+        self.future = travelExecutor().submit(orderTransfers, tasks, pool, budget, seed)
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    @property
+    def result(self):
+        """ (order, travel, greedy travel, travel in the given order), None until done or if it failed"""
+        if not self.future.done() or self.future.cancelled() or self.future.exception() is not None:
+            return None
+        return self.future.result()
+
+    @property
+    def error(self):
+        return self.future.exception() if self.future.done() and not self.future.cancelled() else None
+
+    def ordered(self):
+        """ The transfers in the order found"""
+        return [self.tasks[i] for i in self.result[0]]
+
+    def cancel(self):
+        """ Drops the search if it has not started, one already running finishes unread"""
+        self.future.cancel()
@@ -0,0 +1,141 @@
+#
+#  Zobrist hashes of cores, kept up to date move by move.
+#
+import hashlib
+import random
+from functools import lru_cache
+
+from StoredInventory import fingerprint, FINGERPRINT_DIGITS
+from Symmetry import TRANSFORMS, coreSymmetry
+
+ZOBRIST_SEED = 20240229
+MASK = (1 << 64) - 1
+EMPTY = "Empty"
+QUADRANT_OFFSETS = ((-1, -1), (1, -1), (-1, 1), (1, 1)) # top left, top right, bottom left, bottom right
+
+def quadrantOrder(name):
+    """ new quadrant i of an assembly takes old quadrant order[i] when the core is transformed by name"""
+    transform = TRANSFORMS[name]
+    order = [0] * 4
+    for j, (dx, dy) in enumerate(QUADRANT_OFFSETS):
+        order[QUADRANT_OFFSETS.index(transform(dx, dy))] = j
+    return tuple(order)
+
+QUADRANT_ORDERS = {name: quadrantOrder(name) for name in TRANSFORMS}
+
+def stableHash(value):
+    """ 64 bits from repr(value), the same in every process (hash() of a str is not)"""
+    return int.from_bytes(hashlib.blake2b(repr(value).encode(), digest_size=8).digest(), "little")
+
+EMPTY_KEY = stableHash(EMPTY) # every empty position is the same, whatever the record says
+
+@lru_cache(maxsize=8192)
+def recordKeys(record, names):
+    """ The content key of an assembly record (a fingerprint) as it stands after each transform in names"""
+    if record[0] == EMPTY:
+        return (EMPTY_KEY,) * len(names)
+    label, enrichment, mox, burnup, poisons, leak = record
+    return tuple(stableHash((label, enrichment, mox, tuple(burnup[i] for i in QUADRANT_ORDERS[name]), poisons, leak))
+                 for name in names)
+
+def assemblyKeys(assembly, names):
+    """ recordKeys of an Assembly, None for a position that is not in the core"""
+    if assembly.label is None:
+        return None
+    return recordKeys(fingerprint(assembly), names)
+
+def stateRecord(label, enrichment, mox, burnup, poisons, leak):
+    """ The fingerprint of an assembly held in the arrays of a CoreState (see StoredInventory.fingerprint)"""
+    return (label, round(float(enrichment), FINGERPRINT_DIGITS), round(float(mox), FINGERPRINT_DIGITS),
+            tuple(round(float(b), FINGERPRINT_DIGITS) for b in burnup),
+            round(float(poisons), FINGERPRINT_DIGITS), bool(leak))
+
+class ZobristTable:
+    """ The position keys of one geometry, salted once per symmetry transform (identity first)"""
+    def __init__(self, rowLengths, fullCore):
+        symmetry = coreSymmetry(rowLengths, fullCore)
+        self.width = symmetry.width
+        size = symmetry.width * symmetry.height
+        stored = [y * symmetry.width + x for y, length in enumerate(symmetry.rowLengths) for x in range(length)]
+        rng = random.Random(ZOBRIST_SEED)
+        positionKeys = [rng.getrandbits(64) | 1 for _ in range(size)] # odd: multiplying by one loses nothing
+        self.names = tuple(name for name in TRANSFORMS if all(symmetry.tables[name][k] >= 0 for k in stored))
+        self.salts = []
+        for name in self.names:
+            table = symmetry.tables[name]
+            self.salts.append([positionKeys[table[k]] if table[k] >= 0 else 0 for k in range(size)])
+        self.positionSalts = [tuple(salts[k] for salts in self.salts) for k in range(size)] # position k under each transform
+
+    def flatIndex(self, x, y):
+        return y * self.width + x
+
+@lru_cache(maxsize=None)
+def zobristTable(rowLengths, fullCore):
+    return ZobristTable(tuple(rowLengths), fullCore)
+
+class CoreHash:
+    """ The hashes of one core, one per transform of its ZobristTable; copy() is O(1)"""
+    __slots__ = ("table", "content", "values", "shared")
+
+    def __init__(self, table):
+        self.table = table
+        self.content = [None] * len(table.salts[0])
+        self.values = [0] * len(table.names)
+        self.shared = False
+
+    @classmethod
+    def fromCore(cls, core, table):
+        """ The hashes of a core (rows of Assemblies, read as core[y][x])"""
+        coreHash = cls(table)
+        for y, row in enumerate(core):
+            for x, assembly in enumerate(row):
+                coreHash.set(table.flatIndex(x, y), assemblyKeys(assembly, table.names))
+        return coreHash
+
+    def copy(self):
+        other = CoreHash.__new__(CoreHash)
+        other.table = self.table
+        other.content = self.content
+        other.values = list(self.values)
+        other.shared = self.shared = True
+        return other
+
+    @property
+    def value(self):
+        """ The hash of the core as it stands"""
+        return self.values[0]
+
+    def canonical(self):
+        """ The same for a core and all its symmetric images"""
+        return min(self.values)
+
+    def _toggle(self, k, keys):
+        # a product, not salt ^ key: two positions exchanging their keys must change the XOR
+        self.values = [value ^ ((salt * key) & MASK) for value, salt, key in zip(self.values, self.table.positionSalts[k], keys)]
+
+    def set(self, k, keys):
+        """ Puts an assembly with content keys (see recordKeys) at flat position k"""
+        old = self.content[k]
+        if old == keys:
+            return
+        if self.shared:
+            self.content = list(self.content)
+            self.shared = False
+        if old is not None:
+            self._toggle(k, old)
+        if keys is not None:
+            self._toggle(k, keys)
+        self.content[k] = keys
+
+    def swap(self, a, b):
+        """ Exchanges the assemblies at flat positions a and b"""
+        one, two = self.content[a], self.content[b]
+        self.set(a, two)
+        self.set(b, one)
+
+    def gather(self, perm, changed):
+        """ Position k takes the assembly from position perm[k] (CoreState.gather); changed are the positions
+        where perm[k] != k"""
+        moving = [(k, self.content[perm[k]]) for k in changed]
+        for k, keys in moving:
+            self.set(k, keys)
@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Assembly import Assembly
+from BurnupModel import burnState
+from CoreRegistry import coreRegistry
+from CoreState import CoreState
+
+CORE_TYPES = coreRegistry().names()
+
+def randomCore(size=15, seed=0):
+    """ A square core of assemblies with different burnups, blank (label None) outside a circle and a
+    few positions left 'Empty'"""
+    rng = random.Random(seed)
+    centre = (size - 1) / 2.0
+    core = []
+    for y in range(size):
+        row = []
+        for x in range(size):
+            if (x - centre) ** 2 + (y - centre) ** 2 > (centre + 0.5) ** 2:
+                row.append(Assembly(None))
+            elif rng.random() < 0.05:
+                row.append(Assembly("Empty"))
+            else:
+                row.append(Assembly(str(x) + "," + str(y), rng.choice((1.6, 2.4, 3.2)),
+                                    [rng.uniform(0, 40) for _ in range(4)], rng.choice((0, 10))))
+        core.append(row)
+    return core
+
+def fuelPositions(core):
+    """ (x, y) of every fuel position of a core (rows of Assemblies)"""
+    return [(x, y) for y, row in enumerate(core) for x, assy in enumerate(row) if assy.label is not None]
+
+def burnedCore(coreType, seed=0, shuffles=100):
+    """ The starting core of coreType burned, shuffled at random and burned again, so that the
+    assemblies differ and their quadrants do too"""
+    rng = random.Random(seed)
+    state = CoreState.fromAssemblyCore(coreType.startingCore(), coreType.name)
+    burnState(state)
+    positions = fuelPositions(state.toAssemblyCore())
+    state.apply_moves([["swap", list(a), list(b)] for a, b in (rng.sample(positions, 2) for _ in range(shuffles))])
+    burnState(state)
+    return state.toAssemblyCore()
+
+@pytest.fixture(params=CORE_TYPES)
+def coreType(request):
+    return coreRegistry().get(request.param)
@@ -0,0 +1,41 @@
+import copy
+import pickle
+
+import pytest
+
+from Assembly import Assembly, FuelType, quadrantColor
+
+def fields(assy):
+    return (assy.label, assy.moved, assy.UO2WT, assy.MOX, assy.Burnup, assy.BurnablePoisons,
+            assy.SUSPECTED_FOR_LEAK, assy.quadColor)
+
+def test_fresh_assemblies_share_an_interned_fuel_type():
+    one, two = Assembly("A", 3.2), Assembly("B", 3.2)
+    assert one.fuel is two.fuel is FuelType(3.2)
+    assert one.quadColor is two.quadColor
+    assert Assembly("C", 2.4).fuel is not one.fuel
+    with pytest.raises(AttributeError):
+        one.fuel.UO2WT = 2.4
+    with pytest.raises(AttributeError):
+        one.colour = (0, 0, 0) # slotted, no per instance dict
+
+def test_burning_one_assembly_leaves_the_others_alone():
+    one, two = Assembly("A", 3.2), Assembly("B", 3.2)
+    one.Burnup = [10, 20, 30, 40]
+    assert not one.isFresh() and two.isFresh()
+    assert two.Burnup == (0.0, 0.0, 0.0, 0.0)
+    assert one.quadColor == tuple(quadrantColor(b, 3.2, 10) for b in (10, 20, 30, 40))
+    assert two.quadColor == (quadrantColor(0, 3.2, 10),) * 4
+    one.UO2WT = 2.4
+    assert two.UO2WT == 3.2 and one.quadColor[0] == quadrantColor(10, 2.4, 10)
+
+def test_copies_and_pickles_are_independent():
+    assy = Assembly("A", 2.4, (1.0, 2.0, 3.0, 4.0), 5.0, MOX=1)
+    assy.SUSPECTED_FOR_LEAK = True
+    assy.moved = True
+    for other in (assy.copy(), copy.copy(assy), copy.deepcopy(assy), pickle.loads(pickle.dumps(assy))):
+        assert fields(other) == fields(assy)
+        other.Burnup = [9, 9, 9, 9]
+        other.SUSPECTED_FOR_LEAK = False
+        assert assy.Burnup == (1.0, 2.0, 3.0, 4.0) and assy.SUSPECTED_FOR_LEAK
+    assert pickle.loads(pickle.dumps(assy)).fuel is assy.fuel
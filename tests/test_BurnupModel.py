@@ -0,0 +1,86 @@
+import math
+
+import numpy as np
+
+from conftest import randomCore
+from Assembly import quadrantColor
+from BurnupModel import (CYCLE_BURNUP, DIFFUSION_PASSES, K_FRESH, K_PER_BURNUP, K_PER_POISON, K_PER_WT,
+                         POISON_BURN_RATE, burnCycles, burnState, quadColors)
+from CoreState import CoreState
+
+def randomArrays(rng, height, width):
+    burnup = rng.uniform(0, 40, (height, width, 4)).astype(np.float32)
+    enrichment = rng.choice([1.6, 2.4, 3.2], (height, width)).astype(np.float32)
+    poisons = rng.choice([0.0, 10.0], (height, width)).astype(np.float32)
+    fuel = rng.random((height, width)) < 0.85
+    return burnup, enrichment, poisons, fuel
+
+def referenceBurn(burnup, enrichment, poisons, fuel, centre, cycles):
+    """ The model worked out one quadrant at a time, in the per tile loops of the old doBurnup"""
+    height, width = fuel.shape
+    burnup = burnup.astype(float)
+    poisons = poisons.astype(float)
+    cx, cy = centre
+    radius = lambda gx, gy: math.sqrt(((gx + 0.5) / 2.0 - cx) ** 2 + ((gy + 0.5) / 2.0 - cy) ** 2)
+    extrapolated = max(radius(gx, gy) for gy in range(2 * height) for gx in range(2 * width)) + 1.0
+    for cycle in range(cycles):
+        power = {}
+        for tiley in range(height):
+            for tilex in range(width):
+                if fuel[tiley, tilex]:
+                    for q in range(4):
+                        gx, gy = 2 * tilex + q % 2, 2 * tiley + q // 2
+                        kinf = K_FRESH + K_PER_WT * enrichment[tiley, tilex] - K_PER_BURNUP * burnup[tiley, tilex, q] \
+                               - K_PER_POISON * poisons[tiley, tilex]
+                        power[gx, gy] = kinf * math.cos(radius(gx, gy) * (math.pi / 2.0) / extrapolated)
+        for i in range(DIFFUSION_PASSES):
+            power = {(gx, gy): 0.5 * p + 0.125 * sum(power.get(n, 0.0) for n in ((gx - 1, gy), (gx + 1, gy), (gx, gy - 1), (gx, gy + 1)))
+                     for (gx, gy), p in power.items()}
+        mean = sum(power.values()) / len(power)
+        for tiley in range(height):
+            for tilex in range(width):
+                if fuel[tiley, tilex]:
+                    quads = [power[2 * tilex + q % 2, 2 * tiley + q // 2] / mean for q in range(4)]
+                    for q in range(4):
+                        burnup[tiley, tilex, q] += quads[q] * CYCLE_BURNUP
+                    poisons[tiley, tilex] *= math.exp(-POISON_BURN_RATE * sum(quads) / 4)
+    return burnup, poisons
+
+def test_burn_cycles_matches_the_per_tile_loop():
+    rng = np.random.default_rng(0)
+    for size, centre in ((15, (7.5, 7.5)), (8, (0.5, 0.5))):
+        burnup, enrichment, poisons, fuel = randomArrays(rng, size, size)
+        for cycles in (1, 3):
+            newBurnup, newPoisons, power = burnCycles(burnup, enrichment, poisons, fuel, centre, cycles)
+            expectBurnup, expectPoisons = referenceBurn(burnup, enrichment, poisons, fuel, centre, cycles)
+            assert np.allclose(newBurnup[fuel], expectBurnup[fuel], rtol=1e-4)
+            assert np.allclose(newPoisons[fuel], expectPoisons[fuel], rtol=1e-4)
+            assert np.isclose(power[fuel].mean(), 1.0)
+
+def test_a_batch_burns_like_its_cores_one_at_a_time():
+    rng = np.random.default_rng(1)
+    cores = [randomArrays(rng, 9, 9) for _ in range(4)]
+    batch = burnCycles(*[np.stack(arrays) for arrays in zip(*cores)], centre=(4.5, 4.5), cycles=2)
+    for k, arrays in enumerate(cores):
+        for batched, single in zip(batch, burnCycles(*arrays, centre=(4.5, 4.5), cycles=2)):
+            assert np.allclose(batched[k], single, rtol=1e-5)
+
+def test_burn_state_leaves_blanks_and_empties_alone():
+    core = randomCore(seed=3)
+    state = CoreState.fromAssemblyCore(core)
+    before = state.copy()
+    burnState(state)
+    fuel = state.labelIndex >= 0
+    assert (state.burnup[fuel] > before.burnup[fuel]).all()
+    assert (state.burnup[~fuel] == before.burnup[~fuel]).all()
+    assert (state.poisons[~fuel] == before.poisons[~fuel]).all()
+
+def test_colours_match_the_assembly_colours():
+    rng = np.random.default_rng(2)
+    burnup, enrichment, poisons, fuel = randomArrays(rng, 5, 5)
+    colors = quadColors(burnup, enrichment, poisons)
+    for y in range(5):
+        for x in range(5):
+            for q in range(4):
+                expected = quadrantColor(float(burnup[y, x, q]), float(enrichment[y, x]), float(poisons[y, x]))
+                assert np.allclose(colors[y, x, q], expected, rtol=1e-5)
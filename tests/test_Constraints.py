@@ -0,0 +1,73 @@
+import random
+
+from conftest import burnedCore, fuelPositions
+from Assembly import Assembly
+from Constraints import ConstraintChecker
+from Snapshot import CoreSnapshot
+
+def counts(checker):
+    return (checker.records, checker.freshNeighbours, checker.freshPairs, checker.ringFeed,
+            [round(q, 6) for q in checker.quadrantEnrichment], checker.burned, checker.leakers,
+            sorted(checker.violatingPositions()), checker.violations())
+
+def test_incremental_counts_equal_a_full_rescan(coreType):
+    rng = random.Random(coreType.name)
+    core = CoreSnapshot(burnedCore(coreType))
+    checker = core.constraintChecker(coreType)
+    positions = fuelPositions(core)
+    for step in range(300):
+        r = rng.random()
+        if r < 0.5:
+            a, b = rng.sample(positions, 2)
+            core.swap(a, b)
+        elif r < 0.6:
+            pos = rng.choice(positions)
+            orbit = coreType.symmetry.rotationOrbit(pos)
+            if orbit is not None:
+                core.rotate(orbit)
+        elif r < 0.8:
+            x, y = rng.choice(positions)
+            core.set(x, y, Assembly("3.2", 3.2))
+        elif r < 0.9:
+            x, y = rng.choice(positions)
+            core.set(x, y, Assembly("Empty"))
+        else:
+            core.mutable(*rng.choice(positions)).SUSPECTED_FOR_LEAK = rng.random() < 0.5
+        if step % 5 == 0:
+            assert core.constraintChecker(coreType) is checker
+            assert counts(checker) == counts(ConstraintChecker.fromCore(core.rows, coreType)), step
+    assert checker.violations()
+
+def test_try_moves_previews_without_changing(coreType):
+    rng = random.Random(coreType.name)
+    core = CoreSnapshot(burnedCore(coreType))
+    positions = fuelPositions(core)
+    for x, y in rng.sample(positions, len(positions) // 4):
+        core.set(x, y, Assembly("3.2", 3.2))
+    checker = core.constraintChecker(coreType)
+    for _ in range(30):
+        before, version = counts(checker), checker.version
+        a, b = rng.sample(positions, 2)
+        preview = checker.tryMoves([["swap", list(a), list(b)]])
+        assert counts(checker) == before and checker.version == version
+        swapped = core.snapshot()
+        swapped.swap(a, b)
+        after = ConstraintChecker.fromCore(swapped.rows, coreType)
+        assert preview == (after.violatingPositions(), after.violations())
+
+def test_feed_rules_wait_for_a_reload(coreType):
+    checker = ConstraintChecker.fromCore(coreType.startingCore(), coreType)
+    assert not checker.reload
+    assert checker.violations() == []
+    assert not checker.violatingPositions()
+
+def test_a_swap_of_burned_fuel_rechecks_only_its_two_positions(coreType, monkeypatch):
+    core = CoreSnapshot(burnedCore(coreType))
+    checker = core.constraintChecker(coreType)
+    burned = [(x, y) for x, y in fuelPositions(core) if not core[y][x].isFresh()]
+    checked = []
+    violating = ConstraintChecker._violating
+    monkeypatch.setattr(ConstraintChecker, "_violating", lambda self, k: checked.append(k) or violating(self, k))
+    core.swap(burned[0], burned[-1])
+    assert len(checked) <= 2
+    assert counts(checker) == counts(ConstraintChecker.fromCore(core.rows, coreType))
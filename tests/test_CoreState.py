@@ -0,0 +1,90 @@
+import copy
+import random
+
+import numpy as np
+
+from conftest import fuelPositions, randomCore
+from Assembly import Assembly
+from CoreState import CoreState
+from StoredInventory import StoredInventory
+
+def referenceMoves(core, moves):
+    """ The moves made on a deep copy of core, the way FuelManager's makeSwap and makeRotate did"""
+    core = copy.deepcopy(core)
+    size = len(core)
+    for kind, one, two in moves:
+        if kind == "swap":
+            (onex, oney), (twox, twoy) = one, two
+            core[oney][onex].moved = True
+            core[twoy][twox].moved = True
+            core[oney][onex], core[twoy][twox] = core[twoy][twox], core[oney][onex]
+        else:
+            onex, oney = one
+            twox, twoy = size - oney - 1, onex
+            threex, threey = size - onex - 1, size - oney - 1
+            fourx, foury = oney, size - onex - 1
+            for x, y in (one, (twox, twoy), (threex, threey), (fourx, foury)):
+                core[y][x].moved = True
+            if two == 1:
+                core[oney][onex], core[twoy][twox], core[threey][threex], core[foury][fourx] = \
+                    core[foury][fourx], core[oney][onex], core[twoy][twox], core[threey][threex]
+            else:
+                core[oney][onex], core[twoy][twox], core[threey][threex], core[foury][fourx] = \
+                    core[twoy][twox], core[threey][threex], core[foury][fourx], core[oney][onex]
+    return core
+
+def contents(core):
+    return [[(assy.label, assy.moved) for assy in row] for row in core]
+
+def burnup(core):
+    return np.array([[assy.Burnup for assy in row] for row in core], dtype=float)
+
+def randomMoves(core, rng, count):
+    positions = fuelPositions(core)
+    moves = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            a, b = rng.sample(positions, 2)
+            moves.append(["swap", list(a), list(b)])
+        else:
+            moves.append(["rotate", list(rng.choice(positions)), rng.choice((1, -1))])
+    return moves
+
+def test_apply_moves_matches_the_deepcopy_path():
+    for seed in range(5):
+        rng = random.Random(seed)
+        core = randomCore(seed=seed)
+        moves = randomMoves(core, rng, 200)
+        state = CoreState.fromAssemblyCore(core)
+        state.apply_moves(moves)
+        moved, reference = state.toAssemblyCore(), referenceMoves(core, moves)
+        assert contents(moved) == contents(reference), seed
+        assert np.allclose(burnup(moved), burnup(reference), atol=1e-4), seed
+
+def test_single_moves_match_one_batch():
+    rng = random.Random(1)
+    core = randomCore(seed=1)
+    moves = randomMoves(core, rng, 50)
+    batch = CoreState.fromAssemblyCore(core)
+    batch.apply_moves(moves)
+    single = CoreState.fromAssemblyCore(core)
+    for kind, one, two in moves:
+        if kind == "swap":
+            single.swap(one, two)
+        else:
+            single.rotate(one, two)
+    for name in CoreState.FIELDS:
+        assert (getattr(single, name) == getattr(batch, name)).all(), name
+
+def test_loads_and_removes_go_through_the_inventory():
+    core = randomCore(seed=2)
+    state = CoreState.fromAssemblyCore(core)
+    inventory = StoredInventory([Assembly("3.2", 3.2)], [2], ["fresh"])
+    (ax, ay), (bx, by) = [(x, y) for x, y in fuelPositions(core) if core[y][x].label != "Empty"][:2]
+    records = state.apply_moves([["swap", [ax, ay], [bx, by]], ["load", [ax, ay], 0], ["rotate", [7, 3], 1]], inventory)
+    assert records == [["remove", [ax, ay], 1]]
+    assert state.getLabel(ax, ay) == "3.2" and state.getLabel(bx, by) == core[ay][ax].label
+    assert [item.quantity for item in inventory.inventoryList] == [1, 1]
+    assert inventory.inventoryList[1].assembly.label == core[by][bx].label
+    removed = state.apply_moves([["remove", [bx, by], None]], inventory)
+    assert removed == [["remove", [bx, by], 2]] and state.getLabel(bx, by) == "Empty"
@@ -0,0 +1,58 @@
+from EvalCache import EvalCache
+
+def test_lru_drops_the_oldest():
+    cache = EvalCache(maxSize=3)
+    for k in range(5):
+        cache.lookup(("peaking", k), lambda: k * 1.5)
+    cache.lookup(("peaking", 2), lambda: None) # a hit, 2 is now the newest
+    cache.lookup(("peaking", 5), lambda: 7.5)
+    assert list(cache.results) == [("peaking", 4), ("peaking", 2), ("peaking", 5)]
+    assert cache.stats()[:3] == (1, 6, 0)
+
+def test_spilled_results_are_found_in_the_file(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EvalCache(maxSize=2, path=path)
+    for k in range(4):
+        cache.lookup(("peaking", k), lambda: [k, k + 0.5])
+    assert ("peaking", 0) not in cache.results
+    assert cache.lookup(("peaking", 0), lambda: "computed again") == [0, 0.5]
+    assert cache.diskHits == 1
+    cache.close()
+    reopened = EvalCache(maxSize=10, path=path)
+    for k in range(4):
+        assert reopened.lookup(("peaking", k), lambda: "computed again") == [k, k + 0.5]
+    assert reopened.diskHits == 4 and reopened.misses == 0
+    reopened.close()
+
+def test_the_file_keeps_the_most_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EvalCache(maxSize=1, path=path, diskLimit=3)
+    for k in range(6):
+        cache.lookup(("peaking", k), lambda: k)
+    cache.close()
+    rows = cache._disk().execute("SELECT key FROM evaluations").fetchall()
+    assert sorted(rows) == [(repr(("peaking", k)),) for k in (3, 4, 5)]
+    cache.close()
+
+def test_a_file_that_cannot_be_opened_leaves_the_cache_in_memory(tmp_path):
+    cache = EvalCache(path=str(tmp_path / "missing" / "cache.sqlite"))
+    assert cache.lookup(("peaking", 0), lambda: 1.5) == 1.5
+    assert cache.lookup(("peaking", 0), lambda: None) == 1.5
+    assert cache.path is None
+    cache.close()
+
+def test_a_failing_file_leaves_the_cache_in_memory(tmp_path):
+    cache = EvalCache(maxSize=1, path=str(tmp_path / "cache.sqlite"))
+    cache.lookup(("peaking", 0), lambda: 0.5)
+    cache._disk().close() # every statement fails from now on, like a full disk
+    for k in range(1, 4):
+        assert cache.lookup(("peaking", k), lambda: k * 0.5) == k * 0.5 # spills the one before
+    assert cache.path is None and cache.db is None
+    assert cache.lookup(("peaking", 0), lambda: "computed again") == "computed again"
+    cache.close()
+
+def test_a_failing_read_is_a_miss(tmp_path):
+    cache = EvalCache(maxSize=1, path=str(tmp_path / "cache.sqlite"))
+    cache._disk().close()
+    assert cache.lookup(("peaking", 0), lambda: 1.5) == 1.5
+    assert cache.path is None and cache.stats()[:3] == (0, 1, 0)
@@ -0,0 +1,40 @@
+from Geometry import TileGeometry
+
+LAYOUTS = [((30, 380, 25, 60, 15, 225, 5), [15] * 15),
+           ((45, 400, 25, 80, 8, 225, 5), [8, 8, 8, 8, 7, 7, 6, 4])]
+
+def scanTiles(geometry, x, y, rowLengths, inventorySize, coreImage):
+    """ The tile under pixel x, y found the way getSpotClicked did, by testing the rect of every tile"""
+    if coreImage == "Inventory":
+        tiles = [(0, i) for i in range(inventorySize)]
+    else:
+        tiles = [(tileX, tileY) for tileY, length in enumerate(rowLengths) for tileX in range(length)]
+    for tileX, tileY in tiles:
+        left, top = geometry.leftTop(tileX, tileY, coreImage)
+        if left <= x < left + geometry.tileSize and top <= y < top + geometry.tileSize:
+            return (tileX, tileY)
+    return (None, None)
+
+def test_lookup_matches_a_scan_of_every_tile():
+    for layout, rowLengths in LAYOUTS:
+        geometry = TileGeometry(*layout)
+        inventorySize = 12
+        for coreImage in ("Main", "Start", "Inventory"):
+            left, top = geometry.leftTop(0, 0, coreImage)
+            right, bottom = geometry.leftTop(max(rowLengths), len(rowLengths), coreImage)
+            if coreImage == "Inventory":
+                right, bottom = left + 3 * geometry.inventoryColumnSize, top + geometry.tilesPerColumn * geometry.tileSize
+            for y in range(top - 3, bottom + 3, 5):
+                for x in range(left - 3, right + 3, 5):
+                    expected = scanTiles(geometry, x, y, rowLengths, inventorySize, coreImage)
+                    assert geometry.spotAt(x, y, rowLengths, inventorySize, coreImage) == expected, (coreImage, x, y)
+
+def test_hit_test_tells_the_core_from_the_inventory():
+    geometry = TileGeometry(*LAYOUTS[0][0])
+    rowLengths = LAYOUTS[0][1]
+    left, top = geometry.leftTop(3, 4)
+    assert geometry.hitTest(left + 1, top + 1, rowLengths, 7) == ("Main", 3, 4)
+    left, top = geometry.leftTop(0, 6, "Inventory")
+    assert geometry.hitTest(left + 1, top + 1, rowLengths, 7) == ("Inventory", 0, 6)
+    assert geometry.hitTest(left + 1, top + 1, rowLengths, 6) == (None, None, None)
+    assert geometry.hitTest(0, 0, rowLengths, 7) == (None, None, None)
@@ -0,0 +1,78 @@
+import random
+
+from conftest import burnedCore, fuelPositions
+from Assembly import Assembly
+from CoreState import CoreState
+from History import BurnCommand, History, MoveCommand, invertMoves
+from StoredInventory import StoredInventory
+
+def arrays(state):
+    return [getattr(state, name).tolist() for name in CoreState.FIELDS if name != "moved"]
+
+def randomAction(state, inventory, positions, rng):
+    """ Carries out one swap, rotation, remove or load on state and returns its moves"""
+    r = rng.random()
+    if r < 0.5:
+        a, b = rng.sample(positions, 2)
+        moves = [["swap", list(a), list(b)]]
+    elif r < 0.7:
+        moves = [["rotate", list(rng.choice(positions)), rng.choice((1, -1))]]
+    elif r < 0.85:
+        x, y = rng.choice(positions)
+        if state.getLabel(x, y) == "Empty":
+            return []
+        return [["remove", [x, y], state.remove([x, y], inventory)]]
+    else:
+        itemID = rng.choice(inventory.inventoryList).itemID
+        pos = list(rng.choice(positions))
+        return [state.load(pos, inventory, itemID), ["load", pos, itemID]]
+    state.apply_moves(moves, inventory)
+    return moves
+
+def test_undo_redo_round_trip(coreType):
+    rng = random.Random(coreType.name)
+    state = CoreState.fromAssemblyCore(burnedCore(coreType), coreType.name)
+    inventory = StoredInventory([Assembly("3.2", 3.2), Assembly("2.4", 2.4)], [20, 20], ["3.2", "2.4"])
+    positions = fuelPositions(state.toAssemblyCore())
+    history = History()
+    snapshots = [arrays(state)]
+    for _ in range(60):
+        moves = randomAction(state, inventory, positions, rng)
+        if moves:
+            history.recordMoves(moves)
+            snapshots.append(arrays(state))
+    while history.canUndo():
+        state.apply_moves(history.undo().inverse, inventory)
+        assert arrays(state) == snapshots[history.position]
+    while history.canRedo():
+        state.apply_moves(history.redo().moves, inventory)
+        assert arrays(state) == snapshots[history.position]
+
+def test_jump_merges_moves_and_stops_at_burns():
+    history = History()
+    history.recordMoves([["swap", [0, 0], [1, 0]]])
+    history.recordMoves([["rotate", [1, 1], 1]])
+    history.record(BurnCommand(None, None, []))
+    history.recordMoves([["swap", [2, 0], [0, 2]]])
+    history.recordMoves([["swap", [1, 2], [2, 1]]])
+    assert history.cycleStart() == 3
+    steps = history.jumpTo(history.cycleStart())
+    assert len(steps) == 1 and isinstance(steps[0][0], MoveCommand)
+    assert steps[0][0].moves == [["swap", [1, 2], [2, 1]], ["swap", [2, 0], [0, 2]]]
+    steps = history.jumpTo(0)
+    assert [type(command) for command, forward in steps] == [BurnCommand, MoveCommand]
+    assert steps[0][1] is False
+    assert steps[1][0].moves == invertMoves([["swap", [0, 0], [1, 0]], ["rotate", [1, 1], 1]])
+    assert history.cycleEnd() == 2
+
+def test_record_drops_the_redo_tail():
+    history = History()
+    for k in range(3):
+        history.recordMoves([["swap", [k, 0], [k, 1]]])
+    history.undo()
+    history.undo()
+    version = history.version
+    history.recordMoves([["rotate", [0, 0], -1]])
+    assert not history.canRedo()
+    assert history.version != version
+    assert history.cycleMoves() == [["swap", [0, 0], [0, 1]], ["rotate", [0, 0], -1]]
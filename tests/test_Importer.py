@@ -0,0 +1,66 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from conftest import burnedCore, fuelPositions
+from CoreState import CoreState
+from Importer import ImportFormatError, importCoreMap, importInventory
+
+def coreRecords(core, coreType):
+    records = []
+    for x, y in fuelPositions(core):
+        assy = core[y][x]
+        records.append({"position": coreType.coords(x, y), "label": assy.label, "enrichment": assy.UO2WT, "mox": assy.MOX,
+                        "burnup": ";".join(str(b) for b in assy.Burnup), "poisons": assy.BurnablePoisons,
+                        "leak": assy.SUSPECTED_FOR_LEAK})
+    return records
+
+def write(path, records):
+    if path.suffix == ".csv":
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+    elif path.suffix == ".json":
+        path.write_text(json.dumps(records, indent=1))
+    else:
+        path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return str(path)
+
+@pytest.mark.parametrize("extension", [".csv", ".json", ".jsonl"])
+def test_core_map_round_trip(coreType, extension, tmp_path):
+    core = burnedCore(coreType)
+    x, y = fuelPositions(core)[-1]
+    core[y][x].SUSPECTED_FOR_LEAK = True
+    expected = CoreState.fromAssemblyCore(core, coreType.name)
+    state = importCoreMap(write(tmp_path / ("core" + extension), coreRecords(core, coreType)), coreType)
+    fuel = ~coreType.blankMask
+    for name in CoreState.FIELDS:
+        if name not in ("labelIndex", "moved"):
+            assert np.allclose(getattr(state, name)[fuel], getattr(expected, name)[fuel]), name
+    labels = [[assy.label for assy in row] for row in state.toAssemblyCore()]
+    assert labels == [[assy.label for assy in row] for row in core]
+
+def test_core_map_reports_the_bad_line(coreType, tmp_path):
+    records = coreRecords(coreType.startingCore(), coreType)
+    records[2]["enrichment"] = "lots"
+    with pytest.raises(ImportFormatError) as error:
+        importCoreMap(write(tmp_path / "core.csv", records), coreType)
+    assert error.value.line == 4 # the header is line 1
+    with pytest.raises(ValueError, match="not given"):
+        importCoreMap(write(tmp_path / "short.jsonl", records[3:]), coreType)
+
+def test_inventory_merges_and_keeps_the_last_cycle(tmp_path):
+    records = [{"label": "A", "enrichment": 3.2, "quantity": 4, "cycle": 1},
+               {"label": "A", "enrichment": 3.2, "quantity": 2, "cycle": 2},
+               {"label": "A", "enrichment": 3.2, "quantity": 3, "cycle": 2, "description": "again"},
+               {"label": "B", "enrichment": 2.4, "burnup": [1, 2, 3, 4], "leak": "yes", "cycle": 2},
+               {"label": "C", "enrichment": 1.6, "cycle": 10}]
+    path = write(tmp_path / "inventory.jsonl", records)
+    assert [(item.assembly.label, item.quantity) for item in importInventory(path).inventoryList] == [("C", 1)]
+    inventory = importInventory(path, cycle=2)
+    assert [(item.assembly.label, item.quantity) for item in inventory.inventoryList] == [("A", 5), ("B", 1)]
+    leaker = inventory.inventoryList[1].assembly
+    assert leaker.Burnup == (1.0, 2.0, 3.0, 4.0) and leaker.SUSPECTED_FOR_LEAK
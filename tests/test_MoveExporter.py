@@ -0,0 +1,49 @@
+import csv
+import json
+
+from conftest import fuelPositions
+from CoreRegistry import coreRegistry
+from MoveExporter import CSV_COLUMNS, POOL, MoveExporter, describeMoves
+
+MOVES = [["swap", [7, 7], [3, 7]], ["noMove", 0, 0], ["rotate", [3, 7], 1], ["remove", [7, 7], 4], ["load", [7, 7], 2]]
+
+def export(path, coreType, cycles):
+    labels = lambda: [[assy.label for assy in row] for row in coreType.startingCore()]
+    exporter = MoveExporter(str(path))
+    return [exporter.writeCycle(cycle, labels(), MOVES, coreType.coords, coreType.symmetry, lambda itemID: "fresh" + str(itemID))
+            for cycle in cycles]
+
+def test_records_follow_the_replayed_labels():
+    coreType = coreRegistry().get("Full")
+    labels = [[assy.label for assy in row] for row in coreType.startingCore()]
+    a, b = labels[7][7], labels[7][3]
+    steps = list(describeMoves(1, labels, MOVES, coreType.coords, coreType.symmetry, lambda itemID: "fresh"))
+    assert [records[0].kind for records in steps] == ["swap", "rotate", "remove", "load"]
+    h8, other = coreType.coords(7, 7), coreType.coords(3, 7)
+    assert [(r.label, r.source, r.target) for r in steps[0]] == [(a, h8, other), (b, other, h8)]
+    assert len(steps[1]) == 4 and steps[1][0].label == a
+    assert (steps[2][0].label, steps[2][0].target, steps[2][0].item) == (b, POOL, 4)
+    assert (steps[3][0].label, steps[3][0].source) == ("fresh", POOL)
+    assert labels[7][7] == "fresh" and a not in (labels[7][3], labels[7][7])
+
+def test_the_three_formats_agree(tmp_path):
+    coreType = coreRegistry().get("Full")
+    assert export(tmp_path / "moves.txt", coreType, [1, 2]) == [4, 4]
+    export(tmp_path / "moves.csv", coreType, [1, 2])
+    export(tmp_path / "moves.jsonl", coreType, [1, 2])
+    text = (tmp_path / "moves.txt").read_text().splitlines()
+    assert text[0] == "#To reload the Core for cycle 1:" and text[5] == "#To reload the Core for cycle 2:"
+    assert text[1].startswith("1. swap: H8 (") and text[4].startswith("4. load: fresh2 from inventory item 2 into H8")
+    with open(tmp_path / "moves.csv", newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == list(CSV_COLUMNS) and CSV_COLUMNS[0] not in [row[0] for row in rows[1:]] # one header
+    lines = [json.loads(line) for line in (tmp_path / "moves.jsonl").read_text().splitlines()]
+    assert len(lines) == len(rows) - 1 == 2 * (2 + 4 + 1 + 1)
+    assert [[str(v) if v is not None else "" for v in line.values()] for line in lines] == rows[1:]
+
+def test_quarter_core_rotations_turn_in_place(tmp_path):
+    coreType = coreRegistry().get("Quarter")
+    x, y = fuelPositions(coreType.startingCore())[5]
+    labels = [[assy.label for assy in row] for row in coreType.startingCore()]
+    steps = list(describeMoves(1, labels, [["rotate", [x, y], -1]], coreType.coords, coreType.symmetry, str))
+    assert [(r.kind, r.source, r.target, r.direction) for r in steps[0]] == [("turn", coreType.coords(x, y), coreType.coords(x, y), -1)]
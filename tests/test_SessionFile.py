@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from conftest import burnedCore
+from Assembly import Assembly
+from CoreState import CoreState
+from SessionFile import SessionFile, SessionFormatError, decodeMoves, encodeMoves, saveSession
+from StoredInventory import StoredInventory
+
+MOVES = [[["swap", [1, 2], [3, 4]], ["rotate", [0, 5], -1]],
+         [],
+         [["remove", [2, 2], 3], ["load", [2, 2], 0], ["noMove", 0, 0]]]
+
+def arrays(state):
+    """ The label of every position and the other arrays (label indices differ, the file has one label table)"""
+    labels = [[state.getLabel(x, y) for x in range(state.width)] for y in range(state.height)]
+    return [labels] + [getattr(state, name).tolist() for name in CoreState.FIELDS if name != "labelIndex"]
+
+def test_moves_round_trip():
+    for moves in MOVES:
+        assert decodeMoves(encodeMoves(moves)) == moves
+
+def test_session_round_trip(coreType, tmp_path):
+    cycles = [CoreState.fromAssemblyCore(burnedCore(coreType, seed), coreType.name) for seed in range(3)]
+    current = CoreState.fromAssemblyCore(burnedCore(coreType, 3), coreType.name)
+    leaker = Assembly("L1", 4.1, (1.0, 2.0, 3.0, 4.0), 5.0, 0.5)
+    leaker.SUSPECTED_FOR_LEAK = True
+    inventory = StoredInventory([Assembly("3.2", 3.2), leaker], [7, 1], ["fresh", "leaker"])
+    path = str(tmp_path / "session.lps")
+    saveSession(path, coreType.name, cycles, current, MOVES, inventory)
+    with SessionFile(path) as session:
+        assert session.coreType == coreType.name and session.cycleCount == 3
+        assert [session.moves(cycle) for cycle in range(3)] == MOVES
+        for cycle, state in enumerate(cycles):
+            assert arrays(session.cycleState(cycle)) == arrays(state)
+        assert arrays(session.currentState()) == arrays(current)
+        assert session.currentState().toAssemblyCore()[4][4].Burnup == current.toAssemblyCore()[4][4].Burnup
+        items = session.inventory().items
+        assert [(i.itemID, i.quantity, i.description) for i in items.values()] == [(0, 7, "fresh"), (1, 1, "leaker")]
+        assert items[1].assembly.Burnup == leaker.Burnup and items[1].assembly.SUSPECTED_FOR_LEAK
+        tables = [session.moveTable(cycle) for cycle in range(3)]
+        resaved = str(tmp_path / "resaved.lps")
+        saveSession(resaved, session.coreType, [session.cycleState(c) for c in range(3)], session.currentState(),
+                    tables, session.inventory())
+    with SessionFile(resaved) as session:
+        assert [session.moves(cycle) for cycle in range(3)] == MOVES
+        assert arrays(session.cycleState(1)) == arrays(cycles[1])
+
+def test_cycle_states_are_read_only_views(coreType, tmp_path):
+    state = CoreState.fromAssemblyCore(burnedCore(coreType), coreType.name)
+    path = str(tmp_path / "session.lps")
+    saveSession(path, coreType.name, [state], state, [[]], StoredInventory([], [], []))
+    with SessionFile(path) as session:
+        view = session.cycleState(0)
+        with pytest.raises(ValueError):
+            view.enrichment[0, 0] = 1.0
+        copy = view.copy()
+        copy.enrichment[0, 0] = 1.0
+        assert np.array_equal(session.cycleState(0).enrichment, state.enrichment)
+
+def test_other_files_are_refused(tmp_path):
+    for content in (b"", b"not a session file at all, just some text"):
+        path = tmp_path / "other.lps"
+        path.write_bytes(content)
+        with pytest.raises(SessionFormatError):
+            SessionFile(str(path))
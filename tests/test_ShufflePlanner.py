@@ -0,0 +1,64 @@
+import random
+
+from conftest import burnedCore, fuelPositions
+from Assembly import Assembly
+from CoreState import CoreState
+from ShufflePlanner import decompose, planShuffle
+from StoredInventory import StoredInventory, fingerprint
+
+def pattern(state):
+    return [[fingerprint(assy) for assy in row if assy.label is not None] for row in state.toAssemblyCore()]
+
+def test_plan_reproduces_the_reload_core(coreType):
+    turnInPlace = not coreType.fullCore
+    for seed in range(5):
+        rng = random.Random(seed)
+        start = CoreState.fromAssemblyCore(burnedCore(coreType, seed), coreType.name)
+        inventory = StoredInventory([Assembly("3.2", 3.2), Assembly("2.4", 2.4)], [40, 40], ["3.2", "2.4"])
+        startInventory = inventory.snapshot()
+        target = start.copy()
+        positions = fuelPositions(start.toAssemblyCore())
+        for _ in range(rng.randrange(300)):
+            r = rng.random()
+            if r < 0.6:
+                a, b = rng.sample(positions, 2)
+                target.swap(list(a), list(b))
+            elif r < 0.8:
+                target.rotate(list(rng.choice(positions)), rng.choice((1, -1)))
+            elif r < 0.9:
+                x, y = rng.choice(positions)
+                if target.getLabel(x, y) != "Empty":
+                    target.remove([x, y], inventory)
+            else:
+                target.load(list(rng.choice(positions)), inventory, rng.choice(inventory.inventoryList).itemID)
+        plan = planShuffle(start.toAssemblyCore(), target.toAssemblyCore(), startInventory, turnInPlace)
+        start.apply_moves(plan, startInventory)
+        assert pattern(start) == pattern(target), seed
+
+def test_a_cycle_of_k_takes_k_minus_one_swaps(coreType):
+    start = CoreState.fromAssemblyCore(burnedCore(coreType), coreType.name)
+    target = start.copy()
+    a, b, c, d = fuelPositions(start.toAssemblyCore())[:4]
+    target.apply_moves([["swap", list(a), list(b)], ["swap", list(b), list(c)], ["swap", list(c), list(d)],
+                        ["swap", list(a), list(b)], ["swap", list(a), list(b)]]) # one cycle of four, clicked the long way
+    plan = planShuffle(start.toAssemblyCore(), target.toAssemblyCore(), StoredInventory([], [], []))
+    assert [move[0] for move in plan] == ["swap"] * 3
+    start.apply_moves(plan)
+    assert pattern(start) == pattern(target)
+
+def test_decompose_splits_paths_and_cycles():
+    paths, cycles = decompose({(0, 0): (1, 0), (1, 0): (2, 0), (3, 0): (4, 0), (4, 0): (3, 0), (5, 0): (5, 0)})
+    assert paths == [[(0, 0), (1, 0), (2, 0)]]
+    assert cycles == [[(3, 0), (4, 0)]]
+
+def test_shared_assemblies_are_not_fingerprinted(coreType, monkeypatch):
+    import ShufflePlanner
+    start = CoreState.fromAssemblyCore(burnedCore(coreType), coreType.name).toAssemblyCore()
+    target = [list(row) for row in start] # shares every assembly, like a copy-on-write snapshot
+    a, b = fuelPositions(start)[:2]
+    target[a[1]][a[0]], target[b[1]][b[0]] = start[b[1]][b[0]], start[a[1]][a[0]]
+    calls = []
+    monkeypatch.setattr(ShufflePlanner, "fingerprint", lambda assy: calls.append(assy) or fingerprint(assy))
+    plan = planShuffle(start, target, StoredInventory([], [], []))
+    assert plan == [["swap", list(a), list(b)]] or plan == [["swap", list(b), list(a)]]
+    assert len(calls) <= 8
@@ -0,0 +1,55 @@
+import copy
+import random
+
+from conftest import fuelPositions, randomCore
+from Assembly import Assembly
+from Snapshot import CoreSnapshot
+
+def contents(core):
+    return [[(assy.label, assy.Burnup, assy.SUSPECTED_FOR_LEAK) for assy in row] for row in core]
+
+def randomChange(core, positions, rng):
+    r = rng.random()
+    if r < 0.4:
+        a, b = rng.sample(positions, 2)
+        core.swap(a, b)
+    elif r < 0.55:
+        core.rotate(rng.sample(positions, 4))
+    elif r < 0.7:
+        x, y = rng.choice(positions)
+        core.set(x, y, Assembly("3.2", 3.2), owned=True)
+    elif r < 0.85:
+        core.mutable(*rng.choice(positions)).Burnup = [rng.uniform(0, 40)] * 4
+    else:
+        core.mutable(*rng.choice(positions)).SUSPECTED_FOR_LEAK = True
+
+def test_snapshots_keep_their_contents():
+    rng = random.Random(0)
+    core = CoreSnapshot(randomCore())
+    positions = fuelPositions(core)
+    snapshots = []
+    for step in range(400):
+        randomChange(core, positions, rng)
+        if step % 20 == 0:
+            snapshots.append((core.snapshot(), copy.deepcopy(contents(core))))
+        if step % 50 == 0:
+            k = rng.randrange(len(snapshots))
+            randomChange(snapshots[k][0], positions, rng) # a copy changes too, on its own
+            snapshots[k] = (snapshots[k][0], copy.deepcopy(contents(snapshots[k][0])))
+    for snapshot, expected in snapshots:
+        assert contents(snapshot) == expected
+
+def test_a_write_copies_only_what_it_changes():
+    core = CoreSnapshot(randomCore())
+    snapshot = core.snapshot()
+    assert snapshot.rows is core.rows
+    (ax, ay), (bx, by) = fuelPositions(core)[:2]
+    core.swap((ax, ay), (bx, by))
+    assert snapshot.rows is not core.rows
+    copied = [y for y in range(len(core)) if core.rows[y] is not snapshot.rows[y]]
+    assert copied == sorted({ay, by})
+    assert core[ay][ax] is snapshot[by][bx]
+    core.mutable(ax, ay).SUSPECTED_FOR_LEAK = True
+    assert core[ay][ax] is not snapshot[by][bx] and not snapshot[by][bx].SUSPECTED_FOR_LEAK
+    owned = core[ay][ax]
+    assert core.mutable(ax, ay) is owned # copied once only
@@ -0,0 +1,52 @@
+import pytest
+
+from Assembly import Assembly
+from Snapshot import CoreSnapshot
+from StoredInventory import StoredInventory
+
+def stock(inventory):
+    return [(item.itemID, item.assembly.label, item.quantity) for item in inventory.inventoryList]
+
+def test_identical_assemblies_share_one_item():
+    inventory = StoredInventory([Assembly("A", 3.2), Assembly("B", 2.4), Assembly("A", 3.2)], [2, 1, 3], ["a", "b", "a"])
+    assert stock(inventory) == [(0, "A", 5), (1, "B", 1)]
+    burned = Assembly("A", 3.2, [1, 2, 3, 4])
+    assert inventory.addInventoryItem(burned, 1, "burned") == 2
+    assert inventory.addInventoryItem(Assembly("A", 3.2, [1, 2, 3, 4]), 1, "again") == 2
+    leaker = Assembly("A", 3.2, [1, 2, 3, 4])
+    leaker.SUSPECTED_FOR_LEAK = True
+    assert inventory.addInventoryItem(leaker, 1, "leaker") == 3
+    assert inventory.findItem(burned) == 2 and inventory.findItem(Assembly("C", 3.2)) is None
+
+def test_item_ids_stay_put_when_an_item_runs_out():
+    inventory = StoredInventory([Assembly("A", 3.2), Assembly("B", 2.4), Assembly("C", 1.6)], [1, 1, 1], ["a", "b", "c"])
+    assert inventory.removeInventoryItem(1).label == "B"
+    assert stock(inventory) == [(0, "A", 1), (2, "C", 1)]
+    assert inventory.rowOf(2) == 1
+    with pytest.raises(ValueError):
+        inventory.removeInventoryItem(1)
+    with pytest.raises(ValueError):
+        inventory.rowOf(1)
+    assert inventory.addInventoryItem(Assembly("B", 2.4), 1, "back") == 1
+    assert stock(inventory) == [(0, "A", 1), (1, "B", 1), (2, "C", 1)]
+    assert inventory.getItem(1).description == "back"
+
+def test_removed_assemblies_are_changed_through_a_core_copy():
+    inventory = StoredInventory([Assembly("A", 3.2)], [2], ["a"])
+    core = CoreSnapshot([[Assembly(None), Assembly("Empty")]])
+    core.set(1, 0, inventory.removeInventoryItem(0))
+    core.mutable(1, 0).SUSPECTED_FOR_LEAK = True
+    core.mutable(1, 0).Burnup = [5, 5, 5, 5]
+    assert inventory.removeInventoryItem(0).isFresh()
+    assert not inventory.getItem(0).assembly.SUSPECTED_FOR_LEAK
+
+def test_snapshots_change_independently():
+    inventory = StoredInventory([Assembly("A", 3.2), Assembly("B", 2.4)], [2, 1], ["a", "b"])
+    snapshot = inventory.snapshot()
+    assert snapshot.items is inventory.items
+    inventory.removeInventoryItem(0)
+    inventory.addInventoryItem(Assembly("C", 1.6), 1, "c")
+    snapshot.removeInventoryItem(1)
+    assert stock(inventory) == [(0, "A", 1), (1, "B", 1), (2, "C", 1)]
+    assert stock(snapshot) == [(0, "A", 2)]
+    assert snapshot.addInventoryItem(Assembly("D", 1.6), 1, "d") == 2 # IDs are kept per copy
@@ -0,0 +1,60 @@
+import random
+
+import numpy as np
+
+from conftest import fuelPositions, randomCore
+from Symmetry import SYMMETRIES, TRANSFORMS, coreSymmetry
+
+GEOMETRIES = [([15] * 15, True), ([17] * 17, True), ([8, 8, 8, 8, 7, 7, 6, 4], False)]
+
+def test_transforms_are_permutations():
+    for rowLengths, fullCore in GEOMETRIES:
+        symmetry = coreSymmetry(rowLengths, fullCore)
+        stored = np.array([y * symmetry.width + x for y, length in enumerate(rowLengths) for x in range(length)])
+        assert symmetry.fullCore == fullCore
+        for name in TRANSFORMS:
+            images = symmetry.tables[name][stored]
+            if fullCore:
+                assert sorted(images) == sorted(stored)
+            else:
+                assert sorted(images[images >= 0]) == sorted(set(images[images >= 0]))
+
+def test_four_quarter_turns_are_the_identity():
+    for rowLengths, fullCore in GEOMETRIES:
+        symmetry = coreSymmetry(rowLengths, fullCore)
+        if not fullCore:
+            assert symmetry.rotationOrbit((1, 1)) is None
+            continue
+        for pos in fuelPositions(randomCore(len(rowLengths))):
+            orbit = symmetry.rotationOrbit(pos)
+            assert symmetry.image(orbit[3], "rot90") == pos
+            assert len(set(orbit)) in (1, 4)
+
+def test_symmetric_swaps_keep_a_symmetric_pattern_symmetric():
+    symmetry = coreSymmetry([17] * 17, True)
+    rng = random.Random(1)
+    positions = fuelPositions(randomCore(17))
+    for name in ("Quarter", "Eighth"):
+        transforms = SYMMETRIES[name]
+        orbit = {pos: frozenset(symmetry.image(pos, t) for t in transforms) for pos in positions}
+        general = [pos for pos in positions if len(orbit[pos]) == len(transforms)]
+        pattern = {pos: min(orbit[pos]) for pos in positions} # symmetric: one value per orbit
+        for _ in range(100):
+            one, two = rng.sample(general, 2)
+            if orbit[one] == orbit[two]:
+                continue
+            pairs = symmetry.symmetricSwaps(one, two, name)
+            assert pairs[0] == (one, two)
+            assert len(pairs) == len(transforms)
+            for a, b in pairs:
+                pattern[a], pattern[b] = pattern[b], pattern[a]
+            assert all(pattern[symmetry.image(pos, t)] == pattern[pos] for pos in positions for t in transforms)
+
+def test_symmetric_rotations_turn_each_orbit_once():
+    symmetry = coreSymmetry([15] * 15, True)
+    rotations = symmetry.symmetricRotations((3, 5), 1, "Eighth")
+    assert rotations[0] == ((3, 5), 1)
+    assert len(rotations) == 2 # (3, 5) and its mirror image, which turns the other way
+    assert rotations[1][1] == -1
+    moves = symmetry.expandMoves([["swap", [3, 5], [4, 5]], ["noMove", 0, 0]], "Quarter")
+    assert len(moves) == 5 and moves[-1] == ["noMove", 0, 0]
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from conftest import burnedCore, fuelPositions
+from Assembly import Assembly
+from CoreRegistry import coreRegistry
+from CoreState import CoreState
+from MoveExporter import POOL
+from StoredInventory import StoredInventory
+from TravelOptimizer import (Transfer, TravelRunner, greedyOrder, isValidOrder, orderTransfers, poolLocation,
+                             transferTasks, travel)
+
+def reload(coreType, seed):
+    """ (start core, target core, inventory at the start) with the target reached by random moves"""
+    rng = random.Random(seed)
+    start = CoreState.fromAssemblyCore(burnedCore(coreType, seed), coreType.name)
+    inventory = StoredInventory([Assembly("3.2", 3.2), Assembly("2.4", 2.4)], [40, 40], ["3.2", "2.4"])
+    startInventory = inventory.snapshot()
+    target = start.copy()
+    positions = fuelPositions(start.toAssemblyCore())
+    for _ in range(rng.randrange(20, 200)):
+        r = rng.random()
+        if r < 0.7:
+            a, b = rng.sample(positions, 2)
+            target.swap(list(a), list(b))
+        elif r < 0.85:
+            x, y = rng.choice(positions)
+            if target.getLabel(x, y) != "Empty":
+                target.remove([x, y], inventory)
+        else:
+            target.load(list(rng.choice(positions)), inventory, rng.choice(inventory.inventoryList).itemID)
+    return start.toAssemblyCore(), target.toAssemblyCore(), startInventory
+
+def carryOut(start, tasks, order):
+    """ The labels in the core after the crane makes the transfers in order, checking that it only
+    picks up a held assembly and only puts one down in an empty position"""
+    held = {(x, y): assy.label for x, y in fuelPositions(start) for assy in [start[y][x]] if assy.label != "Empty"}
+    parked = []
+    for i in order:
+        task = tasks[i]
+        if task.source == POOL:
+            label = parked.pop(parked.index(task.label)) if task.kind == "unpark" else task.label
+        else:
+            label = held.pop(task.source)
+            assert label == task.label
+        if task.target == POOL:
+            if task.kind == "park":
+                parked.append(label)
+        else:
+            assert task.target not in held, "placed onto " + str(task.target)
+            held[task.target] = label
+    assert not parked
+    return held
+
+def test_ordered_transfers_reach_the_reload_core(coreType):
+    for seed in range(3):
+        start, target, inventory = reload(coreType, seed)
+        tasks = transferTasks(start, target, inventory, not coreType.fullCore)
+        pool = poolLocation(start)
+        order, distance, greedy, given = orderTransfers(tasks, pool, budget=0.2, seed=seed)
+        assert isValidOrder(tasks, order) and isValidOrder(tasks, list(range(len(tasks))))
+        assert distance == travel(tasks, order, pool) <= greedy
+        expected = {(x, y): assy.label for x, y in fuelPositions(target) for assy in [target[y][x]] if assy.label != "Empty"}
+        assert carryOut(start, tasks, order) == expected
+        assert carryOut(start, tasks, range(len(tasks))) == expected
+
+def test_circular_precedence_is_refused():
+    tasks = [Transfer("move", (0, 0), (1, 0), "A", after=(1,)), Transfer("move", (1, 0), (0, 0), "B", after=(0,))]
+    assert not isValidOrder(tasks, [0, 1]) and not isValidOrder(tasks, [1, 0])
+    with pytest.raises(ValueError):
+        greedyOrder(tasks, (5, 0))
+
+def test_runner_orders_in_a_worker():
+    start, target, inventory = reload(coreRegistry().get("BEAVRS"), 7)
+    tasks = transferTasks(start, target, inventory)
+    runner = TravelRunner(tasks, poolLocation(start), budget=0.1, seed=1)
+    runner.future.result(timeout=60)
+    assert runner.done and runner.error is None
+    assert isValidOrder(tasks, runner.result[0])
+    assert runner.ordered() == [tasks[i] for i in runner.result[0]]
+    runner.cancel()
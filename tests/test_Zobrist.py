@@ -0,0 +1,129 @@
+import random
+
+from conftest import burnedCore, fuelPositions
+from Assembly import Assembly
+from CoreState import CoreState
+from Snapshot import CoreSnapshot
+from Zobrist import QUADRANT_ORDERS, CoreHash, ZobristTable, recordKeys
+
+def image(core, symmetry, name):
+    """ core as seen through transform name: every assembly moved, and its quadrants turned, with it"""
+    rows = [list(row) for row in core]
+    for x, y in fuelPositions(core):
+        tx, ty = symmetry.image((x, y), name)
+        assy = core[y][x].copy()
+        if not assy.isFresh():
+            assy.Burnup = [core[y][x].Burnup[i] for i in QUADRANT_ORDERS[name]]
+        rows[ty][tx] = assy
+    return rows
+
+def fuelTransforms(coreType):
+    """ The transforms of the hash table that also map the fuel positions onto themselves (the quarter
+    cores are stored square, but their fuel is not symmetric about the diagonal)"""
+    fuel = [coreType.symmetry.flatIndex(pos) for pos in fuelPositions(coreType.startingCore())]
+    return [(t, name) for t, name in enumerate(coreType.zobrist.names)
+            if sorted(coreType.symmetry.tables[name][fuel]) == sorted(fuel)]
+
+def test_incremental_hash_equals_full_rehash(coreType):
+    rng = random.Random(coreType.name)
+    table = coreType.zobrist
+    core = CoreSnapshot(burnedCore(coreType))
+    core.coreHash(table)
+    positions = fuelPositions(core)
+    snapshots = []
+    for step in range(300):
+        r = rng.random()
+        if r < 0.5:
+            a, b = rng.sample(positions, 2)
+            core.swap(a, b)
+        elif r < 0.65:
+            pos = rng.choice(positions)
+            orbit = coreType.symmetry.rotationOrbit(pos)
+            if orbit is None:
+                core.mutable(*pos).turn(rng.choice((1, -1)))
+            else:
+                core.rotate(orbit)
+        elif r < 0.75:
+            x, y = rng.choice(positions)
+            core.set(x, y, Assembly("Empty"))
+        elif r < 0.85:
+            x, y = rng.choice(positions)
+            core.set(x, y, Assembly("3.2", 3.2))
+        elif r < 0.9:
+            core.mutable(*rng.choice(positions)).SUSPECTED_FOR_LEAK = True
+        else:
+            snapshots.append(core.snapshot())
+        if step % 10 == 0:
+            assert core.coreHash(table).values == CoreHash.fromCore(core.rows, table).values, step
+    for snapshot in snapshots:
+        assert snapshot.coreHash(table).values == CoreHash.fromCore(snapshot.rows, table).values
+
+def test_core_state_hash_follows_its_moves(coreType):
+    rng = random.Random(coreType.name)
+    core = burnedCore(coreType)
+    state = CoreState.fromAssemblyCore(core, coreType.name)
+    state.coreHash()
+    positions = fuelPositions(core)
+    moves = []
+    for _ in range(50):
+        if rng.random() < 0.7:
+            a, b = rng.sample(positions, 2)
+            moves.append(["swap", list(a), list(b)])
+        else:
+            moves.append(["rotate", list(rng.choice(positions)), rng.choice((1, -1))])
+    state.apply_moves(moves)
+    assert state.coreHash().values == CoreHash.fromCore(state.toAssemblyCore(), coreType.zobrist).values
+
+def test_hash_tells_apart_and_is_reproducible(coreType):
+    core = burnedCore(coreType)
+    table = coreType.zobrist
+    value = CoreHash.fromCore(core, table).value
+    assert CoreHash.fromCore(core, ZobristTable(coreType.rowLengths, coreType.fullCore)).value == value
+    x, y = fuelPositions(core)[0]
+    turned = [list(row) for row in core]
+    turned[y][x] = core[y][x].copy()
+    turned[y][x].turn(1)
+    assert CoreHash.fromCore(turned, table).value != value
+
+def test_canonical_hash_is_shared_by_every_image(coreType):
+    core = burnedCore(coreType)
+    table = coreType.zobrist
+    coreHash = CoreHash.fromCore(core, table)
+    for t, name in fuelTransforms(coreType):
+        imageHash = CoreHash.fromCore(image(core, coreType.symmetry, name), table)
+        assert imageHash.canonical() == coreHash.canonical(), name
+        assert imageHash.value == coreHash.values[t], name
+
+def test_canonical_hash_tells_different_patterns_apart(coreType):
+    core = burnedCore(coreType)
+    table = coreType.zobrist
+    a, b = [(x, y) for x, y in fuelPositions(core) if not core[y][x].isFresh()][:2]
+    swapped = [list(row) for row in core]
+    swapped[a[1]][a[0]], swapped[b[1]][b[0]] = core[b[1]][b[0]], core[a[1]][a[0]]
+    assert CoreHash.fromCore(swapped, table).canonical() != CoreHash.fromCore(core, table).canonical()
+
+class CountingList(list):
+    """ A list that counts the items read from it"""
+    reads = 0
+
+    def __getitem__(self, k):
+        self.reads += 1
+        return super().__getitem__(k)
+
+def test_a_swap_updates_only_its_two_positions(coreType):
+    rng = random.Random(coreType.name)
+    table = ZobristTable(coreType.rowLengths, coreType.fullCore)
+    core = burnedCore(coreType)
+    rows = [list(row) for row in core]
+    coreHash = CoreHash.fromCore(rows, table)
+    table.positionSalts = CountingList(table.positionSalts)
+    misses = recordKeys.cache_info().misses
+    positions = fuelPositions(core)
+    for _ in range(100):
+        (ax, ay), (bx, by) = rng.sample(positions, 2)
+        table.positionSalts.reads = 0
+        coreHash.swap(table.flatIndex(ax, ay), table.flatIndex(bx, by))
+        assert table.positionSalts.reads <= 4 # a and b, out and in, under every transform at once
+        rows[ay][ax], rows[by][bx] = rows[by][bx], rows[ay][ax]
+    assert recordKeys.cache_info().misses == misses # no assembly was keyed again
+    assert coreHash.values == CoreHash.fromCore(rows, table).values